@@ -0,0 +1,112 @@
+"""
+Gemini 보안 분석 결과 캐시 모듈
+
+정규화된 트리 구조, 체크된 보안 항목, 모델명, 프롬프트 버전을 키로 하여
+보안 분석 결과를 로컬 SQLite 파일에 저장합니다.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+from config import ANALYSIS_CACHE_SETTINGS
+from diagram_cache import normalize_tree_text
+
+_lock = threading.Lock()
+_instance = None
+
+
+def make_analysis_key(tree_text, checked_items, model_name, prompt_version):
+    """트리 구조, 보안 항목, 모델명, 프롬프트 버전으로 캐시 키(sha256)를 만듭니다."""
+    payload = json.dumps(
+        {
+            "tree": normalize_tree_text(tree_text),
+            "checked_items": sorted(checked_items or []),
+            "model": model_name,
+            "prompt_version": prompt_version,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """TTL과 최대 항목 수 제한을 갖는 SQLite 기반 보안 분석 캐시"""
+
+    def __init__(self, db_path, ttl, max_entries):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        """호출마다 새 연결을 만들어 여러 스레드에서 안전하게 사용합니다."""
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def get(self, key):
+        """만료되지 않은 분석 결과를 반환합니다. 없으면 None을 반환합니다."""
+        now = time.time()
+        with _lock, closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT result FROM analysis_cache WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE analysis_cache SET last_access = ? WHERE key = ?",
+                (now, key),
+            )
+            return row[0]
+
+    def put(self, key, model_name, result):
+        """분석 결과를 저장하고 만료/초과 항목을 정리합니다."""
+        now = time.time()
+        with _lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, result, now, now),
+            )
+            conn.execute(
+                "DELETE FROM analysis_cache WHERE created_at < ?",
+                (now - self.ttl,),
+            )
+            # 최대 항목 수를 넘으면 가장 오래 사용되지 않은 항목부터 삭제
+            conn.execute(
+                """
+                DELETE FROM analysis_cache WHERE key IN (
+                    SELECT key FROM analysis_cache
+                    ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+
+def get_analysis_cache():
+    """프로세스 전체에서 공유하는 보안 분석 캐시를 반환합니다."""
+    global _instance
+    with _lock:
+        if _instance is None:
+            _instance = AnalysisCache(
+                ANALYSIS_CACHE_SETTINGS['path'],
+                ANALYSIS_CACHE_SETTINGS['ttl'],
+                ANALYSIS_CACHE_SETTINGS['max_entries'],
+            )
+        return _instance
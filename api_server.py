@@ -0,0 +1,375 @@
+"""
+다이어그램 생성/보안 분석 HTTP API 서버
+
+웹 앱의 "제작하기"와 같은 파이프라인(트리 → 다이어그램 생성 + Gemini 보안 분석)을
+다른 도구에서 호출할 수 있도록 asyncio 기반 HTTP API로 제공합니다. Q CLI와 graphviz는
+asyncio 하위 프로세스로, Gemini는 비동기 호출로 실행하므로 요청마다 스레드를 쓰지 않고
+한 프로세스가 많은 요청을 동시에 처리합니다.
+
+실행: python api_server.py [--host 127.0.0.1] [--port 8600]
+
+엔드포인트:
+- POST /v1/jobs                   {"tree": "...", "checklist": [...], "backend": "local", "analysis": true} → 202
+- GET  /v1/jobs/{job_id}          작업 상태, 단계별 진행 상황, 결과 링크
+- DELETE /v1/jobs/{job_id}        작업 취소 (실행 중인 Q CLI 프로세스 트리 종료)
+- GET  /v1/jobs/{job_id}/diagram  생성된 다이어그램(PNG)
+- GET  /v1/jobs/{job_id}/analysis 보안 분석 결과(마크다운)
+- GET  /healthz, GET /metrics     상태 확인, Prometheus 지표
+"""
+import argparse
+import asyncio
+import hmac
+import time
+from contextlib import asynccontextmanager, suppress
+
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from config import (
+    GOOGLE_API_KEY, GEMINI_MODEL, DIAGRAM_SETTINGS, ANALYSIS_CACHE_SETTINGS,
+    Q_ADMISSION_SETTINGS, API_SETTINGS,
+)
+from analysis_cache import get_analysis_cache, make_analysis_key
+from chat_prompts import SECURITY_ANALYSIS_PROMPT_VERSION, SECURITY_ANALYSIS_SYSTEM_INSTRUCTION, build_security_analysis_prompt
+from diagram_cache import get_diagram_cache
+from diagram_generator import BASIC_SECURITY_CHECKLIST, AmazonQClient, DiagramManager, generate_diagram_file_async
+from gemini_client import create_gemini_model, mark_unhealthy, is_healthy, generate_content_async
+from job_queue import AsyncJobManager, CANCELLED, DONE, FAILED
+from metrics import get_metrics, set_process_name
+from q_process import get_q_timeout
+
+# 파이프라인 단계별 표시 이름 (웹 앱과 같은 진행 메시지)
+STAGE_LABELS = {
+    "diagram": "🎨 다이어그램 생성",
+    "analysis": "🔍 보안 아키텍처 분석",
+}
+
+BACKENDS = ("local", "amazon_q")
+
+# Gemini 모델 (이벤트 루프 스레드에서만 사용하므로 잠금 없이 공유)
+_gemini_model = None
+
+# =========================================
+# 파이프라인 단계
+# =========================================
+def get_gemini_model():
+    """Gemini 모델을 반환합니다. API 호출이 실패한 모델은 다시 만듭니다. API 키가 없으면 None을 반환합니다."""
+    global _gemini_model
+    if not GOOGLE_API_KEY:
+        return None
+    if _gemini_model is None or not is_healthy(_gemini_model):
+        _gemini_model = create_gemini_model(GOOGLE_API_KEY, GEMINI_MODEL, SECURITY_ANALYSIS_SYSTEM_INSTRUCTION)
+    return _gemini_model
+
+
+async def analyze_security_async(tree_structure, checked_items):
+    """트리의 보안 구성요소를 Gemini로 분석하고 결과 텍스트를 반환합니다. 실패하면 예외를 발생시킵니다."""
+    # 같은 트리와 보안 항목에 대한 분석 결과가 있으면 재사용 (웹 앱과 같은 캐시)
+    cache_enabled = ANALYSIS_CACHE_SETTINGS.get('enabled', False)
+    cache_key = make_analysis_key(tree_structure, checked_items, GEMINI_MODEL, SECURITY_ANALYSIS_PROMPT_VERSION)
+    if cache_enabled:
+        cached_analysis = get_analysis_cache().get(cache_key)
+        get_metrics().record_cache_lookup("analysis", bool(cached_analysis))
+        if cached_analysis:
+            return cached_analysis
+
+    model = get_gemini_model()
+    if model is None:
+        raise RuntimeError("Gemini API 키가 설정되지 않았습니다.")
+    prompt = build_security_analysis_prompt(tree_structure, checked_items)
+    try:
+        with get_metrics().span("gemini_analysis"):
+            response, _ = await generate_content_async(model, prompt, DIAGRAM_SETTINGS['analysis_timeout'])
+    except Exception:
+        mark_unhealthy(model)
+        raise
+    if not response.text:
+        raise RuntimeError("보안 분석을 완료할 수 없습니다.")
+
+    if cache_enabled:
+        get_analysis_cache().put(cache_key, GEMINI_MODEL, response.text)
+    return response.text
+
+
+class StageDeadline:
+    """단계 마감 시간. 실행 중에 restart()로 마감 시간을 다시 시작할 수 있습니다."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.started_at = time.monotonic()
+        # 마감 시간을 기다리는 쪽이 바뀐 마감 시간으로 다시 기다리도록 알림
+        self.changed = asyncio.Event()
+
+    def restart(self, timeout):
+        self.timeout = timeout
+        self.started_at = time.monotonic()
+        self.changed.set()
+
+    def remaining(self):
+        return self.timeout - (time.monotonic() - self.started_at)
+
+
+@asynccontextmanager
+async def _admit_q(q_slots, deadline):
+    """Q CLI 실행 슬롯을 얻은 뒤부터 다이어그램 단계의 마감 시간을 다시 셉니다.
+
+    슬롯을 기다린 시간 때문에 Q CLI 실행 시간이 줄어들지 않도록 합니다.
+    """
+    async with q_slots:
+        deadline.restart(get_q_timeout().current() + 5)
+        yield
+
+
+async def _run_stage(job, stage, coroutine, deadline, results, errors):
+    """단계 하나를 마감 시간 안에서 실행하고 진행 상황과 결과를 기록합니다."""
+    label = STAGE_LABELS[stage]
+    job.set_progress(stage, "running", f"{label} 중...")
+    started_at = time.monotonic()
+    task = asyncio.ensure_future(coroutine)
+    try:
+        # 실행 중에 마감 시간이 다시 시작될 수 있으므로 바뀔 때마다 남은 시간을 다시 계산
+        while not task.done():
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            deadline.changed.clear()
+            changed = asyncio.ensure_future(deadline.changed.wait())
+            try:
+                await asyncio.wait({task, changed}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                changed.cancel()
+        results[stage] = task.result()
+    except asyncio.TimeoutError:
+        errors[stage] = "시간 초과"
+    except Exception as e:
+        errors[stage] = str(e)
+    finally:
+        if not task.done():
+            # 시간 초과나 작업 취소 시 Q CLI 프로세스 트리까지 정리되도록 기다림
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    elapsed_text = f"{time.monotonic() - started_at:.1f}초"
+
+    if results.get(stage):
+        job.set_progress(stage, "complete", f"{label} 완료 ({elapsed_text})")
+    else:
+        errors.setdefault(stage, "생성된 결과가 없습니다")
+        job.set_progress(stage, "error", f"{label} 실패 ({elapsed_text}): {errors[stage]}")
+
+
+async def generation_job(job, resources, tree_structure, checked_items, backend, with_analysis):
+    """다이어그램 생성과 보안 분석을 동시에 실행하고 단계별 결과를 반환합니다."""
+    results = {"diagram": None, "analysis": None}
+    errors = {}
+    # 다이어그램 단계는 CLI 시간 제한(최근 실행 시간 기반)에 약간의 여유를 둠
+    diagram_deadline = StageDeadline(get_q_timeout().current() + 5)
+    q_slots = resources["q_slots"]
+    admit = None
+    if q_slots is not None:
+        # 슬롯 대기는 대기열 대기 시간까지 허용하고, 슬롯을 얻으면 마감 시간을 다시 시작
+        diagram_deadline.timeout += Q_ADMISSION_SETTINGS['wait_timeout']
+        admit = _admit_q(q_slots, diagram_deadline)
+    stages = [
+        _run_stage(
+            job, "diagram",
+            generate_diagram_file_async(
+                resources["diagram_manager"], resources["amazon_q_client"], tree_structure, checked_items,
+                backend, resources["diagram_cache"], admit,
+            ),
+            diagram_deadline, results, errors,
+        ),
+    ]
+    if with_analysis:
+        stages.append(_run_stage(
+            job, "analysis", analyze_security_async(tree_structure, checked_items),
+            StageDeadline(DIAGRAM_SETTINGS['analysis_timeout']), results, errors,
+        ))
+    await asyncio.gather(*stages)
+    return {"results": results, "errors": errors}
+
+# =========================================
+# 요청 처리
+# =========================================
+def _error(status_code, message):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def _authorized(request):
+    """토큰이 설정되어 있으면 Authorization: Bearer 헤더를 확인합니다."""
+    token = API_SETTINGS.get('token')
+    if not token:
+        return True
+    header = request.headers.get("authorization", "")
+    return hmac.compare_digest(header, f"Bearer {token}")
+
+
+def _parse_job_request(payload):
+    """작업 요청 본문을 검사하고 (트리, 보안 항목, 렌더링 방식, 분석 여부)를 반환합니다. 잘못되면 ValueError를 발생시킵니다."""
+    if not isinstance(payload, dict):
+        raise ValueError("요청 본문은 JSON 객체여야 합니다.")
+    tree_structure = payload.get("tree")
+    if not isinstance(tree_structure, str) or not tree_structure.strip():
+        raise ValueError("tree(트리 구조 문자열)가 필요합니다.")
+    if len(tree_structure) > API_SETTINGS['max_tree_chars']:
+        raise ValueError(f"tree는 {API_SETTINGS['max_tree_chars']}자를 넘을 수 없습니다.")
+
+    checked_items = payload.get("checklist", [])
+    if not isinstance(checked_items, list) or any(item not in BASIC_SECURITY_CHECKLIST for item in checked_items):
+        raise ValueError(f"checklist 항목은 다음 중에서 선택해야 합니다: {BASIC_SECURITY_CHECKLIST}")
+
+    backend = payload.get("backend", DIAGRAM_SETTINGS.get('backend', 'local'))
+    if backend not in BACKENDS:
+        raise ValueError(f"backend는 {BACKENDS} 중 하나여야 합니다.")
+    return tree_structure, checked_items, backend, bool(payload.get("analysis", True))
+
+
+def _job_payload(job):
+    """작업 상태를 응답용 dict로 변환합니다."""
+    payload = {
+        "job_id": job.job_id,
+        "state": job.state,
+        "progress": job.get_progress(),
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error,
+    }
+    if job.state == DONE:
+        results, errors = job.result["results"], job.result["errors"]
+        base_url = f"/v1/jobs/{job.job_id}"
+        payload["result"] = {
+            "diagram_url": f"{base_url}/diagram" if results["diagram"] else None,
+            "analysis_url": f"{base_url}/analysis" if results["analysis"] else None,
+            "errors": errors,
+        }
+    return payload
+
+
+async def submit_job(request):
+    if not _authorized(request):
+        return _error(401, "인증이 필요합니다.")
+    try:
+        tree_structure, checked_items, backend, with_analysis = _parse_job_request(await request.json())
+    except ValueError as e:
+        return _error(400, str(e))
+
+    jobs = request.app.state.jobs
+    if jobs.pending_count() >= API_SETTINGS['max_pending_jobs']:
+        return _error(503, "처리 중인 요청이 너무 많습니다. 잠시 후 다시 시도해주세요.")
+    job_id = jobs.submit(
+        "diagram", generation_job, request.app.state.resources,
+        tree_structure, checked_items, backend, with_analysis,
+    )
+    return JSONResponse(_job_payload(jobs.get(job_id)), status_code=202,
+                        headers={"Location": f"/v1/jobs/{job_id}"})
+
+
+def _find_job(request):
+    return request.app.state.jobs.get(request.path_params["job_id"])
+
+
+async def get_job(request):
+    if not _authorized(request):
+        return _error(401, "인증이 필요합니다.")
+    job = _find_job(request)
+    if job is None:
+        return _error(404, "작업을 찾을 수 없습니다.")
+    return JSONResponse(_job_payload(job))
+
+
+async def cancel_job(request):
+    if not _authorized(request):
+        return _error(401, "인증이 필요합니다.")
+    job = _find_job(request)
+    if job is None:
+        return _error(404, "작업을 찾을 수 없습니다.")
+    if not request.app.state.jobs.cancel(job.job_id):
+        return _error(409, "이미 끝난 작업입니다.")
+    # 취소는 태스크가 다음에 실행될 때 반영되므로 상태는 GET으로 확인
+    return JSONResponse(_job_payload(job), status_code=202)
+
+
+def _artifact(request, stage):
+    """완료된 작업의 단계 결과를 반환합니다. 작업이 없거나 결과가 없으면 (None, 오류 응답)을 반환합니다."""
+    if not _authorized(request):
+        return None, _error(401, "인증이 필요합니다.")
+    job = _find_job(request)
+    if job is None:
+        return None, _error(404, "작업을 찾을 수 없습니다.")
+    if job.state in (FAILED, CANCELLED):
+        return None, _error(409, f"작업이 실패했거나 취소되었습니다: {job.error}")
+    if job.state != DONE:
+        return None, _error(409, "작업이 아직 완료되지 않았습니다.")
+    artifact = job.result["results"][stage]
+    if not artifact:
+        return None, _error(404, job.result["errors"].get(stage, "결과가 없습니다."))
+    return artifact, None
+
+
+async def get_diagram(request):
+    diagram_path, error_response = _artifact(request, "diagram")
+    if error_response:
+        return error_response
+    return FileResponse(diagram_path, media_type="image/png")
+
+
+async def get_analysis(request):
+    analysis, error_response = _artifact(request, "analysis")
+    if error_response:
+        return error_response
+    return PlainTextResponse(analysis, media_type="text/markdown; charset=utf-8")
+
+
+async def healthz(request):
+    return JSONResponse({"status": "ok", "pending_jobs": request.app.state.jobs.pending_count()})
+
+
+async def metrics_endpoint(request):
+    return PlainTextResponse(get_metrics().to_prometheus(), media_type="text/plain; version=0.0.4")
+
+# =========================================
+# 앱 생성
+# =========================================
+def create_app(diagram_folder="generated-diagrams"):
+    """HTTP API 앱을 만듭니다. 작업 관리자와 생성 리소스는 앱이 공유합니다."""
+    set_process_name("api")
+    app = Starlette(routes=[
+        Route("/v1/jobs", submit_job, methods=["POST"]),
+        Route("/v1/jobs/{job_id}", get_job),
+        Route("/v1/jobs/{job_id}", cancel_job, methods=["DELETE"]),
+        Route("/v1/jobs/{job_id}/diagram", get_diagram),
+        Route("/v1/jobs/{job_id}/analysis", get_analysis),
+        Route("/healthz", healthz),
+        Route("/metrics", metrics_endpoint),
+    ])
+    app.state.jobs = AsyncJobManager(API_SETTINGS['max_running_jobs'], API_SETTINGS['max_finished_jobs'])
+    app.state.resources = {
+        # 보관 정책 정리는 세션 참조를 아는 웹 앱에 맡김 (API가 세션이 보고 있는 파일을 지우지 않도록)
+        "diagram_manager": DiagramManager(diagram_folder, retention=False),
+        "amazon_q_client": AmazonQClient(),
+        "diagram_cache": get_diagram_cache(),
+        # 동시에 실행하는 Q CLI 수 제한 (웹 앱의 실행 허용 제어와 같은 한도)
+        "q_slots": (
+            asyncio.Semaphore(Q_ADMISSION_SETTINGS['max_in_flight'])
+            if Q_ADMISSION_SETTINGS.get('enabled', False) else None
+        ),
+    }
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=API_SETTINGS['host'])
+    parser.add_argument("--port", type=int, default=API_SETTINGS['port'])
+    parser.add_argument("--diagram-folder", default="generated-diagrams", help="다이어그램 저장 폴더")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(create_app(args.diagram_folder), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+"""
+아키텍처 트리 파서 모듈
+
+챗봇 응답의 ├─ │ └─ 트리와 코드 블록을 한 번의 줄 단위 순회로 읽어
+노드/간선 그래프로 변환하고, 다시 정규화된 트리 텍스트로 직렬화합니다.
+한 번의 채팅 턴에서 같은 트리를 여러 번 파싱하므로 파싱 결과는 텍스트별로 재사용하고,
+서비스명 정규화는 노드의 service를 처음 읽을 때 수행합니다.
+"""
+import json
+import re
+from functools import lru_cache
+
+# 트리 선을 그리는 문자 (노드 이름 앞에서 제거)
+_TREE_PREFIX_CHARS = " \t│|├└┌┬┼─━-+`•"
+_BRANCH_CHARS = "├└┌┬┼+`"
+# 들여쓰기로 취급하는 문자들과 트리 줄 판별용 패턴
+_INDENT_PATTERN = re.compile(r"[ \t│|]*")
+_TREE_LINE_PATTERN = re.compile(r"[├└│┌]")
+
+# AWS 서비스 별칭 → 공식 명칭 (소문자 별칭 기준)
+AWS_SERVICE_ALIASES = {
+    "ec2": "EC2",
+    "amazon ec2": "EC2",
+    "ec2 instance": "EC2",
+    "s3": "S3",
+    "amazon s3": "S3",
+    "s3 bucket": "S3",
+    "rds": "RDS",
+    "amazon rds": "RDS",
+    "aurora": "Aurora",
+    "dynamodb": "DynamoDB",
+    "vpc": "VPC",
+    "public subnet": "Public Subnet",
+    "private subnet": "Private Subnet",
+    "subnet": "Subnet",
+    "internet gateway": "Internet Gateway",
+    "igw": "Internet Gateway",
+    "nat gateway": "NAT Gateway",
+    "security group": "Security Group",
+    "elb": "ELB",
+    "elastic load balancer": "ELB",
+    "elastic load balancing": "ELB",
+    "load balancer": "ELB",
+    "alb": "ALB",
+    "application load balancer": "ALB",
+    "nlb": "NLB",
+    "network load balancer": "NLB",
+    "auto scaling": "Auto Scaling",
+    "auto scaling group": "Auto Scaling",
+    "asg": "Auto Scaling",
+    "cloudfront": "CloudFront",
+    "waf": "WAF",
+    "aws waf": "WAF",
+    "shield": "Shield",
+    "route 53": "Route 53",
+    "route53": "Route 53",
+    "cloudtrail": "CloudTrail",
+    "cloudwatch": "CloudWatch",
+    "cloudwatch logs": "CloudWatch Logs",
+    "lambda": "Lambda",
+    "aws lambda": "Lambda",
+    "api gateway": "API Gateway",
+    "ecs": "ECS",
+    "eks": "EKS",
+    "fargate": "Fargate",
+    "ecr": "ECR",
+    "elasticache": "ElastiCache",
+    "redis": "ElastiCache",
+    "memcached": "ElastiCache",
+    "sqs": "SQS",
+    "sns": "SNS",
+    "kinesis": "Kinesis",
+    "iam": "IAM",
+    "kms": "KMS",
+    "cognito": "Cognito",
+    "secrets manager": "Secrets Manager",
+    "efs": "EFS",
+    "ebs": "EBS",
+    "guardduty": "GuardDuty",
+    "config": "Config",
+}
+
+# 긴 별칭부터 매칭되도록 정렬한 단일 정규식 (한 번만 컴파일)
+_SERVICE_PATTERN = re.compile(
+    r"(?<![a-z0-9])("
+    + "|".join(re.escape(alias) for alias in sorted(AWS_SERVICE_ALIASES, key=len, reverse=True))
+    + r")(?![a-z0-9])"
+)
+
+
+def normalize_service_name(label):
+    """노드 이름에서 AWS 서비스를 찾아 공식 명칭으로 반환합니다. 없으면 None을 반환합니다."""
+    match = _SERVICE_PATTERN.search(label.lower())
+    return AWS_SERVICE_ALIASES[match.group(1)] if match else None
+
+
+# 아직 정규화하지 않은 서비스명 표시
+_UNRESOLVED = object()
+
+
+class ArchitectureNode:
+    """트리의 노드 하나 (이름, 정규화된 서비스명, 깊이, 부모)"""
+
+    __slots__ = ("node_id", "label", "_service", "depth", "parent_id")
+
+    def __init__(self, node_id, label, depth, parent_id):
+        self.node_id = node_id
+        self.label = label
+        self._service = _UNRESOLVED
+        self.depth = depth
+        self.parent_id = parent_id
+
+    @property
+    def service(self):
+        """정규화된 AWS 서비스명 (처음 읽을 때 계산, 없으면 None)"""
+        if self._service is _UNRESOLVED:
+            self._service = normalize_service_name(self.label)
+        return self._service
+
+    def __repr__(self):
+        return f"ArchitectureNode({self.node_id}, {self.label!r}, depth={self.depth})"
+
+
+class ArchitectureGraph:
+    """노드 목록과 (부모, 자식) 간선 목록으로 이루어진 아키텍처 그래프"""
+
+    __slots__ = ("nodes", "edges", "_children")
+
+    def __init__(self):
+        self.nodes = []
+        self.edges = []
+        self._children = {}
+
+    def add_node(self, label, depth, parent_id=None):
+        """노드를 추가하고 반환합니다."""
+        node = ArchitectureNode(len(self.nodes), label, depth, parent_id)
+        self.nodes.append(node)
+        self._children[node.node_id] = []
+        if parent_id is not None:
+            self.edges.append((parent_id, node.node_id))
+            self._children[parent_id].append(node.node_id)
+        return node
+
+    def children(self, node_id):
+        """자식 노드 목록을 반환합니다."""
+        return [self.nodes[child_id] for child_id in self._children[node_id]]
+
+    def roots(self):
+        """부모가 없는 최상위 노드 목록을 반환합니다."""
+        return [node for node in self.nodes if node.parent_id is None]
+
+    @property
+    def max_depth(self):
+        return max((node.depth for node in self.nodes), default=0)
+
+    def to_text(self):
+        """정규화된 트리 텍스트(├─, └─, │ 사용)로 직렬화합니다."""
+        lines = []
+        # 재귀 대신 스택을 사용하여 깊은 트리에서도 안전하게 순회
+        for root in self.roots():
+            lines.append(root.label)
+            stack = [(child, "", index == len(self._children[root.node_id]) - 1)
+                     for index, child in enumerate(self.children(root.node_id))]
+            stack.reverse()
+            while stack:
+                node, prefix, is_last = stack.pop()
+                lines.append(f"{prefix}{'└─' if is_last else '├─'} {node.label}")
+                child_prefix = prefix + ("   " if is_last else "│  ")
+                children = self.children(node.node_id)
+                for index in range(len(children) - 1, -1, -1):
+                    stack.append((children[index], child_prefix, index == len(children) - 1))
+        return "\n".join(lines)
+
+
+def _split_tree_line(line):
+    """트리 한 줄을 (들여쓰기 열, 노드 이름)으로 나눕니다. 이름이 없으면 None을 반환합니다."""
+    index = _INDENT_PATTERN.match(line).end()
+    if index == len(line):
+        return None
+    # 가지 문자의 위치가 곧 노드의 들여쓰기 깊이
+    # (같은 열의 일반 텍스트 줄보다 한 단계 아래로 취급)
+    column = index + 0.5 if line[index] in _BRANCH_CHARS else index
+    label = line[index:].lstrip(_TREE_PREFIX_CHARS).strip()
+    if not label:
+        return None
+    return column, " ".join(label.split())
+
+
+def _build_graph(lines):
+    """트리 줄 목록으로 그래프를 만듭니다. (들여쓰기 열 기준 스택, 선형 시간)
+
+    줄마다 실행되는 부분이므로 _split_tree_line과 add_node를 풀어서 씀
+    """
+    graph = ArchitectureGraph()
+    nodes, edges, children = graph.nodes, graph.edges, graph._children
+    indent_match = _INDENT_PATTERN.match
+    stack = []  # (열, 노드)
+    for line in lines:
+        index = indent_match(line).end()
+        if index == len(line):
+            continue
+        label = line[index:].lstrip(_TREE_PREFIX_CHARS).strip()
+        if not label:
+            continue
+        label = " ".join(label.split())
+        # 가지 문자가 있는 줄은 같은 열의 일반 텍스트 줄보다 한 단계 아래로 취급
+        column = index + 0.5 if line[index] in _BRANCH_CHARS else index
+        while stack and stack[-1][0] >= column:
+            stack.pop()
+        node_id = len(nodes)
+        if stack:
+            parent = stack[-1][1]
+            node = ArchitectureNode(node_id, label, parent.depth + 1, parent.node_id)
+            edges.append((parent.node_id, node_id))
+            children[parent.node_id].append(node_id)
+        else:
+            node = ArchitectureNode(node_id, label, 0, None)
+        nodes.append(node)
+        children[node_id] = []
+        stack.append((column, node))
+    return graph if nodes else None
+
+
+def _is_tree_line(line):
+    return _TREE_LINE_PATTERN.search(line) is not None
+
+
+def find_tree_block(text):
+    """응답 텍스트에서 트리 블록의 줄 목록을 찾습니다. 없으면 None을 반환합니다.
+
+    우선순위: ```tree 코드 블록 → 트리 문자가 있는 코드 블록 → 첫 번째 코드 블록
+    → 트리 문자로 이어지는 줄들(바로 위의 루트 줄 포함). 텍스트는 한 번만 순회합니다.
+    """
+    first_fence = None
+    first_tree_fence = None
+    first_tree_run = None
+    current_run = None
+    fence_lines = None
+    fence_is_tree = False
+    fence_has_tree_lines = False
+    previous_line = ""
+
+    for line in (text or "").splitlines():
+        stripped = line.strip()
+        if fence_lines is not None:
+            if stripped.startswith("```"):
+                # 코드 블록 종료
+                if fence_is_tree:
+                    return fence_lines
+                if first_tree_fence is None and fence_has_tree_lines:
+                    first_tree_fence = fence_lines
+                if first_fence is None:
+                    first_fence = fence_lines
+                fence_lines = None
+            else:
+                fence_lines.append(line)
+                fence_has_tree_lines = fence_has_tree_lines or _is_tree_line(line)
+            continue
+
+        if stripped.startswith("```"):
+            fence_is_tree = stripped[3:].strip().lower() == "tree"
+            fence_has_tree_lines = False
+            fence_lines = []
+            current_run = None
+            continue
+
+        if first_tree_run is None or current_run is not None:
+            if _is_tree_line(line):
+                if current_run is None:
+                    # 트리 바로 위 줄이 루트 노드인 경우가 많으므로 함께 포함
+                    # (콜론으로 끝나는 안내 문장이나 긴 문장은 제외)
+                    root_line = previous_line.strip()
+                    is_root = root_line and len(root_line) <= 60 and not root_line.endswith((":", "."))
+                    current_run = [previous_line] if is_root else []
+                    first_tree_run = current_run
+                current_run.append(line)
+            elif current_run is not None and stripped:
+                current_run = None
+        previous_line = line
+
+    return first_tree_fence or first_fence or first_tree_run or None
+
+
+@lru_cache(maxsize=32)
+def parse_architecture_tree(text):
+    """응답 텍스트에서 트리를 찾아 ArchitectureGraph로 변환합니다. 없으면 None을 반환합니다.
+
+    같은 텍스트는 이전 결과를 재사용하므로 반환된 그래프를 수정하지 마세요.
+    (편집은 apply_edit_ops가 새 그래프로 반환)
+    """
+    block = find_tree_block(text)
+    if not block:
+        return None
+    return _build_graph(block)
+
+
+def has_architecture_tree(text):
+    """응답 텍스트에 노드가 있는 트리가 있으면 True를 반환합니다. (그래프를 만들지 않음)"""
+    block = find_tree_block(text)
+    return bool(block) and any(_split_tree_line(line) is not None for line in block)
+
+
+# =========================================
+# 트리 요약 및 편집 연산
+# =========================================
+def to_summary(graph):
+    """프롬프트 컨텍스트용 압축 요약 (예: AWS Cloud[VPC[EC2;RDS];S3])을 만듭니다."""
+    def _summarize(node):
+        children = graph.children(node.node_id)
+        if not children:
+            return node.label
+        return f"{node.label}[{';'.join(_summarize(child) for child in children)}]"
+
+    return ";".join(_summarize(root) for root in graph.roots())
+
+
+class _EditableNode:
+    """편집 연산 적용 중에 사용하는 가변 노드"""
+
+    __slots__ = ("label", "children", "parent")
+
+    def __init__(self, label, parent=None):
+        self.label = label
+        self.children = []
+        self.parent = parent
+
+    def path(self):
+        labels = []
+        node = self
+        while node is not None:
+            labels.append(node.label)
+            node = node.parent
+        return list(reversed(labels))
+
+
+def _to_editable(graph):
+    """그래프를 가변 트리로 변환합니다."""
+    editable = {}
+    roots = []
+    for node in graph.nodes:
+        parent = editable.get(node.parent_id)
+        item = _EditableNode(node.label, parent)
+        editable[node.node_id] = item
+        (parent.children if parent else roots).append(item)
+    return roots
+
+
+def _from_editable(roots):
+    """가변 트리를 다시 ArchitectureGraph로 변환합니다."""
+    graph = ArchitectureGraph()
+    stack = [(root, None, 0) for root in reversed(roots)]
+    while stack:
+        item, parent_id, depth = stack.pop()
+        node = graph.add_node(item.label, depth, parent_id)
+        for child in reversed(item.children):
+            stack.append((child, node.node_id, depth + 1))
+    return graph
+
+
+def _find_node(roots, reference):
+    """'부모 > 노드' 경로 또는 이름으로 노드를 찾습니다. 없거나 모호하면 None을 반환합니다."""
+    if not reference:
+        return None
+    wanted = [part.strip().lower() for part in str(reference).split(">") if part.strip()]
+    matches = []
+    stack = list(roots)
+    while stack:
+        item = stack.pop()
+        path = [label.lower() for label in item.path()]
+        # 경로 끝부분이 일치하면 후보 (정확한 이름 일치가 우선)
+        if path[-len(wanted):] == wanted:
+            matches.append(item)
+        stack.extend(item.children)
+    if not matches and len(wanted) == 1:
+        # 서비스명만 지정한 경우 (예: "EC2" → "EC2 (t3.micro)")
+        target = normalize_service_name(wanted[0])
+        stack = list(roots)
+        while stack:
+            item = stack.pop()
+            if target and normalize_service_name(item.label) == target:
+                matches.append(item)
+            stack.extend(item.children)
+    return matches[0] if len(matches) == 1 else None
+
+
+def apply_edit_ops(graph, ops):
+    """편집 연산(add/remove/move/rename)을 적용한 새 그래프와 (적용, 실패) 설명 목록을 반환합니다."""
+    roots = _to_editable(graph) if graph else []
+    applied = []
+    failed = []
+
+    for op in ops:
+        if not isinstance(op, dict):
+            failed.append(f"잘못된 연산: {op}")
+            continue
+        kind = str(op.get("op", "")).lower()
+        node_ref = op.get("node")
+
+        if kind == "add":
+            parent = _find_node(roots, op.get("parent")) if op.get("parent") else None
+            if op.get("parent") and parent is None:
+                failed.append(f"추가 실패 (부모 없음): {node_ref} → {op.get('parent')}")
+                continue
+            if not node_ref:
+                failed.append(f"추가 실패 (노드 이름 없음): {op}")
+                continue
+            label = " ".join(str(node_ref).split())
+            (parent.children if parent else roots).append(_EditableNode(label, parent))
+            applied.append(f"+ {label}" + (f" ({parent.label} 아래)" if parent else ""))
+            continue
+
+        target = _find_node(roots, node_ref)
+        if target is None:
+            failed.append(f"{kind or '연산'} 실패 (노드 없음): {node_ref}")
+            continue
+        siblings = target.parent.children if target.parent else roots
+
+        if kind == "remove":
+            siblings.remove(target)
+            applied.append(f"- {target.label}")
+        elif kind == "move":
+            new_parent = _find_node(roots, op.get("parent"))
+            # 자기 자신이나 자손 아래로는 이동할 수 없음
+            ancestor = new_parent
+            while ancestor is not None and ancestor is not target:
+                ancestor = ancestor.parent
+            if new_parent is None or ancestor is target:
+                failed.append(f"이동 실패: {node_ref} → {op.get('parent')}")
+                continue
+            siblings.remove(target)
+            target.parent = new_parent
+            new_parent.children.append(target)
+            applied.append(f"↪ {target.label} → {new_parent.label}")
+        elif kind == "rename" and op.get("label"):
+            old_label = target.label
+            target.label = " ".join(str(op["label"]).split())
+            applied.append(f"✎ {old_label} → {target.label}")
+        else:
+            failed.append(f"지원하지 않는 연산: {op}")
+
+    return _from_editable(roots), applied, failed
+
+
+_EDIT_OPS_BLOCK_PATTERN = re.compile(r"```json\s*\n(.*?)\n\s*```", re.DOTALL)
+
+
+def extract_edit_ops(text):
+    """응답의 ```json 블록에서 편집 연산 목록을 꺼냅니다.
+
+    (연산 목록, 블록을 제거한 텍스트)를 반환하며, 연산 블록이 없으면 (None, 원문)을 반환합니다.
+    """
+    match = _EDIT_OPS_BLOCK_PATTERN.search(text or "")
+    if not match:
+        return None, text
+    try:
+        payload = json.loads(match.group(1))
+    except ValueError:
+        return None, text
+    ops = payload.get("ops") if isinstance(payload, dict) else payload
+    if not isinstance(ops, list):
+        return None, text
+    remaining = (text[:match.start()] + text[match.end():]).strip()
+    return ops, remaining
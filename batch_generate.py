@@ -0,0 +1,271 @@
+"""
+다이어그램 일괄 생성 CLI
+
+Streamlit 없이 여러 아키텍처 트리 파일의 다이어그램을 병렬로 생성합니다.
+입력은 트리 파일이 들어 있는 폴더 또는 매니페스트(JSON 배열/JSON Lines)이며,
+항목별 결과와 소요 시간을 결과 매니페스트(JSON Lines)에 한 줄씩 기록합니다.
+
+같은 결과 매니페스트로 다시 실행하면 이미 성공한 항목(트리 내용, 보안 항목, 렌더링 방식이
+같고 다이어그램 파일이 남아 있는 경우)은 건너뛰고 나머지만 생성합니다.
+
+실행: python batch_generate.py trees/ [--checklist "WAF 설정" ...] [--workers 8]
+      python batch_generate.py trees.jsonl [--backend amazon_q] [--results out.jsonl] [--fresh]
+
+매니페스트 항목: {"tree": "트리 파일 경로", "id": "항목 ID(선택)", "checklist": [...], "backend": "local"}
+(tree 경로는 매니페스트 파일 기준 상대 경로, checklist/backend를 생략하면 명령줄 옵션 사용)
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+from cancellation import CancelToken
+from config import BATCH_SETTINGS, DIAGRAM_SETTINGS
+from diagram_cache import get_diagram_cache, make_cache_key
+from diagram_generator import BASIC_SECURITY_CHECKLIST, AmazonQClient, DiagramManager, generate_diagram_file
+from metrics import set_process_name
+from q_process import format_reclaim_report
+
+SUCCESS = "success"
+FAILURE = "failure"
+
+# 작업 프로세스(또는 스레드 풀 전체)에서 공유하는 생성 리소스
+_lock = threading.Lock()
+_resources = None
+
+# =========================================
+# 입력 목록 만들기
+# =========================================
+def _load_manifest(manifest_path):
+    """매니페스트 파일(JSON 배열 또는 JSON Lines)의 항목 목록을 반환합니다."""
+    text = manifest_path.read_text(encoding="utf-8")
+    if manifest_path.suffix == ".json":
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    # 문자열 항목은 트리 파일 경로만 적은 것으로 처리
+    return [entry if isinstance(entry, dict) else {"tree": entry} for entry in entries]
+
+
+def collect_items(source, pattern, checklist, backend):
+    """폴더 또는 매니페스트에서 생성할 항목 목록을 만듭니다."""
+    source = Path(source)
+    if source.is_dir():
+        entries = [
+            {"tree": str(path), "id": path.relative_to(source).as_posix()}
+            for path in sorted(source.rglob(pattern)) if path.is_file()
+        ]
+        base_dir = Path(".")
+    elif source.suffix in (".json", ".jsonl"):
+        entries = _load_manifest(source)
+        base_dir = source.parent
+    else:
+        raise ValueError(f"트리 폴더 또는 .json/.jsonl 매니페스트가 아닙니다: {source}")
+
+    items = []
+    for entry in entries:
+        tree_path = base_dir / entry["tree"]
+        tree_text = tree_path.read_text(encoding="utf-8")
+        item_checklist = entry.get("checklist", checklist)
+        item_backend = entry.get("backend", backend)
+        items.append({
+            "id": entry.get("id") or entry["tree"],
+            "tree": str(tree_path),
+            "tree_text": tree_text,
+            "checklist": item_checklist,
+            "backend": item_backend,
+            # 트리 내용/보안 항목/프롬프트 버전이 같으면 같은 결과로 보고 재개 시 건너뜀
+            "fingerprint": make_cache_key(tree_text, item_checklist, AmazonQClient.PROMPT_VERSION),
+        })
+    return items
+
+# =========================================
+# 결과 매니페스트
+# =========================================
+def load_results(results_path):
+    """이전 결과 매니페스트를 읽어 항목 ID별 마지막 기록을 반환합니다."""
+    records = {}
+    if not results_path.exists():
+        return records
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 중단된 실행이 쓰다 만 마지막 줄은 무시
+                continue
+            records[record["id"]] = record
+    return records
+
+
+def is_finished(item, record):
+    """이전 기록으로 이미 완료된 항목인지 확인합니다."""
+    return (
+        record is not None
+        and record.get("status") == SUCCESS
+        and record.get("fingerprint") == item["fingerprint"]
+        and record.get("backend") == item["backend"]
+        and bool(record.get("diagram")) and os.path.exists(record["diagram"])
+    )
+
+# =========================================
+# 항목별 생성
+# =========================================
+def _get_resources(output_dir):
+    """다이어그램 매니저, Amazon Q 클라이언트, 다이어그램 캐시를 만들어 재사용합니다."""
+    global _resources
+    with _lock:
+        if _resources is None:
+            # 보관 정책 정리는 세션 참조를 아는 웹 앱에 맡김 (배치가 세션이 보고 있는 파일을 지우지 않도록)
+            _resources = (DiagramManager(output_dir, retention=False), AmazonQClient(), get_diagram_cache())
+        return _resources
+
+
+def generate_item(item, output_dir, submitted_at, cancel_token=None):
+    """항목 하나의 다이어그램을 생성하고 결과 기록(dict)을 반환합니다."""
+    diagram_manager, amazon_q_client, diagram_cache = _get_resources(output_dir)
+    started_at = time.time()
+    diagram_path = None
+    error = None
+    try:
+        # 항목마다 세션 ID를 달리하여 Q 실행 허용 대기열에서 항목들이 공정하게 차례를 받도록 함
+        diagram_path = generate_diagram_file(
+            diagram_manager, amazon_q_client, item["tree_text"], item["checklist"],
+            item["backend"], diagram_cache, session_id=f"batch:{item['id']}", cancel_token=cancel_token,
+        )
+        if not diagram_path:
+            error = "생성된 다이어그램 파일이 없습니다"
+    except Exception as e:
+        error = str(e)
+    finished_at = time.time()
+
+    return {
+        "id": item["id"],
+        "tree": item["tree"],
+        "fingerprint": item["fingerprint"],
+        "checklist": item["checklist"],
+        "backend": item["backend"],
+        "status": SUCCESS if diagram_path else FAILURE,
+        "diagram": diagram_path,
+        "error": error,
+        "queue_seconds": round(started_at - submitted_at, 3),
+        "seconds": round(finished_at - started_at, 3),
+        "started_at": started_at,
+        "finished_at": finished_at,
+    }
+
+# =========================================
+# 일괄 실행
+# =========================================
+def run_batch(items, results_path, output_dir, workers, executor_type, fresh=False, cancel_token=None):
+    """항목들을 병렬로 생성하고 결과를 결과 매니페스트에 추가합니다. (생성, 건너뜀) 기록 목록을 반환합니다.
+
+    Ctrl+C로 중단하면 cancel_token을 취소하여 실행 중인 Q CLI 프로세스 트리를 종료합니다.
+    (Q CLI는 새 세션으로 실행되어 터미널의 Ctrl+C를 직접 받지 않음)
+    """
+    previous = {} if fresh else load_results(results_path)
+    pending, skipped = [], []
+    for item in items:
+        record = previous.get(item["id"])
+        if is_finished(item, record):
+            skipped.append(record)
+        else:
+            pending.append(item)
+
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    if executor_type == "process":
+        # 작업 프로세스는 지표를 내보내지 않음 (웹 앱의 내보내기 파일을 덮어쓰지 않도록)
+        executor_class = partial(ProcessPoolExecutor, initializer=set_process_name, initargs=("batch", False))
+    else:
+        executor_class = ThreadPoolExecutor
+    # 취소 요청은 스레드 사이에서만 전달 가능 (프로세스 실행 시에는 각 프로세스가 종료 시 정리)
+    item_cancel_token = cancel_token if executor_type == "thread" else None
+    records = []
+    with open(results_path, "w" if fresh else "a", encoding="utf-8") as results_file, \
+            executor_class(max_workers=workers) as executor:
+        submitted_at = time.time()
+        futures = [
+            executor.submit(generate_item, item, output_dir, submitted_at, item_cancel_token) for item in pending
+        ]
+        try:
+            for done_count, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                # 완료되는 대로 한 줄씩 기록하여 중단되어도 다음 실행에서 이어서 진행
+                results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                results_file.flush()
+                records.append(record)
+                mark = "ok  " if record["status"] == SUCCESS else "FAIL"
+                detail = record["diagram"] if record["status"] == SUCCESS else record["error"]
+                print(f"[{done_count}/{len(pending)}] {mark} {record['id']} ({record['seconds']:.1f}s) {detail}")
+        except KeyboardInterrupt:
+            # 시작하지 않은 항목은 취소하고, 실행 중인 항목은 Q CLI를 종료하여 바로 끝나도록 함
+            for future in futures:
+                future.cancel()
+            if cancel_token is not None:
+                cancel_token.cancel()
+            print("\n중단합니다. 실행 중인 Q CLI 프로세스를 종료하는 중...", file=sys.stderr)
+            raise
+    return records, skipped
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="트리 파일 폴더 또는 매니페스트(.json/.jsonl)")
+    parser.add_argument("--pattern", default=BATCH_SETTINGS['pattern'], help="폴더 입력 시 트리 파일 패턴")
+    parser.add_argument("--checklist", action="append", default=[], choices=BASIC_SECURITY_CHECKLIST,
+                        metavar="ITEM", help="다이어그램에 포함할 보안 항목 (여러 번 지정 가능)")
+    parser.add_argument("--all-checklist", action="store_true", help="기본 보안 체크리스트 전체 적용")
+    parser.add_argument("--backend", choices=["local", "amazon_q"], default=DIAGRAM_SETTINGS.get('backend', 'local'),
+                        help="local: graphviz 렌더링(불가능하면 Amazon Q), amazon_q: 항상 Amazon Q")
+    parser.add_argument("--workers", type=int, default=BATCH_SETTINGS['workers'], help="동시에 생성할 항목 수")
+    parser.add_argument("--executor", choices=["thread", "process"], default=BATCH_SETTINGS['executor'])
+    parser.add_argument("--output-dir", default="generated-diagrams", help="다이어그램 저장 폴더")
+    parser.add_argument("--results", default=BATCH_SETTINGS['results_path'], help="결과 매니페스트 경로")
+    parser.add_argument("--fresh", action="store_true", help="이전 결과를 무시하고 모든 항목을 다시 생성")
+    args = parser.parse_args()
+    set_process_name("batch")
+
+    checklist = list(BASIC_SECURITY_CHECKLIST) if args.all_checklist else args.checklist
+    try:
+        items = collect_items(args.source, args.pattern, checklist, args.backend)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"입력을 읽을 수 없습니다: {e}", file=sys.stderr)
+        return 2
+
+    started_at = time.perf_counter()
+    cancel_token = CancelToken()
+    try:
+        records, skipped = run_batch(
+            items, Path(args.results), args.output_dir, args.workers, args.executor, args.fresh, cancel_token
+        )
+    except KeyboardInterrupt:
+        for report in cancel_token.reports:
+            print(f"  {format_reclaim_report(report)}", file=sys.stderr)
+        print(f"중단됨 · 완료된 항목은 {args.results}에 기록되어 다음 실행에서 건너뜁니다.", file=sys.stderr)
+        return 130
+    wall_seconds = time.perf_counter() - started_at
+
+    succeeded = [r for r in records if r["status"] == SUCCESS]
+    failed = [r for r in records if r["status"] != SUCCESS]
+    print(f"\n총 {len(items)}개: 생성 {len(succeeded)}, 실패 {len(failed)}, 건너뜀(완료됨) {len(skipped)} "
+          f"· {wall_seconds:.1f}초 · 결과: {args.results}")
+    if records:
+        seconds = [r["seconds"] for r in records]
+        print(f"항목별 소요 시간 p50 {statistics.median(seconds):.2f}s · p95 {_percentile(seconds, 95):.2f}s "
+              f"· 최대 {max(seconds):.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+앱 종단 간(end-to-end) 오프라인 벤치마크
+
+실제 AWS/Google 서비스 없이 Q CLI 대역(fakes/fake_q.py)과 Gemini 대역(fakes/fake_gemini.py)으로
+main.py를 streamlit AppTest로 구동합니다. N개의 세션이 동시에 "채팅 → 제작하기"를 반복하며
+채팅 응답 시간, 다이어그램 생성 종단 간 시간(작업 큐 대기 포함), 처리량을 측정합니다.
+
+실행: python benchmarks/bench_app.py [--sessions 4] [--rounds 2] [--q-delay 1.0]
+      [--q-tail 0] [--gemini-latency 0.5] [--response-chars 1500] [--backend amazon_q|local]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+FAKE_Q_PATH = os.path.join(BENCH_DIR, "fakes", "fake_q.py")
+
+# AppTest는 실행할 때마다 전역 Runtime 인스턴스를 설정/해제하므로 스크립트 실행(rerun)은 한 번에 하나씩만 함
+# (다이어그램 생성 작업은 백그라운드 스레드에서 동시에 진행됨)
+_run_lock = threading.Lock()
+
+
+def configure_environment(args):
+    """대역을 쓰도록 환경 변수를 설정하고 임시 작업 폴더로 이동합니다. (config 로드 전에 호출)"""
+    os.environ["AMAZON_Q_PATH"] = FAKE_Q_PATH
+    os.environ["GOOGLE_API_KEY"] = "fake-key"
+    os.environ["FAKE_Q_DELAY"] = str(args.q_delay)
+    os.environ["FAKE_Q_TAIL"] = str(args.q_tail)
+    os.environ["FAKE_GEMINI_LATENCY"] = str(args.gemini_latency)
+    os.environ["FAKE_GEMINI_RESPONSE_CHARS"] = str(args.response_chars)
+    # 캐시/다이어그램/지표 파일이 저장소를 더럽히지 않도록 임시 폴더에서 실행
+    os.chdir(tempfile.mkdtemp(prefix="bench-app-"))
+
+    from fakes.fake_gemini import install
+    install()
+    _use_thread_session_ids()
+
+
+def _use_thread_session_ids():
+    """AppTest는 모든 세션에 같은 ID("test session id")를 쓰므로 스레드마다 다른 세션 ID를 쓰게 합니다.
+
+    Q 실행 허용 대기열은 세션 ID별로 요청을 나누므로, 같은 ID면 세션들이 한 세션처럼 거절됩니다.
+    """
+    from streamlit.runtime.scriptrunner.script_runner import ScriptRunner
+
+    original_init = ScriptRunner.__init__
+
+    def __init__(self, *args, session_id, **kwargs):
+        original_init(self, *args, session_id=threading.current_thread().name, **kwargs)
+
+    ScriptRunner.__init__ = __init__
+
+
+def _run(at, action=None):
+    """AppTest 실행 잠금을 잡고 스크립트를 다시 실행한 뒤 실행 시간(잠금 대기 제외)을 반환합니다."""
+    with _run_lock:
+        started_at = time.perf_counter()
+        (action or at).run()
+        return time.perf_counter() - started_at
+
+
+def run_session(index, args, results):
+    """세션 하나가 rounds번 채팅과 다이어그램 생성을 반복하며 측정값을 기록합니다."""
+    from streamlit.testing.v1 import AppTest
+    from job_queue import get_job_manager
+
+    at = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=args.timeout)
+    at.session_state["show_landing"] = False
+    _run(at)
+    if args.backend == "amazon_q":
+        _run(at, at.checkbox(key="use_amazon_q").check())
+
+    for round_index in range(args.rounds):
+        if at.exception or not at.chat_input:
+            results["errors"].append(str(at.exception) if at.exception else "채팅 입력창이 표시되지 않았습니다.")
+            return
+        # 1. 채팅으로 아키텍처 설계 (세션/라운드마다 다른 요청 → 다른 트리)
+        results["chat"].append(
+            _run(at, at.chat_input[0].set_value(f"세션 {index} 라운드 {round_index}: 서울 리전 웹 서비스 설계"))
+        )
+
+        # 2. 제작하기 → 백그라운드 작업이 끝날 때까지 확인
+        clicked_at = time.time()
+        _run(at, at.button(key="create_diagram_button").click())
+        job_id = at.session_state["diagram_job_id"]
+        job = get_job_manager().get(job_id) if job_id else None
+        while job is not None and not job.finished:
+            time.sleep(0.05)
+        _run(at)
+
+        if job is None or not at.session_state["current_diagram"] or at.session_state["generation_warnings"]:
+            results["failures"] += 1
+            results["errors"].extend(at.session_state["generation_warnings"])
+            continue
+        results["e2e"].append(job.finished_at - clicked_at)
+        results["queue_wait"].append(job.started_at - job.created_at)
+
+
+def _summary(values):
+    if not values:
+        return "-"
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    return f"n={len(values):<4} p50={statistics.median(values):7.2f}s p95={p95:7.2f}s max={max(values):7.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4, help="동시 세션 수")
+    parser.add_argument("--rounds", type=int, default=2, help="세션당 채팅+제작 반복 횟수")
+    parser.add_argument("--q-delay", type=float, default=1.0, help="Q CLI 대역의 실행 시간(초)")
+    parser.add_argument("--q-tail", type=float, default=0.0, help="Q CLI 대역이 PNG 저장 후 출력을 계속하는 시간(초)")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="Gemini 대역의 응답 지연(초)")
+    parser.add_argument("--response-chars", type=int, default=1500, help="Gemini 대역의 응답 길이(자)")
+    parser.add_argument("--backend", choices=["amazon_q", "local"], default="amazon_q",
+                        help="amazon_q: 고급 렌더링 선택, local: graphviz(없으면 Q로 대체)")
+    parser.add_argument("--timeout", type=float, default=120, help="AppTest 실행 한 번의 최대 시간(초)")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    results = {"chat": [], "e2e": [], "queue_wait": [], "failures": 0, "errors": []}
+
+    started_at = time.perf_counter()
+    threads = [
+        threading.Thread(target=run_session, args=(index, args, results), name=f"session-{index}")
+        for index in range(args.sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started_at
+
+    print(f"sessions={args.sessions} rounds={args.rounds} backend={args.backend} "
+          f"q_delay={args.q_delay}s q_tail={args.q_tail}s gemini_latency={args.gemini_latency}s")
+    print(f"chat response      {_summary(results['chat'])}")
+    print(f"diagram end-to-end {_summary(results['e2e'])}")
+    print(f"job queue wait     {_summary(results['queue_wait'])}")
+    print(f"throughput         {len(results['e2e']) / wall_seconds:.2f} diagrams/s "
+          f"({len(results['e2e'])} ok, {results['failures']} failed, {wall_seconds:.1f}s wall)")
+    for error in results["errors"][:5]:
+        print(f"  ! {error}")
+
+    # 앱 내부 단계별 지표 (metrics 모듈)
+    from metrics import get_metrics
+    print()
+    for summary in get_metrics().histogram_summaries():
+        labels = "".join(f" {k}={v}" for k, v in summary["labels"].items())
+        print(f"{summary['name'] + labels:<45} n={summary['count']:<4} "
+              f"p50={summary['p50'] * 1000:9.1f}ms p95={summary['p95'] * 1000:9.1f}ms")
+
+    # 챗봇 턴당 평균 입력 토큰 (system instruction + 대화 기록 + 메시지, Gemini 사용량 정보 기준)
+    counters = get_metrics().counters()
+    chat_turns = sum(value for name, labels, value in counters
+                     if name == "gemini_chat_total" and labels.get("outcome") == "success")
+    input_tokens = sum(value for name, _, value in counters if name == "gemini_chat_input_tokens_total")
+    if chat_turns and input_tokens:
+        print(f"{'gemini_chat_input_tokens per turn':<45} avg={input_tokens / chat_turns:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+챗봇 컨텍스트 크기 벤치마크
+
+기존 트리 전체를 보내는 프롬프트와, 트리 요약 + 편집 연산을 요청하는 프롬프트의
+입력 크기를 트리 크기별로 비교합니다. 토큰 수는 기본적으로 문자 수 기반 추정치이며,
+--live를 주면 Gemini count_tokens와 실제 응답 시간을 측정합니다.
+
+--turns를 주면 고정 지시문을 매 메시지에 넣는 방식(inline)과 system instruction + 대화 기록
+방식(session)으로 여러 턴을 대화하며 턴별 입력 토큰과 응답 시간을 비교합니다.
+기본은 Gemini 대역(fakes/fake_gemini.py, 고정 지연 + FAKE_GEMINI_PREFILL_MS로 입력 크기 비례 지연)이며
+--live면 실제 Gemini의 사용량 정보와 응답 시간으로 측정합니다.
+
+실행: python benchmarks/bench_chat_context.py [--nodes 10 50 200] [--turns 6] [--live]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from architecture_tree import parse_architecture_tree, to_summary  # noqa: E402
+from bench_tree_parser import build_tree_lines  # noqa: E402
+from chat_prompts import CHAT_SYSTEM_INSTRUCTION, build_full_chat_prompt, build_incremental_chat_prompt  # noqa: E402
+from config import CHAT_SETTINGS  # noqa: E402
+from gemini_client import estimate_tokens, input_token_count, trim_chat_history  # noqa: E402
+
+USER_MESSAGE = "Private Subnet에 ElastiCache Redis를 추가해줘"
+
+# --turns 대화에서 차례로 보내는 사용자 요청
+CONVERSATION = [
+    "서울 리전에 ALB와 EC2 두 대, RDS로 웹 서비스를 구성해줘",
+    "Private Subnet에 ElastiCache Redis를 추가해줘",
+    "정적 파일은 S3와 CloudFront로 제공해줘",
+    "EC2를 Auto Scaling Group으로 바꿔줘",
+    "RDS를 Multi-AZ로 구성하려면 어떻게 해야 해?",
+    "WAF를 ALB 앞에 추가해줘",
+]
+
+
+def build_prompts(node_count):
+    """트리 크기별 전체/증분 프롬프트를 만듭니다."""
+    tree = parse_architecture_tree("\n".join(build_tree_lines(node_count))).to_text()
+    graph = parse_architecture_tree(tree)
+    return (
+        build_full_chat_prompt(USER_MESSAGE, tree),
+        build_incremental_chat_prompt(USER_MESSAGE, to_summary(graph)),
+    )
+
+
+def measure_live(prompt):
+    """Gemini로 입력 토큰 수와 응답 시간/출력 길이를 측정합니다."""
+    import google.generativeai as genai
+    from config import GEMINI_MODEL, GOOGLE_API_KEY
+
+    genai.configure(api_key=GOOGLE_API_KEY)
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    input_tokens = model.count_tokens(prompt).total_tokens
+    started_at = time.monotonic()
+    response = model.generate_content(prompt)
+    return input_tokens, time.monotonic() - started_at, len(response.text or "")
+
+
+def create_model(live, system_instruction):
+    """측정에 사용할 모델 (실제 Gemini 또는 대역)을 만듭니다."""
+    if live:
+        from config import GEMINI_MODEL, GOOGLE_API_KEY
+        from gemini_client import create_gemini_model
+
+        return create_gemini_model(GOOGLE_API_KEY, GEMINI_MODEL, system_instruction)
+    from fakes.fake_gemini import FakeGenerativeModel
+
+    return FakeGenerativeModel(system_instruction=system_instruction)
+
+
+def run_conversation(layout, turns, node_count, live, history_budget):
+    """layout 방식으로 turns번 대화하며 턴별 (전체 입력 토큰, 이번 턴 메시지 토큰, 응답 시간)을 반환합니다.
+
+    inline: 고정 지시문을 매 메시지 앞에 붙이고 대화 기록 없이 보냄 (변경 전 방식)
+    session: 고정 지시문은 system instruction, 이전 대화는 토큰 예산 안에서 대화 기록으로 보냄
+    """
+    model = create_model(live, CHAT_SYSTEM_INSTRUCTION if layout == "session" else None)
+    summary = to_summary(parse_architecture_tree("\n".join(build_tree_lines(node_count))))
+    history = []
+    results = []
+    for turn in range(turns):
+        user_message = CONVERSATION[turn % len(CONVERSATION)]
+        message = build_incremental_chat_prompt(user_message, summary)
+        if layout == "inline":
+            contents = CHAT_SYSTEM_INSTRUCTION + message
+        else:
+            contents = trim_chat_history(history, history_budget)
+            contents.append({"role": "user", "parts": [message]})
+        started_at = time.monotonic()
+        response = model.generate_content(contents)
+        seconds = time.monotonic() - started_at
+        message_tokens = estimate_tokens(contents if layout == "inline" else message)
+        results.append((input_token_count(response), message_tokens, seconds))
+        history += [{"role": "user", "parts": [user_message]}, {"role": "model", "parts": [response.text]}]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--turns", type=int, default=0, help="대화 턴별 비교 (0이면 생략)")
+    parser.add_argument("--turn-nodes", type=int, default=50, help="대화 턴별 비교에 사용할 트리 노드 수")
+    parser.add_argument("--history-budget", type=int, default=CHAT_SETTINGS['history_token_budget'],
+                        help="session 방식에서 함께 보낼 대화 기록의 토큰 예산")
+    parser.add_argument("--live", action="store_true", help="Gemini API로 실제 토큰 수와 지연 시간 측정")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>6} {'full chars':>11} {'delta chars':>12} {'full tok~':>10} {'delta tok~':>11} {'saved':>7}")
+    for node_count in args.nodes:
+        full_prompt, delta_prompt = build_prompts(node_count)
+        full_tokens, delta_tokens = estimate_tokens(full_prompt), estimate_tokens(delta_prompt)
+        print(f"{node_count:>6} {len(full_prompt):>11} {len(delta_prompt):>12} {full_tokens:>10.0f} "
+              f"{delta_tokens:>11.0f} {1 - delta_tokens / full_tokens:>7.0%}")
+        if args.live:
+            for name, prompt in (("full", full_prompt), ("delta", delta_prompt)):
+                tokens, seconds, output_chars = measure_live(prompt)
+                print(f"       {name:>5}: 입력 {tokens} 토큰, 응답 {seconds:.1f}초, 출력 {output_chars}자")
+
+    if args.turns:
+        inline = run_conversation("inline", args.turns, args.turn_nodes, args.live, args.history_budget)
+        session = run_conversation("session", args.turns, args.turn_nodes, args.live, args.history_budget)
+        print(f"\n대화 {args.turns}턴 (트리 {args.turn_nodes}노드, 대화 기록 예산 {args.history_budget}토큰)")
+        print("(입력 = system instruction + 대화 기록 + 메시지, 메시지 = 이번 턴에 새로 보낸 부분의 추정치)")
+        print(f"{'turn':>5} {'inline 입력':>10} {'메시지':>7} {'초':>6} {'session 입력':>12} {'메시지':>7} {'초':>6}")
+        for turn, (inline_result, session_result) in enumerate(zip(inline, session), 1):
+            columns = [f"{tokens:>10} {message_tokens:>7.0f} {seconds:>6.2f}"
+                       for tokens, message_tokens, seconds in (inline_result, session_result)]
+            print(f"{turn:>5} {columns[0]}   {columns[1]}")
+        # 과금되는 입력 토큰은 system instruction과 대화 기록을 포함한 합계
+        totals = [
+            f"{sum(tokens or 0 for tokens, _, _ in results):>10} {'':>7} "
+            f"{sum(seconds for _, _, seconds in results) / len(results):>6.2f}"
+            for results in (inline, session)
+        ]
+        print(f"{'합계/평균':>5} {totals[0]}   {totals[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+콜드 스타트 벤치마크
+
+새 파이썬 프로세스에서 다음을 측정합니다.
+1. 주요 의존성별 import 시간 (python -X importtime의 누적 시간)
+2. 랜딩 화면 첫 렌더링 시간과 메인 화면 첫 렌더링 시간 (streamlit AppTest)
+
+실행: python benchmarks/bench_startup.py [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["streamlit", "google.generativeai", "PIL.Image", "dotenv", "sqlite3"]
+
+# 새 프로세스에서 main.py를 한 번 실행하고 걸린 시간(초)을 출력하는 스크립트
+_RUN_APP = """
+import sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({main!r}, default_timeout=120)
+at.session_state["show_landing"] = {landing!r}
+at.run()
+assert not at.exception, at.exception
+print(time.perf_counter() - started)
+print(int("google.generativeai" in sys.modules))
+"""
+
+
+def import_time_ms(module):
+    """새 프로세스에서 모듈을 import할 때의 누적 시간(ms)을 반환합니다."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=ROOT,
+    )
+    # 형식: "import time: self [us] | cumulative | imported package"
+    for line in reversed(result.stderr.splitlines()):
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return float("nan")
+
+
+def app_first_run(landing):
+    """새 프로세스에서 앱 첫 실행 시간(초)과 Gemini SDK 로드 여부를 반환합니다."""
+    script = _RUN_APP.format(main=os.path.join(ROOT, "main.py"), landing=landing)
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, cwd=ROOT,
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    seconds, sdk_loaded = result.stdout.split()[-2:]
+    return float(seconds), sdk_loaded == "1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'module':<22} {'import(ms)':>11}")
+    for module in MODULES:
+        timings = [import_time_ms(module) for _ in range(args.repeat)]
+        print(f"{module:<22} {statistics.median(timings):>11.1f}")
+
+    print()
+    print(f"{'first run':<22} {'median(s)':>11} {'gemini sdk loaded':>18}")
+    for name, landing in (("landing page", True), ("main page", False)):
+        runs = [app_first_run(landing) for _ in range(args.repeat)]
+        print(f"{name:<22} {statistics.median(s for s, _ in runs):>11.2f} {str(runs[-1][1]):>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+트리 구조 추출 마이크로 벤치마크
+
+기존 정규식 방식(extract_tree_structure의 이전 구현)과 architecture_tree의
+단일 순회 파서를 큰 응답 텍스트에서 비교합니다. parser는 처음 보는 텍스트의 파싱,
+cached는 같은 텍스트를 다시 파싱(채팅 턴마다 현재 트리를 다시 읽는 경우)한 시간입니다.
+
+실행: python benchmarks/bench_tree_parser.py [--nodes 200 2000 20000] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from architecture_tree import has_architecture_tree, parse_architecture_tree  # noqa: E402
+
+# 캐시를 거치지 않는 파서 (처음 보는 텍스트의 파싱 시간 측정용)
+parse_uncached = parse_architecture_tree.__wrapped__
+
+SERVICES = ["EC2", "RDS", "S3", "Lambda", "ElastiCache Redis", "ALB", "NAT Gateway", "CloudWatch"]
+
+
+def legacy_extract_tree_structure(text):
+    """이전 정규식 기반 구현 (비교용)"""
+    tree_patterns = [
+        r'```tree\s*\n(.*?)\n```',
+        r'```\s*\n(.*?)\n```',
+        r'^\s*[├└│─]+.*$',
+        r'^\s*[┌└├│─]+.*$',
+        r'^\s*[│├└─]+.*$',
+    ]
+    for pattern in tree_patterns:
+        matches = re.findall(pattern, text, re.MULTILINE | re.DOTALL)
+        if matches:
+            return matches[0].strip()
+    return text
+
+
+def build_tree_lines(node_count, fan_out=4, max_depth=6):
+    """node_count개 노드를 갖는 트리 텍스트 줄을 만듭니다."""
+    lines = ["AWS Cloud (ap-northeast-2)"]
+    prefixes = [""]
+    created = 0
+    while created < node_count:
+        prefix = prefixes[-1]
+        for index in range(fan_out):
+            if created >= node_count:
+                break
+            is_last = index == fan_out - 1
+            lines.append(f"{prefix}{'└─' if is_last else '├─'} {SERVICES[created % len(SERVICES)]} #{created}")
+            created += 1
+        # 마지막 자식 아래로 한 단계씩 내려가다가 최대 깊이에서 다시 얕은 곳으로 돌아감
+        prefixes = prefixes + [prefix + "   "] if len(prefixes) < max_depth else prefixes[:1]
+    return lines
+
+
+def build_responses(node_count):
+    """트리 형태별 응답 텍스트(코드 블록 / 코드 블록 없는 트리)를 만듭니다."""
+    prose = "이 아키텍처는 고가용성을 위해 여러 가용 영역에 걸쳐 구성됩니다. " * 20
+    tree = "\n".join(build_tree_lines(node_count))
+    return {
+        "fenced": f"{prose}\n\n```\n{tree}\n```\n\n{prose}",
+        "bare": f"{prose}\n\n{tree}\n\n{prose}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[200, 2000, 20000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'shape':>7} {'chars':>10} {'regex(ms)':>10} {'parser(ms)':>11} "
+          f"{'parse+text(ms)':>15} {'cached(ms)':>11} {'has_tree(ms)':>13} {'regex lines':>12} {'tree lines':>11}")
+    for node_count in args.nodes:
+        for shape, text in build_responses(node_count).items():
+            number = max(1, 2000 // node_count)
+            legacy = min(timeit.repeat(lambda: legacy_extract_tree_structure(text),
+                                       number=number, repeat=args.repeat)) / number
+            parsed = min(timeit.repeat(lambda: parse_uncached(text),
+                                       number=number, repeat=args.repeat)) / number
+            canonical = min(timeit.repeat(lambda: parse_uncached(text).to_text(),
+                                          number=number, repeat=args.repeat)) / number
+            parse_architecture_tree(text)
+            cached = min(timeit.repeat(lambda: parse_architecture_tree(text),
+                                       number=number, repeat=args.repeat)) / number
+            detected = min(timeit.repeat(lambda: has_architecture_tree(text),
+                                         number=number, repeat=args.repeat)) / number
+            # 추출된 줄 수: 정규식 방식은 코드 블록이 없으면 트리 뒤의 본문까지 포함함
+            legacy_lines = len(legacy_extract_tree_structure(text).splitlines())
+            tree_lines = len(parse_architecture_tree(text).nodes)
+            print(f"{node_count:>8} {shape:>7} {len(text):>10} {legacy * 1000:>10.3f} "
+                  f"{parsed * 1000:>11.3f} {canonical * 1000:>15.3f} {cached * 1000:>11.3f} "
+                  f"{detected * 1000:>13.3f} {legacy_lines:>12} {tree_lines:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Gemini 모델 대역(fake)
+
+install()을 호출하면 google.generativeai의 GenerativeModel/configure를 대역으로 바꿉니다.
+응답 지연(FAKE_GEMINI_LATENCY초)과 응답 크기(FAKE_GEMINI_RESPONSE_CHARS자)는 환경 변수로 조정하며,
+FAKE_GEMINI_PREFILL_MS를 주면 입력 1000토큰당 그만큼(ms) 첫 응답이 늦어집니다. (입력 크기에 따른 지연 모사)
+프롬프트 종류(설계/증분 편집/보안 분석)에 맞는 형식의 응답을 돌려줍니다.
+응답의 usage_metadata에는 system instruction과 대화 기록을 포함한 입력 토큰 수(추정치)를 담습니다.
+"""
+import asyncio
+import hashlib
+import os
+import time
+
+from gemini_client import estimate_tokens
+
+_FILLER = "이 구성은 가용성과 보안을 고려하여 설계되었습니다. "
+
+
+class _Usage:
+    def __init__(self, prompt_token_count):
+        self.prompt_token_count = prompt_token_count
+
+
+class _Response:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _StreamResponse:
+    """청크를 순회할 수 있고, 다 읽은 뒤 usage_metadata를 제공하는 스트리밍 응답"""
+
+    def __init__(self, chunks, usage_metadata):
+        self._chunks = chunks
+        self.usage_metadata = usage_metadata
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+class _TokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class FakeGenerativeModel:
+    """generate_content(_async)/count_tokens만 흉내 내는 Gemini 모델"""
+
+    def __init__(self, model_name="fake-gemini", system_instruction=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+        self.latency = float(os.environ.get("FAKE_GEMINI_LATENCY", "0.5"))
+        self.response_chars = int(os.environ.get("FAKE_GEMINI_RESPONSE_CHARS", "1500"))
+        self.prefill_seconds_per_token = float(os.environ.get("FAKE_GEMINI_PREFILL_MS", "0")) / 1000 / 1000
+
+    @staticmethod
+    def _texts(contents):
+        """프롬프트(문자열 또는 start_chat history 형식의 목록)의 텍스트 목록을 반환합니다."""
+        if isinstance(contents, str):
+            return [contents]
+        return [str(part) for content in contents for part in content["parts"]]
+
+    def _usage(self, contents):
+        return _Usage(round(sum(map(estimate_tokens, [self.system_instruction] + self._texts(contents)))))
+
+    def _respond(self, contents):
+        """프롬프트 종류에 맞는 응답 텍스트를 만듭니다. (대화 기록이 있으면 마지막 메시지 기준)"""
+        prompt = self._texts(contents)[-1]
+        # 사용자 요청마다 다른 트리가 나오도록 프롬프트 해시로 노드 이름을 만듦 (캐시 미스 유도)
+        tag = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:6]
+        if "보안 구성요소를 분석" in self.system_instruction + prompt:
+            body = "## 현재 보안 구성요소 분석\n"
+        elif "현재 아키텍처" in prompt:
+            body = (
+                "요청하신 변경 사항입니다.\n```json\n"
+                f'{{"ops": [{{"op": "add", "parent": "Private Subnet", "node": "Lambda ({tag})"}}]}}\n```\n'
+            )
+        else:
+            body = (
+                "요청하신 아키텍처입니다.\n```\n"
+                "AWS Cloud\n├─ VPC\n│  ├─ Public Subnet\n│  │  ├─ ALB\n│  │  └─ EC2 ({tag})\n"
+                "│  └─ Private Subnet\n│     └─ RDS\n└─ S3\n```\n"
+            )
+        padding = max(0, self.response_chars - len(body))
+        return body + (_FILLER * (padding // len(_FILLER) + 1))[:padding]
+
+    def _prefill_seconds(self, contents):
+        return self._usage(contents).prompt_token_count * self.prefill_seconds_per_token
+
+    def _stream(self, text, prefill_seconds):
+        # 첫 청크까지 입력 처리 시간 + 지연의 30%, 나머지는 청크 사이에 나누어 대기
+        chunks = [text[i:i + 200] for i in range(0, len(text), 200)] or [""]
+        time.sleep(prefill_seconds + self.latency * 0.3)
+        for chunk in chunks:
+            yield _Response(chunk)
+            time.sleep(self.latency * 0.7 / len(chunks))
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        text = self._respond(contents)
+        if stream:
+            return _StreamResponse(self._stream(text, self._prefill_seconds(contents)), self._usage(contents))
+        time.sleep(self._prefill_seconds(contents) + self.latency)
+        return _Response(text, self._usage(contents))
+
+    async def generate_content_async(self, contents, **kwargs):
+        await asyncio.sleep(self._prefill_seconds(contents) + self.latency)
+        return _Response(self._respond(contents), self._usage(contents))
+
+    def count_tokens(self, contents):
+        return _TokenCount(self._usage(contents).prompt_token_count)
+
+
+def install():
+    """google.generativeai의 모델 생성과 API 키 설정을 대역으로 바꿉니다."""
+    import google.generativeai as genai
+
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.configure = lambda **kwargs: None
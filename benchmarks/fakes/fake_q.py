@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Amazon Q CLI 대역(fake) 실행 파일
+
+AMAZON_Q_PATH로 지정하면 실제 Q CLI 대신 사용됩니다. `q chat "<프롬프트>"`를 받으면
+FAKE_Q_DELAY초 동안 기다린 뒤 프롬프트에 적힌 출력 폴더(없으면 generated-diagrams)에
+작은 PNG를 저장합니다. FAKE_Q_FAIL_RATE(0~1)의 확률로 실패(종료 코드 1)합니다.
+실제 Q CLI처럼 PNG를 저장한 뒤에도 FAKE_Q_TAIL초 동안 응답을 출력하다가 종료합니다.
+FAKE_Q_MCP_SERVERS개의 MCP 서버 대역(메모리를 점유하고 대기하는 자식 프로세스)을 함께 띄우며,
+정상 종료나 Ctrl+C 때만 서버를 정리하므로 강제 종료되면 서버가 고아 프로세스로 남습니다.
+
+예: AMAZON_Q_PATH=benchmarks/fakes/fake_q.py streamlit run main.py
+"""
+import os
+import random
+import re
+import struct
+import subprocess
+import sys
+import time
+import zlib
+
+
+def make_png(width=64, height=48):
+    """단색 RGB PNG 바이트를 만듭니다."""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    row = b"\x00" + b"\xff\x99\x00" * width
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+# MCP 서버 대역: 메모리 32MB를 점유하고 종료될 때까지 대기
+MCP_SERVER_CODE = "import time; data = b'x' * (32 * 1024 * 1024); time.sleep(3600)"
+
+
+def start_mcp_servers(count):
+    """MCP 서버 대역 자식 프로세스를 시작합니다."""
+    return [
+        subprocess.Popen([sys.executable, "-c", MCP_SERVER_CODE], stdin=subprocess.DEVNULL)
+        for _ in range(count)
+    ]
+
+
+def main(argv):
+    if "--version" in argv:
+        print("fake-q 1.0")
+        return 0
+    if len(argv) < 2 or argv[0] != "chat":
+        print("usage: fake_q.py chat <prompt>", file=sys.stderr)
+        return 2
+
+    prompt = argv[-1]
+    mcp_servers = start_mcp_servers(int(os.environ.get("FAKE_Q_MCP_SERVERS", "0")))
+    try:
+        return chat(prompt)
+    finally:
+        for server in mcp_servers:
+            server.kill()
+
+
+def chat(prompt):
+    """프롬프트를 처리하고 종료 코드를 반환합니다."""
+    delay = float(os.environ.get("FAKE_Q_DELAY", "1.0"))
+    # 도구 호출 진행 상황을 출력하며 대기
+    steps = max(1, int(delay / 0.25))
+    for step in range(steps):
+        print(f"Using tool: generate_diagram ({step + 1}/{steps})", flush=True)
+        time.sleep(delay / steps)
+    if random.random() < float(os.environ.get("FAKE_Q_FAIL_RATE", "0")):
+        print("fake-q: simulated failure", file=sys.stderr)
+        return 1
+
+    # AmazonQClient.generate_diagram_prompt의 "Save as PNG file in the <폴더> folder" 문구에서 출력 폴더 추출
+    match = re.search(r"Save as PNG file in the (.+?) folder", prompt)
+    output_dir = match.group(1) if match else "generated-diagrams"
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"diagram_{time.time_ns()}.png")
+    with open(path, "wb") as f:
+        f.write(make_png())
+    print(f"Diagram saved to {path}", flush=True)
+
+    # 저장 후에도 다이어그램 설명을 출력하는 동안 종료하지 않음
+    tail_seconds = float(os.environ.get("FAKE_Q_TAIL", "0"))
+    tail_started_at = time.monotonic()
+    while time.monotonic() - tail_started_at < tail_seconds:
+        print("The diagram shows the architecture components and their connections.", flush=True)
+        time.sleep(0.25)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
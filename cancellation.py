@@ -0,0 +1,71 @@
+"""
+작업 취소 모듈
+
+UI 스레드에서 취소를 요청하면 작업 스레드의 대기(실행 허용 대기열, Q CLI 실행)를 바로 깨워
+중단시킬 수 있도록 취소 요청과 콜백을 전달합니다.
+"""
+import threading
+from contextlib import contextmanager
+
+
+class OperationCancelled(Exception):
+    """사용자가 취소한 작업에서 발생하는 예외"""
+
+
+class CancelToken:
+    """작업 하나의 취소 요청 (cancel은 어느 스레드에서나 호출 가능)"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        # 취소/시간 초과로 종료한 프로세스의 회수 자원 보고 목록
+        self.reports = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """취소를 요청하고 등록된 콜백을 호출합니다. 이미 취소되었으면 아무것도 하지 않습니다."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled("사용자가 작업을 취소했습니다.")
+
+    @contextmanager
+    def on_cancel(self, callback):
+        """블록 안에서 취소되면 callback()을 호출합니다. 이미 취소되어 있으면 바로 호출합니다."""
+        with self._lock:
+            already_cancelled = self._event.is_set()
+            if not already_cancelled:
+                self._callbacks.append(callback)
+        if already_cancelled:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+    def add_report(self, report):
+        with self._lock:
+            self.reports.append(report)
+
+
+@contextmanager
+def on_cancel(cancel_token, callback):
+    """cancel_token이 None일 수도 있는 호출부에서 쓰는 CancelToken.on_cancel"""
+    if cancel_token is None:
+        yield
+    else:
+        with cancel_token.on_cancel(callback):
+            yield
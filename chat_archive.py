@@ -0,0 +1,86 @@
+"""
+채팅 기록 보관 모듈
+
+세션 상태에 보관하는 메시지 수 한도를 넘은 오래된 채팅 메시지를
+세션 ID별로 로컬 SQLite 파일에 옮겨 두고, "이전 메시지 더 보기" 시 구간 단위로 읽어옵니다.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+from config import CHAT_ARCHIVE_SETTINGS
+
+_lock = threading.Lock()
+_instance = None
+
+
+class ChatArchive:
+    """세션 ID + 메시지 순번 → 채팅 메시지를 저장하는 보관소"""
+
+    def __init__(self, db_path, ttl):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    archived_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                )
+                """
+            )
+
+    def _connect(self):
+        """호출마다 새 연결을 만들어 여러 스레드에서 안전하게 사용합니다."""
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def append(self, session_id, start_seq, messages):
+        """start_seq부터 순번을 매겨 메시지들을 보관하고 만료된 기록을 정리합니다."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chat_messages VALUES (?, ?, ?, ?, ?)",
+                [
+                    (session_id, start_seq + offset, message["role"], message["content"], now)
+                    for offset, message in enumerate(messages)
+                ],
+            )
+            conn.execute(
+                "DELETE FROM chat_messages WHERE archived_at < ?",
+                (now - self.ttl,),
+            )
+
+    def load(self, session_id, start_seq, end_seq):
+        """[start_seq, end_seq) 구간의 보관된 메시지를 순번(seq)과 함께 순서대로 반환합니다.
+
+        만료되어 삭제된 메시지는 빠지므로 호출자는 목록 위치가 아닌 seq로 메시지를 식별해야 합니다.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT seq, role, content FROM chat_messages
+                WHERE session_id = ? AND seq >= ? AND seq < ?
+                ORDER BY seq
+                """,
+                (session_id, start_seq, end_seq),
+            ).fetchall()
+        return [{"seq": seq, "role": role, "content": content} for seq, role, content in rows]
+
+
+def get_chat_archive():
+    """프로세스 전체에서 공유하는 채팅 보관소를 반환합니다."""
+    global _instance
+    with _lock:
+        if _instance is None:
+            _instance = ChatArchive(
+                CHAT_ARCHIVE_SETTINGS['path'],
+                CHAT_ARCHIVE_SETTINGS['ttl'],
+            )
+        return _instance
@@ -0,0 +1,107 @@
+"""
+챗봇 프롬프트 모듈
+
+Gemini에 보낼 아키텍처 설계 프롬프트와 보안 분석 프롬프트를 만듭니다. 기존 트리가 있으면
+전체 트리 대신 압축 요약을 보내고, 응답으로 트리 편집 연산(add/remove/move/rename)을 받습니다.
+고정 지시문은 모델의 system instruction(*_SYSTEM_INSTRUCTION)으로 분리하여 턴마다 보내는 메시지에 다시 넣지 않습니다.
+"""
+import hashlib
+
+# 대화 내내 바뀌지 않는 지시문은 모델의 system instruction으로 한 번만 설정하고,
+# 턴마다 보내는 메시지에는 사용자 요청과 현재 트리만 담음
+CHAT_SYSTEM_INSTRUCTION = """
+AWS 클라우드 아키텍처 전문가로서 답변해주세요.
+
+요청사항:
+1. 사용자의 요청에 맞는 클라우드 아키텍처를 설계해주세요
+2. 반드시 트리 구조로 표현해주세요 (예: ├─, │, └─ 문자 사용)
+3. 트리구조는 응답에 1회만 표시해주세요
+4. 각 컴포넌트의 역할과 연결 관계를 명확히 표시해주세요
+5. 필요시 사용자에게 다시 질문하여 명확하게 하세요
+6. 사용자의 요청 이외의 구성요소는 트리에 표시하지 마세요
+
+중요 규칙:
+- 모든 AWS 서비스와 리소스는 반드시 공식 영어 명칭을 사용하세요
+- 예: EC2, S3, RDS, VPC, IAM, CloudFront, Lambda, ECS, EKS 등
+- 한국어 설명은 가능하지만, 서비스명은 영어로 표기하세요
+- 트리 구조에서 각 노드는 AWS 공식 서비스명을 사용하세요
+- 기존 아키텍처가 있다면 일관성을 유지하면서 요청사항을 반영하세요
+
+메시지에 "현재 아키텍처 (이름[자식;자식] 형식)"가 있으면 변경 사항은 트리 전체 대신 아래 형식의 ```json 블록 1개로만 표시하세요:
+{"ops": [{"op": "add", "parent": "부모", "node": "새 노드"}, {"op": "remove", "node": "노드"},
+{"op": "move", "node": "노드", "parent": "새 부모"}, {"op": "rename", "node": "노드", "label": "새 이름"}]}
+- 노드는 이름 또는 "부모 > 노드" 경로로 지정하세요
+- 구조를 완전히 새로 설계해야 할 때만 ├─, │, └─ 문자로 전체 트리를 1회 표시하세요
+- 변경이 필요 없으면 블록을 생략하고, 필요시 사용자에게 다시 질문하세요
+- 변경 이유와 각 컴포넌트의 역할은 한국어로 간단히 설명하세요
+"""
+
+SECURITY_ANALYSIS_SYSTEM_INSTRUCTION = """
+주어진 AWS 클라우드 아키텍처의 보안 구성요소를 분석해주세요.
+
+분석 요청사항:
+1. 현재 아키텍처에서 각 보안 구성요소가 어떤 역할을 하는지 설명
+2. 현재 구성에서 보안 취약점이나 개선점이 있는지 분석
+3. 추가로 구성하면 좋을 보안 요소들을 제안
+4. 각 보안 요소의 중요도와 우선순위를 평가
+
+응답 형식:
+- 현재 보안 구성요소 분석
+- 보안 취약점 및 개선점
+- 추가 권장 보안 요소
+- 보안 강화 우선순위
+
+AWS 보안 모범사례를 기준으로 전문적이고 실용적인 조언을 제공해주세요.
+"""
+
+_FULL_PROMPT_TEMPLATE = """
+사용자 요청: {user_message}
+{context_info}"""
+
+_FULL_CONTEXT_TEMPLATE = """
+기존 아키텍처 구조 (참고용):
+{existing_tree}
+
+위 구조를 기반으로 사용자의 새로운 요청을 처리해주세요.
+"""
+
+_INCREMENTAL_PROMPT_TEMPLATE = """
+사용자 요청: {user_message}
+
+현재 아키텍처 (이름[자식;자식] 형식): {tree_summary}
+"""
+
+_SECURITY_ANALYSIS_PROMPT_TEMPLATE = """
+아키텍처 구조:
+{tree_structure}{security_items_text}
+"""
+
+# 보안 분석 지시문/템플릿이 바뀌면 이전 분석 캐시를 재사용하지 않도록 캐시 키에 포함하는 버전
+SECURITY_ANALYSIS_PROMPT_VERSION = hashlib.sha256(
+    (SECURITY_ANALYSIS_SYSTEM_INSTRUCTION + _SECURITY_ANALYSIS_PROMPT_TEMPLATE).encode("utf-8")
+).hexdigest()[:16]
+
+
+def build_full_chat_prompt(user_message, existing_tree=""):
+    """기존 트리 전체를 컨텍스트로 포함하는 프롬프트를 만듭니다."""
+    context_info = _FULL_CONTEXT_TEMPLATE.format(existing_tree=existing_tree) if existing_tree else ""
+    return _FULL_PROMPT_TEMPLATE.format(user_message=user_message, context_info=context_info)
+
+
+def build_incremental_chat_prompt(user_message, tree_summary):
+    """트리 요약만 보내고 편집 연산으로 응답하도록 요청하는 프롬프트를 만듭니다."""
+    return _INCREMENTAL_PROMPT_TEMPLATE.format(user_message=user_message, tree_summary=tree_summary)
+
+
+def build_security_analysis_prompt(tree_structure, checked_items):
+    """트리 구조와 적용된 보안 항목으로 보안 분석 요청 프롬프트를 만듭니다."""
+    # 체크된 보안 항목들을 텍스트로 변환
+    if checked_items:
+        security_items_text = "\n\n현재 적용된 보안 요소들:\n"
+        for i, item in enumerate(checked_items, 1):
+            security_items_text += f"{i}. {item}\n"
+    else:
+        security_items_text = "\n\n현재 적용된 보안 요소: 없음"
+    return _SECURITY_ANALYSIS_PROMPT_TEMPLATE.format(
+        tree_structure=tree_structure, security_items_text=security_items_text
+    )
@@ -10,9 +10,159 @@ load_dotenv()
 # 환경변수 설정
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 AMAZON_Q_PATH = os.getenv('AMAZON_Q_PATH', 'q')  # Amazon Q CLI 경로
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')  # Gemini 모델명
 
 # 다이어그램 생성 설정
 DIAGRAM_SETTINGS = {
     'timeout': 120,
-    'encoding': 'utf-8'
+    'encoding': 'utf-8',
+    'backend': 'local',         # 'local': graphviz로 직접 렌더링 (실패 시 Amazon Q), 'amazon_q': 항상 Amazon Q 사용
+    'concurrent': True,         # 다이어그램 생성과 보안 분석을 병렬로 실행
+    'analysis_timeout': 120,    # 보안 분석 단계 최대 대기 시간(초)
+}
+
+# 백그라운드 작업 설정
+JOB_SETTINGS = {
+    'enabled': True,           # 제작하기 요청을 백그라운드 작업으로 실행
+    'max_workers': 4,          # 동시에 실행할 최대 작업 수
+    'max_finished_jobs': 200,  # 결과를 보관할 완료 작업 수
+    'poll_interval': 1.0,      # 다이어그램 패널의 작업 상태 확인 주기(초)
+}
+
+# 챗봇 설정
+CHAT_SETTINGS = {
+    'stream': True,  # Gemini 응답을 토큰 단위로 스트리밍하여 표시
+    'incremental': True,  # 기존 트리가 있으면 전체 트리 대신 요약을 보내고 편집 연산으로 응답받음
+    'window_size': 20,    # 한 번에 표시할 최근 메시지 수 ("이전 메시지 더 보기"마다 이만큼 추가)
+    # 요청에 함께 보낼 이전 대화의 최대 토큰 수(추정치, 넘는 턴은 잘라서 전송). 현재 트리는 매 턴 메시지에 들어가므로
+    # 기본은 0(현재 메시지만 전송)이며, 늘리면 턴마다 입력 토큰과 응답 지연이 그만큼 늘어남
+    'history_token_budget': 0,
+}
+
+# 다이어그램 미리보기 설정
+DIAGRAM_PREVIEW_SETTINGS = {
+    'static_subdir': 'diagram-previews',  # static/ 아래 미리보기 저장 폴더 (app/static/으로 제공)
+    'max_width': 1600,                    # 미리보기 최대 너비(px)
+    'max_height': 920,                    # 미리보기 최대 높이(px, 460px 카드의 2배 해상도)
+    'max_files': 200,                     # 보관할 최대 미리보기 수
+}
+
+# 다운로드 설정
+DOWNLOAD_SETTINGS = {
+    'mmap_threshold': 4 * 1024 * 1024,  # 이 크기 이상의 파일은 메모리 매핑으로 읽음 (4MB)
+}
+
+# 채팅 기록 보관 설정
+CHAT_ARCHIVE_SETTINGS = {
+    'enabled': True,
+    'path': '.cache/chat_archive.sqlite3',
+    'max_session_messages': 100,  # 세션 상태에 보관할 최대 메시지 수 (초과분은 보관소로 이동)
+    'ttl': 7 * 24 * 60 * 60,      # 보관된 메시지 유효 기간(초)
+}
+
+# Gemini 호출 속도 제한 및 재시도 설정
+GEMINI_RATE_LIMIT_SETTINGS = {
+    'enabled': True,
+    'requests_per_minute': 60,  # 프로세스 전체 평균 호출 한도 (토큰 버킷 충전 속도)
+    'burst': 10,                # 한 번에 몰아서 보낼 수 있는 최대 호출 수
+    'max_retries': 3,           # 429/5xx 오류 시 최대 재시도 횟수
+    'base_delay': 1.0,          # 첫 재시도 전 최대 대기 시간(초, 재시도마다 2배)
+    'max_delay': 20.0,          # 재시도 전 최대 대기 시간(초)
+    'chat_deadline': 60,        # 챗봇 응답 호출의 마감 시간(초, 대기와 재시도 포함)
+}
+
+# 다이어그램 캐시 설정
+DIAGRAM_CACHE_SETTINGS = {
+    'enabled': True,
+    'cache_dir': 'generated-diagrams/.cache',
+    'max_bytes': 200 * 1024 * 1024,  # 캐시 최대 용량 (200MB)
+    'max_entries': 500,              # 캐시 최대 항목 수
+    'flush_interval': 30,            # 적중/미스 통계와 마지막 사용 시각을 인덱스 파일에 저장하는 주기(초)
+}
+
+# 다이어그램 보관 정책 설정
+DIAGRAM_RETENTION_SETTINGS = {
+    'enabled': True,
+    'max_total_bytes': 500 * 1024 * 1024,    # generated-diagrams 최대 용량 (500MB)
+    'max_age_seconds': 30 * 24 * 60 * 60,    # 최대 보관 기간 (30일)
+    'max_files': 1000,                       # 최대 다이어그램(요청 폴더) 수
+    'min_age_seconds': 10 * 60,              # 생성 중일 수 있는 최근 항목 보호 시간(초)
+    'session_idle_seconds': 60 * 60,         # 이 시간 이상 활동 없는 세션의 참조는 해제(초)
+    'interval_seconds': 10 * 60,             # 정리 실행 주기(초)
+}
+
+# 보안 분석 캐시 설정
+ANALYSIS_CACHE_SETTINGS = {
+    'enabled': True,
+    'path': '.cache/security_analysis.sqlite3',
+    'ttl': 7 * 24 * 60 * 60,  # 캐시 유효 기간(초)
+    'max_entries': 1000,      # 캐시 최대 항목 수
+}
+
+# Amazon Q CLI 프로세스 제어(취소, 시간 제한) 설정
+Q_PROCESS_SETTINGS = {
+    'kill_grace': 1,             # 취소/시간 초과 시 SIGINT 후 강제 종료까지 기다릴 시간(초)
+    'adaptive_timeout': True,    # 최근 성공한 실행 시간 분포로 시간 제한 조정 (끄면 DIAGRAM_SETTINGS['timeout'])
+    'timeout_percentile': 99,    # 시간 제한 기준 백분위수
+    'timeout_factor': 2.0,       # 시간 제한 = 백분위수 × 배수
+    'min_timeout': 30,           # 적응형 시간 제한 하한(초)
+    'max_timeout': 300,          # 적응형 시간 제한 상한(초)
+    'min_samples': 20,           # 이 개수만큼 성공 기록이 쌓이기 전에는 기본 시간 제한 사용
+    'window': 200,               # 시간 제한 계산에 사용할 최근 성공 기록 수
+}
+
+# Amazon Q CLI 스트리밍 실행 설정
+Q_STREAMING_SETTINGS = {
+    'enabled': True,                 # PNG가 저장되면 q chat 종료를 기다리지 않고 반환 (처음 로드한 셸 환경으로 요청마다 실행)
+    'use_fs_events': True,           # 파일 시스템 알림(watchdog, Linux는 inotify)으로 PNG 저장 감지
+                                     # (watchdog이 없거나 알림을 시작할 수 없으면 fallback_poll_interval로 폴더 확인)
+    'poll_interval': 2.0,            # 알림 사용 시 놓친 알림에 대비한 폴더 확인 주기(초)
+    'fallback_poll_interval': 0.25,  # 알림을 사용할 수 없을 때 폴더 확인 주기(초)
+    'shutdown_grace': 3,             # PNG 저장 후 SIGINT를 보내고 정상 종료를 기다릴 시간(초)
+}
+
+# Amazon Q CLI 실행 허용(동시 실행 제한) 설정
+Q_ADMISSION_SETTINGS = {
+    'enabled': True,
+    'max_in_flight': 2,          # 프로세스 전체에서 동시에 실행할 최대 Q CLI 수
+    'max_queue': 10,             # 대기열 최대 길이 (초과 시 즉시 거절)
+    'max_queue_per_session': 1,  # 세션별 최대 대기 요청 수
+    'wait_timeout': 300,         # 대기열에서 기다릴 최대 시간(초)
+}
+
+# 성능 지표 설정
+METRICS_SETTINGS = {
+    'prefix': 'aws_diagram_',            # 내보내는 지표 이름 앞에 붙일 접두사
+    'sample_size': 1000,                 # 백분위수 계산에 사용할 지표별 최근 표본 수
+    'export_enabled': True,              # 지표를 주기적으로 파일로 내보내기
+    'export_path': '.cache/metrics-{process}.prom',  # {process}: app(웹 앱), api(API 서버), batch(배치 CLI)
+    'export_format': 'prometheus',       # 'prometheus': 텍스트 형식(덮어쓰기), 'jsonl': JSON Lines(추가)
+    'export_interval': 15,               # 내보내기 주기(초)
+    'admin_panel': False,                # 성능 지표 패널 항상 표시 (False면 ?admin=1일 때만 표시)
+}
+
+# 로컬 Graphviz 렌더러 설정
+GRAPHVIZ_SETTINGS = {
+    'dot_path': os.getenv('GRAPHVIZ_DOT_PATH', 'dot'),  # graphviz dot 실행 파일 경로
+    'dpi': 150,
+    'timeout': 10,
+}
+
+# 일괄 생성 CLI(batch_generate.py) 설정
+BATCH_SETTINGS = {
+    'workers': 4,                          # 동시에 생성할 트리 수
+    'executor': 'thread',                  # 'thread': 스레드 풀, 'process': 프로세스 풀 (프로세스마다 Q 동시 실행 제한 적용)
+    'pattern': '*.txt',                    # 폴더 입력 시 찾을 트리 파일 패턴 (하위 폴더 포함)
+    'results_path': 'batch-results.jsonl', # 결과 매니페스트 (항목별 결과/소요 시간, 재개 시 사용)
+}
+
+# HTTP API(api_server.py) 설정
+API_SETTINGS = {
+    'host': os.getenv('DIAGRAM_API_HOST', '127.0.0.1'),
+    'port': int(os.getenv('DIAGRAM_API_PORT', '8600')),
+    'token': os.getenv('DIAGRAM_API_TOKEN'),  # 설정하면 Authorization: Bearer <token> 헤더 필요
+    'max_running_jobs': 16,                   # 동시에 실행할 최대 작업 수 (나머지는 대기)
+    'max_pending_jobs': 200,                  # 대기+실행 중 작업 최대 수 (초과 시 503으로 거절)
+    'max_finished_jobs': 500,                 # 결과를 보관할 완료 작업 수
+    'max_tree_chars': 20000,                  # 요청 트리 구조 최대 길이(자)
 }
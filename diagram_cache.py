@@ -0,0 +1,225 @@
+"""
+생성된 다이어그램 캐시 모듈
+
+트리 구조, 체크된 보안 항목, 프롬프트 템플릿 버전의 해시를 키로 하여
+Amazon Q가 생성한 PNG를 generated-diagrams/.cache 아래에 보관합니다.
+
+인덱스는 메모리에 두고 조회마다 파일을 다시 쓰지 않습니다. 적중/미스 횟수와 마지막 사용 시각은
+put 때와 flush_interval초마다 (다른 프로세스가 바꾼 인덱스와 합쳐) index.json에 저장합니다.
+"""
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from architecture_tree import parse_architecture_tree
+from config import DIAGRAM_CACHE_SETTINGS
+
+# 같은 프로세스의 모든 세션이 하나의 인덱스를 공유하므로 모듈 수준 잠금 사용
+_lock = threading.Lock()
+_instance = None
+
+
+def normalize_tree_text(tree_text):
+    """캐시 키 계산을 위해 트리 텍스트를 정규화합니다."""
+    # 트리로 파싱되면 선 문자/들여쓰기 차이를 없앤 정규 형태를 사용
+    graph = parse_architecture_tree(tree_text)
+    if graph:
+        return graph.to_text()
+    lines = (tree_text or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines if line.strip())
+
+
+def make_cache_key(tree_text, checked_items, prompt_version):
+    """트리 구조, 보안 항목, 프롬프트 버전으로 캐시 키(sha256)를 만듭니다."""
+    payload = json.dumps(
+        {
+            "tree": normalize_tree_text(tree_text),
+            "checked_items": sorted(checked_items or []),
+            "prompt_version": prompt_version,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiagramCache:
+    """크기 제한 LRU 방식의 다이어그램 디스크 캐시"""
+
+    def __init__(self, cache_dir, max_bytes, max_entries, flush_interval=0):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._index = self._load_index()
+        self._index_mtime = self._index_file_mtime()
+        # 아직 파일에 저장하지 않은 조회 결과 (다른 프로세스가 바꾼 인덱스에 다시 적용하기 위해 따로 보관)
+        self._pending = self._empty_pending()
+        self._flushed_at = time.monotonic()
+
+    @staticmethod
+    def _empty_pending():
+        return {"last_access": {}, "removed": set(), "hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    def _load_index(self):
+        """인덱스 파일을 읽습니다. 없거나 손상되었으면 빈 인덱스를 반환합니다."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("entries", {})
+        index.setdefault("stats", {"hits": 0, "misses": 0, "saved_seconds": 0.0})
+        return index
+
+    def _save_index(self, index):
+        """인덱스를 임시 파일에 쓴 뒤 교체하여 원자적으로 저장합니다."""
+        tmp_path = self.index_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def _index_file_mtime(self):
+        try:
+            return self.index_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _apply_pending(self, index):
+        """저장하지 않은 조회 결과를 인덱스에 적용합니다."""
+        pending = self._pending
+        for key in pending["removed"]:
+            index["entries"].pop(key, None)
+        for key, last_access in pending["last_access"].items():
+            entry = index["entries"].get(key)
+            if entry:
+                entry["last_access"] = max(entry["last_access"], last_access)
+        index["stats"]["hits"] += pending["hits"]
+        index["stats"]["misses"] += pending["misses"]
+        index["stats"]["saved_seconds"] += pending["saved_seconds"]
+
+    def _refresh(self):
+        """다른 프로세스(일괄 생성 CLI, HTTP API)가 인덱스 파일을 바꿨으면 다시 읽습니다. (잠금 안에서 호출)"""
+        mtime = self._index_file_mtime()
+        if mtime != self._index_mtime:
+            self._index = self._load_index()
+            self._index_mtime = mtime
+            self._apply_pending(self._index)
+
+    def _flush(self):
+        """메모리의 인덱스를 파일에 저장합니다. (잠금 안에서 호출)"""
+        self._refresh()
+        self._save_index(self._index)
+        self._index_mtime = self._index_file_mtime()
+        self._pending = self._empty_pending()
+        self._flushed_at = time.monotonic()
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self._flush()
+
+    def flush(self):
+        """저장하지 않은 적중/미스 횟수와 마지막 사용 시각을 인덱스 파일에 저장합니다."""
+        with _lock:
+            pending = self._pending
+            if pending["hits"] or pending["misses"] or pending["removed"]:
+                self._flush()
+
+    def get(self, key):
+        """캐시된 다이어그램 경로를 반환합니다. 없으면 None을 반환합니다."""
+        with _lock:
+            self._refresh()
+            entry = self._index["entries"].get(key)
+            path = self.cache_dir / entry["file"] if entry else None
+
+            if path is None or not path.exists():
+                # 파일이 외부에서 삭제된 경우 인덱스에서도 제거
+                if entry:
+                    self._index["entries"].pop(key)
+                    self._pending["removed"].add(key)
+                self._index["stats"]["misses"] += 1
+                self._pending["misses"] += 1
+                self._maybe_flush()
+                return None
+
+            now = time.time()
+            saved_seconds = entry.get("generation_seconds", 0.0)
+            entry["last_access"] = now
+            self._index["stats"]["hits"] += 1
+            self._index["stats"]["saved_seconds"] += saved_seconds
+            self._pending["last_access"][key] = now
+            self._pending["hits"] += 1
+            self._pending["saved_seconds"] += saved_seconds
+            self._maybe_flush()
+            return path
+
+    def put(self, key, source_path, generation_seconds=0.0):
+        """생성된 다이어그램을 캐시에 복사하고 캐시된 경로를 반환합니다."""
+        with _lock:
+            target = self.cache_dir / f"{key}.png"
+            shutil.copyfile(source_path, target)
+
+            self._refresh()
+            now = time.time()
+            self._index["entries"][key] = {
+                "file": target.name,
+                "size": target.stat().st_size,
+                "created": now,
+                "last_access": now,
+                "generation_seconds": generation_seconds,
+            }
+            self._pending["removed"].discard(key)
+            self._evict(self._index)
+            self._flush()
+            return target
+
+    def _evict(self, index):
+        """용량/개수 제한을 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다."""
+        entries = index["entries"]
+        total_bytes = sum(entry["size"] for entry in entries.values())
+
+        for key in sorted(entries, key=lambda k: entries[k]["last_access"]):
+            if total_bytes <= self.max_bytes and len(entries) <= self.max_entries:
+                break
+            entry = entries.pop(key)
+            self._pending["last_access"].pop(key, None)
+            total_bytes -= entry["size"]
+            try:
+                (self.cache_dir / entry["file"]).unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        """적중/미스 횟수, 항목 수, 절약된 Q CLI 시간을 반환합니다."""
+        with _lock:
+            self._refresh()
+            index = self._index
+            stats = dict(index["stats"])
+            stats["entries"] = len(index["entries"])
+            stats["total_bytes"] = sum(entry["size"] for entry in index["entries"].values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def get_diagram_cache():
+    """프로세스 전체에서 공유하는 다이어그램 캐시를 반환합니다."""
+    global _instance
+    with _lock:
+        if _instance is None:
+            _instance = DiagramCache(
+                DIAGRAM_CACHE_SETTINGS['cache_dir'],
+                DIAGRAM_CACHE_SETTINGS['max_bytes'],
+                DIAGRAM_CACHE_SETTINGS['max_entries'],
+                DIAGRAM_CACHE_SETTINGS['flush_interval'],
+            )
+            # 종료할 때 저장하지 않은 통계를 기록
+            atexit.register(_instance.flush)
+        return _instance
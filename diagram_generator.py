@@ -0,0 +1,570 @@
+"""
+다이어그램 생성 모듈
+
+Streamlit 없이 사용할 수 있는 다이어그램 생성 구성요소(Amazon Q CLI 클라이언트,
+다이어그램 파일 관리, 로컬 graphviz/Amazon Q 생성 단계)입니다. 생성 단계는 스레드용과
+asyncio용(HTTP API)이 있으며, 웹 앱(main.py), 일괄 생성 CLI(batch_generate.py),
+HTTP API(api_server.py)가 함께 사용합니다.
+"""
+import asyncio
+import logging
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path, PureWindowsPath
+
+import graphviz_renderer
+from architecture_tree import parse_architecture_tree
+from cancellation import OperationCancelled
+from config import AMAZON_Q_PATH, DIAGRAM_SETTINGS, DIAGRAM_CACHE_SETTINGS, Q_PROCESS_SETTINGS, Q_STREAMING_SETTINGS
+from diagram_cache import make_cache_key
+from diagram_index import DiagramIndex
+from diagram_retention import get_retention_engine
+from metrics import get_metrics, outcome_for_result
+from q_admission import get_admission_controller, AdmissionRejected
+from q_process import get_q_timeout, popen_group_kwargs, run_process, terminate_process_tree, track, untrack
+from q_streaming import get_shell_environment, run_until_png
+
+logger = logging.getLogger(__name__)
+
+# 기본 보안 체크리스트 항목 (체크리스트 화면과 일괄 생성 CLI의 --checklist 선택지)
+BASIC_SECURITY_CHECKLIST = [
+    "VPC 적용 여부",
+    "퍼블릭,프라이빗 서브넷 분리",
+    "데이터 암호화",
+    "로드밸런서 설정",
+    "WAF 설정",
+    "CloudFront 설정",
+    "CloudTrail 설정",
+    "CloudWatch 설정",
+    "CloudWatch 로그 설정",
+]
+
+# =========================================
+# 보안 요구사항 프롬프트
+# =========================================
+def format_security_requirements(checked_items):
+    """체크된 보안 항목들을 Amazon Q 프롬프트 형식으로 변환합니다."""
+    if not checked_items:
+        return ""
+
+    security_text = "\n\nSecurity Requirements:\n"
+    security_text += "Please include the following security elements in the diagram and clearly label them with '*' asterisks for distinction:\n"
+
+    for i, item in enumerate(checked_items, 1):
+        # 예시 부분 제거하고 핵심 내용만 추출
+        clean_item = item.split(" (예:")[0] if " (예:" in item else item
+        security_text += f"{i}. {clean_item}\n"
+
+
+    return security_text
+
+# =========================================
+# Amazon Q CLI 클라이언트 클래스
+# =========================================
+def to_wsl_path(path):
+    """Windows 경로를 WSL 안에서 쓰는 경로로 바꿉니다.
+
+    wslpath로 변환하고, wslpath가 실패하면 기본 마운트 규칙(/mnt/<드라이브>/...)을 사용합니다.
+    WSL이 없으면 원래 경로를 그대로 반환합니다.
+    """
+    path = str(path)
+    try:
+        result = subprocess.run(['wsl', 'wslpath', '-u', path], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return path
+    if result.returncode == 0 and result.stdout.strip():
+        return result.stdout.strip()
+    windows_path = PureWindowsPath(path)
+    if len(windows_path.drive) == 2 and windows_path.drive.endswith(":"):
+        return "/".join([f"/mnt/{windows_path.drive[0].lower()}", *windows_path.parts[1:]])
+    return path
+
+class AmazonQClient:
+    """Amazon Q CLI 클라이언트"""
+
+    # 프롬프트 템플릿을 바꾸면 올려서 이전 캐시를 무효화
+    PROMPT_VERSION = 2
+
+    def __init__(self, on_error=None):
+        self.platform = platform.system()
+        # 실행 오류 알림 방법 (기본은 로그, 호출별로 on_error를 주면 그쪽으로도 전달)
+        self.on_error = on_error or logger.error
+
+    def _report_error(self, message, on_error=None):
+        """실행 오류를 기록하고, 호출한 쪽이 on_error를 주었으면 그쪽에도 전달합니다."""
+        self.on_error(message)
+        if on_error is not None:
+            on_error(message)
+
+    def _prompt_output_dir(self, output_dir):
+        """프롬프트에 넣을 출력 폴더 경로 (Windows에서는 q가 WSL 안에서 실행되므로 WSL 경로로 변환)"""
+        if self.platform == "Windows":
+            return to_wsl_path(output_dir)
+        return output_dir
+
+    def generate_diagram_prompt(self, tree_structure, security_requirements="", output_dir="generated-diagrams"):
+        """트리 구조와 보안 요구사항을 기반으로 다이어그램 생성 프롬프트 생성"""
+
+        return f"""Generate an AWS cloud architecture diagram.
+
+Architecture Structure:
+{tree_structure}{security_requirements}
+
+Requirements:
+1. Create a visual diagram using AWS service icons
+2. Clearly show connections between services
+3. Save as PNG file in the {output_dir} folder
+
+Please generate and save the diagram."""
+
+    def execute_command(self, prompt, session_id=None, output_dir=None, on_output=None, cancel_token=None,
+                        on_error=None, on_admitted=None):
+        """플랫폼별 명령어 실행
+
+        output_dir을 주면 스트리밍 모드로 실행하여 PNG가 저장되는 즉시 반환하고,
+        Q CLI 출력을 한 줄씩 on_output(줄)으로 전달합니다. cancel_token이 취소되면
+        대기 중이거나 실행 중인 Q CLI 프로세스 트리를 종료하고 OperationCancelled를 발생시킵니다.
+        실행 오류는 로그와 on_error(메시지)로 알리고 None을 반환합니다.
+        on_admitted()는 실행 허용 대기열에서 차례를 받아 Q CLI를 실행하기 직전에 호출됩니다.
+        """
+        try:
+            # 프로세스 전체 동시 실행 수를 넘으면 세션별 공정 대기열에서 차례를 기다림
+            admission = get_admission_controller()
+            wait_started_at = time.perf_counter()
+            with admission.admit(session_id, cancel_token) if admission else nullcontext():
+                get_metrics().observe("q_admission_wait_seconds", time.perf_counter() - wait_started_at)
+                if on_admitted is not None:
+                    on_admitted()
+                return self._execute_command(prompt, output_dir, on_output, cancel_token)
+        except (AdmissionRejected, OperationCancelled):
+            # 대기열이 가득 찼거나 사용자가 취소한 경우 그대로 알리도록 전달
+            raise
+        except Exception as e:
+            self._report_error(f"Amazon Q CLI 실행 오류: {str(e)}", on_error)
+            return None
+
+    def _execute_command(self, prompt, output_dir=None, on_output=None, cancel_token=None):
+        """스트리밍 모드 또는 새 셸로 Q CLI를 실행합니다."""
+        streaming = Q_STREAMING_SETTINGS.get('enabled', False) and output_dir is not None
+        mode = "stream" if streaming else "shell"
+        # 최근 실행 시간 분포로 정한 시간 제한
+        q_timeout = get_q_timeout()
+        timeout = q_timeout.current()
+        started_at = time.perf_counter()
+        # q chat 실행 시간 (shell/stream 모드는 bash 시작과 ~/.bashrc 로드 포함)
+        with get_metrics().span("q_chat", mode=mode) as span:
+            if streaming:
+                args, env = self._stream_command(prompt)
+                result = run_until_png(
+                    args, output_dir, timeout, DIAGRAM_SETTINGS['encoding'], on_output, env, cancel_token,
+                )
+            elif self.platform == "Windows":
+                result = self._execute_windows(prompt, timeout, cancel_token)
+            else:
+                result = self._execute_unix(prompt, timeout, cancel_token)
+            span.outcome = outcome_for_result(result)
+            if result.returncode == 0:
+                q_timeout.observe(time.perf_counter() - started_at)
+            return result
+
+    def _execute_windows(self, prompt, timeout, cancel_token=None):
+        """Windows에서 명령어 실행"""
+        try:
+            # WSL이 설치되어 있는지 확인
+            wsl_check = subprocess.run(['wsl', '--version'], capture_output=True, text=True)
+            if wsl_check.returncode == 0:
+                # WSL 사용 - 상대 경로 사용
+                home_dir = os.path.expanduser("~")
+                local_bin = os.path.join(home_dir, ".local", "bin")
+                # WSL에서 현재 디렉토리로 이동 후 명령 실행
+                # 프롬프트의 따옴표, $, 백틱이 셸에서 해석되지 않도록 인용
+                cmd = f'cd . && source ~/.bashrc && export PATH=$PATH:{local_bin} && printf "y\\ny\\ny\\n" | {AMAZON_Q_PATH} chat {shlex.quote(prompt)}'
+
+                return run_process(['wsl', '-e', 'bash', '-c', cmd], timeout, DIAGRAM_SETTINGS['encoding'], cancel_token)
+            else:
+                # WSL이 없으면 직접 실행 시도 (cmd를 거치지 않고 프롬프트를 인자 하나로 전달)
+                return run_process([AMAZON_Q_PATH, 'chat', prompt], timeout, DIAGRAM_SETTINGS['encoding'], cancel_token)
+
+        except FileNotFoundError:
+            # WSL 명령어를 찾을 수 없으면 직접 실행
+            return run_process([AMAZON_Q_PATH, 'chat', prompt], timeout, DIAGRAM_SETTINGS['encoding'], cancel_token)
+
+    def _execute_unix(self, prompt, timeout, cancel_token=None):
+        """Linux/Mac에서 명령어 실행"""
+        # 프롬프트의 따옴표, $, 백틱이 셸에서 해석되지 않도록 인용
+        cmd = f'printf "y\\ny\\ny\\n" | {AMAZON_Q_PATH} chat {shlex.quote(prompt)}'
+
+        # ~/.bashrc는 처음 한 번만 로드하고 그 환경으로 바로 실행
+        # bash, q, MCP 서버를 하나의 프로세스 트리로 실행하여 시간 초과/취소 시 함께 종료
+        return run_process(
+            ['bash', '-c', cmd], timeout, DIAGRAM_SETTINGS['encoding'], cancel_token, get_shell_environment()
+        )
+
+    def _stream_command(self, prompt):
+        """스트리밍 모드로 실행할 Q CLI 명령 (argv, 환경 변수)을 만듭니다."""
+        command = f'printf "y\\ny\\ny\\n" | {AMAZON_Q_PATH} chat {shlex.quote(prompt)}'
+        if self.platform == "Windows":
+            return ['wsl', '-e', 'bash', '-c', f'source ~/.bashrc && export PATH=$PATH:$HOME/.local/bin && {command}'], None
+        # ~/.bashrc는 처음 한 번만 로드하고 그 환경으로 바로 실행
+        return ['bash', '-c', command], get_shell_environment()
+
+    async def _async_command(self, prompt):
+        """asyncio 하위 프로세스로 실행할 Q CLI 명령 (argv, 환경 변수)을 만듭니다."""
+        if self.platform == "Windows":
+            cmd = f'source ~/.bashrc && export PATH=$PATH:$HOME/.local/bin && {AMAZON_Q_PATH} chat {shlex.quote(prompt)}'
+            return ['wsl', '-e', 'bash', '-c', cmd], None
+        # 셸을 거치지 않고 ~/.bashrc를 로드한 환경으로 바로 실행 (처음 한 번은 셸을 띄우므로 스레드에서 구함)
+        env = await asyncio.to_thread(get_shell_environment)
+        return [AMAZON_Q_PATH, "chat", prompt], env
+
+    async def execute_command_async(self, prompt):
+        """Q CLI를 asyncio 하위 프로세스로 실행하고 subprocess.CompletedProcess를 반환합니다.
+
+        시간이 초과되거나 작업이 취소되면 Q CLI 프로세스를 종료합니다.
+        """
+        argv, env = await self._async_command(prompt)
+        q_timeout = get_q_timeout()
+        started_at = time.perf_counter()
+        with get_metrics().span("q_chat", mode="async") as span:
+            process = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                **popen_group_kwargs(),
+            )
+            track(process.pid)
+            reason = "error"
+            try:
+                # 도구 사용 확인 질문에는 stdin으로 y를 전달
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(b"y\ny\ny\n"), q_timeout.current()
+                )
+            except asyncio.TimeoutError:
+                reason = "timeout"
+                raise
+            except asyncio.CancelledError:
+                reason = "cancel"
+                raise
+            finally:
+                if process.returncode is None:
+                    # q와 MCP 서버까지 프로세스 트리 전체를 종료 (유예 시간 동안 이벤트 루프를 막지 않음)
+                    await asyncio.to_thread(
+                        terminate_process_tree, process.pid, Q_PROCESS_SETTINGS['kill_grace'], reason,
+                        lambda: process.returncode is None,
+                    )
+                    await process.wait()
+                untrack(process.pid)
+            encoding = DIAGRAM_SETTINGS['encoding']
+            result = subprocess.CompletedProcess(
+                argv, process.returncode,
+                stdout.decode(encoding, errors="replace"), stderr.decode(encoding, errors="replace"),
+            )
+            span.outcome = outcome_for_result(result)
+            if result.returncode == 0:
+                q_timeout.observe(time.perf_counter() - started_at)
+            return result
+
+    def generate_diagram(self, tree_structure, checked_items=None, output_dir="generated-diagrams", session_id=None,
+                         on_output=None, cancel_token=None, on_error=None, on_admitted=None):
+        """Amazon Q CLI를 통해 다이어그램 생성 요청 (on_output: Q CLI 출력 줄, on_error: 실행 오류 메시지를 받을 함수,
+        on_admitted: 실행 허용 대기열에서 차례를 받으면 호출할 함수)"""
+        try:
+            with get_metrics().span("q_prompt_build"):
+                security_requirements_text = format_security_requirements(checked_items or [])
+                prompt_output_dir = self._prompt_output_dir(output_dir)
+
+                # 보안 요구사항이 있을 때만 프롬프트에 추가
+                if security_requirements_text:
+                    prompt = self.generate_diagram_prompt(tree_structure, security_requirements_text, prompt_output_dir)
+                else:
+                    prompt = self.generate_diagram_prompt(tree_structure, "", prompt_output_dir)
+
+            result = self.execute_command(prompt, session_id, output_dir, on_output, cancel_token, on_error, on_admitted)
+
+            if result and result.returncode == 0:
+                return result.stdout or ""
+            else:
+                return None
+
+        except (AdmissionRejected, OperationCancelled):
+            raise
+        except Exception as e:
+            self._report_error(f"Amazon Q CLI 실행 오류: {str(e)}", on_error)
+            return None
+
+    async def generate_diagram_async(self, tree_structure, checked_items=None, output_dir="generated-diagrams",
+                                     admit=None):
+        """generate_diagram의 asyncio 버전. 실행 오류는 예외로 전달합니다.
+
+        admit은 Q CLI 실행 동안 들어가 있을 비동기 컨텍스트(동시 실행 수 제한용)입니다.
+        """
+        security_requirements_text = format_security_requirements(checked_items or [])
+        prompt_output_dir = await asyncio.to_thread(self._prompt_output_dir, output_dir)
+        prompt = self.generate_diagram_prompt(tree_structure, security_requirements_text, prompt_output_dir)
+
+        wait_started_at = time.perf_counter()
+        async with admit or nullcontext():
+            get_metrics().observe("q_admission_wait_seconds", time.perf_counter() - wait_started_at)
+            result = await self.execute_command_async(prompt)
+        return (result.stdout or "") if result.returncode == 0 else None
+
+# =========================================
+# 다이어그램 관리 클래스
+# =========================================
+class DiagramManager:
+    """다이어그램 파일 관리"""
+
+    def __init__(self, diagram_folder='generated-diagrams', retention=True):
+        # generated-diagrams 폴더 사용
+        self.diagram_folder = Path(diagram_folder)
+        self.diagram_folder.mkdir(parents=True, exist_ok=True)
+        # 요청 ID → 다이어그램 파일 정보 인덱스
+        self.index = DiagramIndex(self.diagram_folder / 'index.sqlite3')
+        # 용량/기간/개수 기반 보관 정책 (프로세스 전체 공유, 백그라운드 실행)
+        # 세션 참조는 프로세스 안에서만 보호되므로, 웹 앱과 폴더를 함께 쓰는 CLI/API는
+        # retention=False로 만들어 정리를 웹 앱 한 곳에 맡깁니다.
+        self.retention = get_retention_engine(self.diagram_folder, self.index) if retention else None
+
+    def create_request(self):
+        """요청 전용 출력 폴더를 만들고 (요청 ID, 폴더 경로)를 반환합니다."""
+        request_id = uuid.uuid4().hex
+        request_folder = self.diagram_folder / request_id
+        with get_metrics().span("diagram_request_create"):
+            request_folder.mkdir(parents=True, exist_ok=True)
+        return request_id, request_folder
+
+    def find_request_diagram(self, request_id):
+        """요청 전용 폴더에 생성된 다이어그램 파일 찾기"""
+        # 해당 요청의 폴더만 확인하므로 다른 세션의 다이어그램과 섞이지 않음
+        with get_metrics().span("diagram_find") as span:
+            png_files = list((self.diagram_folder / request_id).glob('*.png'))
+            if png_files:
+                return max(png_files, key=lambda x: x.stat().st_mtime)
+            span.outcome = "failure"
+            return None
+
+    def record_diagram(self, request_id, diagram_path, started_at, finished_at):
+        """요청 ID와 생성된 다이어그램 정보를 인덱스에 기록합니다."""
+        with get_metrics().span("diagram_index_record"):
+            self.index.record(request_id, diagram_path, started_at, finished_at)
+
+    def get_diagram(self, request_id):
+        """인덱스에서 요청 ID의 다이어그램 경로를 조회합니다."""
+        entry = self.index.get(request_id)
+        if entry and os.path.exists(entry["path"]):
+            return Path(entry["path"])
+        return None
+
+    def discard_request(self, request_id):
+        """다이어그램이 생성되지 않은 요청의 빈 폴더를 정리합니다."""
+        try:
+            (self.diagram_folder / request_id).rmdir()
+        except OSError:
+            pass
+
+    def touch_references(self, session_id, diagram_paths):
+        """세션이 참조 중인 다이어그램을 보관 정책에 알려 삭제되지 않도록 합니다."""
+        if self.retention is not None:
+            self.retention.touch_references(session_id, diagram_paths)
+
+    def get_retention_report(self):
+        """마지막 보관 정책 실행 결과(삭제 항목과 사유)를 반환합니다."""
+        return self.retention.last_report if self.retention is not None else None
+
+    def get_folder_contents(self):
+        """다이어그램 폴더 내용 반환"""
+        if self.diagram_folder.exists():
+            return [f.name for f in self.diagram_folder.glob('*')]
+        return []
+
+# =========================================
+# 다이어그램 생성 단계
+# =========================================
+def _local_render_request(diagram_manager, tree_structure, checked_items):
+    """로컬 렌더링이 가능하면 요청을 만들고 (DOT 텍스트, 요청 ID, 출력 파일 경로)를 반환합니다. 불가능하면 None을 반환합니다."""
+    graph = parse_architecture_tree(tree_structure)
+    # 노드가 하나뿐인 트리는 제대로 된 아키텍처로 보기 어려우므로 Amazon Q에 맡김
+    if not graph or len(graph.nodes) < 2 or not graphviz_renderer.is_available():
+        return None
+
+    request_id, request_folder = diagram_manager.create_request()
+    dot_text = graphviz_renderer.build_dot(graph, checked_items)
+    return dot_text, request_id, request_folder / f"diagram_{request_id[:8]}.png"
+
+def _claim_cached_diagram(diagram_manager, cached_path):
+    """캐시된 다이어그램을 새 요청 폴더에 연결(하드 링크, 불가능하면 복사)하고 경로를 반환합니다.
+
+    캐시는 자체 LRU 정책으로 파일을 삭제하므로, 세션에는 보관 정책이 참조를 보호하는 요청 폴더의
+    파일을 넘깁니다. 그 사이 캐시 파일이 삭제되었으면 None을 반환합니다.
+    """
+    request_id, request_folder = diagram_manager.create_request()
+    target = request_folder / f"diagram_{request_id[:8]}.png"
+    started_at = time.time()
+    try:
+        try:
+            os.link(cached_path, target)
+        except OSError:
+            shutil.copyfile(cached_path, target)
+    except OSError:
+        diagram_manager.discard_request(request_id)
+        return None
+    diagram_manager.record_diagram(request_id, target, started_at, time.time())
+    return str(target)
+
+def _lookup_cache(diagram_manager, diagram_cache, tree_structure, checked_items):
+    """캐시를 사용하면 (캐시 키, 요청 폴더로 가져온 다이어그램 경로 또는 None)을, 사용하지 않으면 (None, None)을 반환합니다."""
+    if diagram_cache is None or not DIAGRAM_CACHE_SETTINGS.get('enabled', False):
+        return None, None
+    cache_key = make_cache_key(tree_structure, checked_items, AmazonQClient.PROMPT_VERSION)
+    cached_diagram = diagram_cache.get(cache_key)
+    if cached_diagram is not None:
+        cached_diagram = _claim_cached_diagram(diagram_manager, cached_diagram)
+    get_metrics().record_cache_lookup("diagram", cached_diagram is not None)
+    return cache_key, cached_diagram
+
+def _finish_q_request(diagram_manager, request_id, generated, started_at, diagram_cache, cache_key):
+    """Q CLI 실행 후 요청 폴더의 다이어그램을 인덱스와 캐시에 기록하고 경로를 반환합니다. 없으면 None을 반환합니다."""
+    diagram_path = diagram_manager.find_request_diagram(request_id) if generated else None
+    if not diagram_path:
+        diagram_manager.discard_request(request_id)
+        return None
+
+    finished_at = time.time()
+    diagram_manager.record_diagram(request_id, diagram_path, started_at, finished_at)
+    if cache_key:
+        diagram_cache.put(cache_key, diagram_path, finished_at - started_at)
+    return str(diagram_path)
+
+def render_local_diagram(diagram_manager, tree_structure, checked_items):
+    """트리를 로컬 graphviz로 렌더링하고 파일 경로를 반환합니다. 불가능하면 None을 반환합니다."""
+    request = _local_render_request(diagram_manager, tree_structure, checked_items)
+    if request is None:
+        return None
+
+    dot_text, request_id, output_path = request
+    started_at = time.time()
+    try:
+        with get_metrics().span("graphviz_render"):
+            diagram_path = graphviz_renderer.render_png(dot_text, output_path)
+    except graphviz_renderer.RendererError:
+        diagram_manager.discard_request(request_id)
+        return None
+
+    diagram_manager.record_diagram(request_id, diagram_path, started_at, time.time())
+    return str(diagram_path)
+
+def generate_with_amazon_q(diagram_manager, amazon_q_client, tree_structure, checked_items,
+                           diagram_cache=None, session_id=None, on_output=None, cancel_token=None, on_error=None,
+                           on_admitted=None):
+    """Amazon Q CLI로 다이어그램을 생성하고 파일 경로를 반환합니다. 실패하면 None을 반환합니다.
+
+    cancel_token이 취소되면 OperationCancelled를 발생시키고, Q CLI 실행 오류는 on_error(메시지)로 알립니다.
+    on_admitted()는 실행 허용 대기열에서 차례를 받으면 호출됩니다. (단계 마감 시간을 이때부터 세도록)
+    """
+    # 같은 트리와 보안 항목으로 생성한 적이 있으면 Q CLI 실행 없이 반환
+    cache_key, cached_diagram = _lookup_cache(diagram_manager, diagram_cache, tree_structure, checked_items)
+    if cached_diagram:
+        return cached_diagram
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    # 요청마다 전용 출력 폴더를 사용하여 다른 세션의 결과와 섞이지 않도록 함
+    request_id, request_folder = diagram_manager.create_request()
+    started_at = time.time()
+    try:
+        result = amazon_q_client.generate_diagram(
+            tree_structure, checked_items, request_folder.resolve(), session_id=session_id, on_output=on_output,
+            cancel_token=cancel_token, on_error=on_error, on_admitted=on_admitted,
+        )
+    except (AdmissionRejected, OperationCancelled):
+        diagram_manager.discard_request(request_id)
+        raise
+    # 출력 없이 성공한 실행("")도 PNG를 찾도록 실패(None)와만 구분
+    return _finish_q_request(diagram_manager, request_id, result is not None, started_at, diagram_cache, cache_key)
+
+def generate_diagram_file(diagram_manager, amazon_q_client, tree_structure, checked_items,
+                          backend="local", diagram_cache=None, session_id=None, on_output=None, cancel_token=None,
+                          on_error=None, on_admitted=None):
+    """backend에 따라 다이어그램을 생성하고 파일 경로를 반환합니다.
+
+    local은 graphviz로 렌더링하고, 트리를 파싱할 수 없거나 graphviz가 없으면 Amazon Q로 대체합니다.
+    on_output은 Amazon Q로 생성할 때 Q CLI 출력을 한 줄씩 받고, cancel_token으로 생성을 취소할 수 있습니다.
+    on_error는 Q CLI 실행 오류 메시지를 받고, on_admitted는 Q CLI 실행 허용 대기열에서 차례를 받으면 호출됩니다.
+    """
+    if backend == "local":
+        diagram_path = render_local_diagram(diagram_manager, tree_structure, checked_items)
+        if diagram_path:
+            return diagram_path
+    return generate_with_amazon_q(
+        diagram_manager, amazon_q_client, tree_structure, checked_items, diagram_cache, session_id, on_output,
+        cancel_token, on_error, on_admitted,
+    )
+
+# =========================================
+# 다이어그램 생성 단계 (asyncio)
+# =========================================
+async def render_local_diagram_async(diagram_manager, tree_structure, checked_items):
+    """render_local_diagram의 asyncio 버전
+
+    트리 파싱, 폴더 생성, SQLite 인덱스 기록 같은 동기 작업은 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+    """
+    request = await asyncio.to_thread(_local_render_request, diagram_manager, tree_structure, checked_items)
+    if request is None:
+        return None
+
+    dot_text, request_id, output_path = request
+    started_at = time.time()
+    try:
+        with get_metrics().span("graphviz_render"):
+            diagram_path = await graphviz_renderer.render_png_async(dot_text, output_path)
+    except graphviz_renderer.RendererError:
+        await asyncio.to_thread(diagram_manager.discard_request, request_id)
+        return None
+
+    await asyncio.to_thread(diagram_manager.record_diagram, request_id, diagram_path, started_at, time.time())
+    return str(diagram_path)
+
+async def generate_with_amazon_q_async(diagram_manager, amazon_q_client, tree_structure, checked_items,
+                                       diagram_cache=None, admit=None):
+    """generate_with_amazon_q의 asyncio 버전. Q CLI 실행 오류는 예외로 전달합니다.
+
+    캐시 인덱스와 SQLite 인덱스를 다루는 동기 작업은 스레드에서 실행합니다.
+    """
+    cache_key, cached_diagram = await asyncio.to_thread(
+        _lookup_cache, diagram_manager, diagram_cache, tree_structure, checked_items
+    )
+    if cached_diagram:
+        return cached_diagram
+
+    request_id, request_folder = await asyncio.to_thread(diagram_manager.create_request)
+    started_at = time.time()
+    try:
+        result = await amazon_q_client.generate_diagram_async(
+            tree_structure, checked_items, request_folder.resolve(), admit=admit
+        )
+    except BaseException:
+        # 실패하거나 취소된 요청의 빈 폴더 정리 (취소 중에도 끝나도록 스레드에 넘기지 않고 바로 실행)
+        diagram_manager.discard_request(request_id)
+        raise
+    return await asyncio.to_thread(
+        _finish_q_request, diagram_manager, request_id, result is not None, started_at, diagram_cache, cache_key
+    )
+
+async def generate_diagram_file_async(diagram_manager, amazon_q_client, tree_structure, checked_items,
+                                      backend="local", diagram_cache=None, admit=None):
+    """generate_diagram_file의 asyncio 버전"""
+    if backend == "local":
+        diagram_path = await render_local_diagram_async(diagram_manager, tree_structure, checked_items)
+        if diagram_path:
+            return diagram_path
+    return await generate_with_amazon_q_async(
+        diagram_manager, amazon_q_client, tree_structure, checked_items, diagram_cache, admit
+    )
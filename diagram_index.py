@@ -0,0 +1,61 @@
+"""
+다이어그램 인덱스 모듈
+
+요청 ID별로 생성된 다이어그램 파일 경로, 크기, 생성 시간을 SQLite에 기록하여
+폴더 전체를 스캔하지 않고 요청 ID로 바로 조회할 수 있게 합니다.
+"""
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+
+class DiagramIndex:
+    """요청 ID → 다이어그램 파일 정보를 저장하는 영구 인덱스"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS diagrams (
+                    request_id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    started_at REAL NOT NULL,
+                    finished_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        """호출마다 새 연결을 만들어 여러 스레드에서 안전하게 사용합니다."""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(self, request_id, path, started_at, finished_at):
+        """요청에 대해 생성된 다이어그램 정보를 기록합니다."""
+        size = Path(path).stat().st_size
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO diagrams VALUES (?, ?, ?, ?, ?)",
+                (request_id, str(path), size, started_at, finished_at),
+            )
+
+    def get(self, request_id):
+        """요청 ID의 다이어그램 정보를 dict로 반환합니다. 없으면 None을 반환합니다."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM diagrams WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["duration"] = entry["finished_at"] - entry["started_at"]
+        return entry
+
+    def remove(self, request_id):
+        """요청 ID의 기록을 삭제합니다."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM diagrams WHERE request_id = ?", (request_id,))
@@ -0,0 +1,101 @@
+"""
+다이어그램 미리보기 모듈
+
+다이어그램 카드(높이 460px)에 표시할 축소 미리보기를 (경로, 수정 시각, 크기) 단위로
+한 번만 만들어 Streamlit 정적 파일 폴더(static/)에 저장합니다. 카드는 정적 URL로
+이미지를 참조하므로 재실행마다 PNG를 읽어 base64로 인라인하지 않습니다.
+원본 해상도 이미지는 다운로드할 때만 사용합니다.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from config import DIAGRAM_PREVIEW_SETTINGS
+
+# Streamlit은 메인 스크립트 옆의 static/ 폴더를 app/static/ 경로로 제공
+STATIC_ROOT = Path(__file__).resolve().parent / "static"
+
+_lock = threading.Lock()
+
+
+def _preview_dir():
+    return STATIC_ROOT / DIAGRAM_PREVIEW_SETTINGS['static_subdir']
+
+
+def _file_signature(image_path):
+    """캐시 키로 사용할 (절대 경로, 수정 시각, 크기)를 반환합니다."""
+    stat = os.stat(image_path)
+    return str(Path(image_path).resolve()), stat.st_mtime_ns, stat.st_size
+
+
+def _downscale(image_path):
+    """카드 크기에 맞게 축소한 PNG 바이트를 반환합니다."""
+    try:
+        from PIL import Image
+    except ImportError:  # Pillow가 없으면 축소 없이 원본을 미리보기로 사용
+        with open(image_path, "rb") as f:
+            return f.read()
+    max_size = (DIAGRAM_PREVIEW_SETTINGS['max_width'], DIAGRAM_PREVIEW_SETTINGS['max_height'])
+    with Image.open(image_path) as image:
+        image.thumbnail(max_size, Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _evict_old_previews(keep):
+    """정적 폴더의 미리보기 수가 한도를 넘으면 오래된 파일부터 삭제합니다."""
+    previews = sorted(_preview_dir().glob("*.png"), key=lambda p: p.stat().st_mtime)
+    for preview in previews[:max(0, len(previews) - DIAGRAM_PREVIEW_SETTINGS['max_files'])]:
+        if preview != keep:
+            preview.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=64)
+def _build_preview(signature):
+    """파일 시그니처별 미리보기를 만들어 정적 폴더에 저장하고 (파일 경로, 크기)를 반환합니다."""
+    image_path = signature[0]
+    key = hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()[:16]
+    preview_path = _preview_dir() / f"{key}.png"
+    with _lock:
+        if not preview_path.exists():
+            preview_path.parent.mkdir(parents=True, exist_ok=True)
+            data = _downscale(image_path)
+            # 임시 파일에 쓴 뒤 교체하여 브라우저가 쓰다 만 파일을 받지 않도록 함
+            tmp_path = preview_path.with_suffix(".png.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, preview_path)
+            _evict_old_previews(preview_path)
+    return preview_path, preview_path.stat().st_size
+
+
+def get_preview_path(image_path):
+    """다이어그램의 축소 미리보기 파일 경로를 반환합니다."""
+    preview_path, _ = _build_preview(_file_signature(image_path))
+    if not preview_path.exists():
+        # 외부에서 정리된 경우 다시 생성
+        _build_preview.cache_clear()
+        preview_path, _ = _build_preview(_file_signature(image_path))
+    return preview_path
+
+
+def get_preview_url(image_path):
+    """미리보기의 Streamlit 정적 파일 URL을 반환합니다."""
+    preview_path = get_preview_path(image_path)
+    return f"app/static/{preview_path.relative_to(STATIC_ROOT).as_posix()}"
+
+
+@lru_cache(maxsize=16)
+def _preview_data_uri(signature):
+    preview_path, _ = _build_preview(signature)
+    return "data:image/png;base64," + base64.b64encode(preview_path.read_bytes()).decode()
+
+
+def get_preview_data_uri(image_path):
+    """정적 파일 제공이 꺼져 있을 때 사용할 미리보기 data URI를 반환합니다. (시그니처별로 1회 인코딩)"""
+    get_preview_path(image_path)
+    return _preview_data_uri(_file_signature(image_path))
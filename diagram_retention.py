@@ -0,0 +1,210 @@
+"""
+다이어그램 보관 정책 모듈
+
+generated-diagrams 폴더의 전체 용량, 보관 기간, 파일 수 한도를 넘으면
+오래되었거나 가장 오래 사용되지 않은 다이어그램부터 백그라운드에서 삭제합니다.
+활성 세션이 참조 중인 다이어그램은 삭제하지 않습니다.
+"""
+import logging
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from config import DIAGRAM_RETENTION_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# 삭제 사유
+REASON_MAX_AGE = "max_age"
+REASON_MAX_BYTES = "max_bytes"
+REASON_MAX_FILES = "max_files"
+
+_lock = threading.Lock()
+_instance = None
+
+
+class RetentionEngine:
+    """용량/기간/개수 기반 다이어그램 정리 엔진"""
+
+    def __init__(self, diagram_folder, index, max_total_bytes, max_age_seconds,
+                 max_files, min_age_seconds, session_idle_seconds):
+        self.diagram_folder = Path(diagram_folder)
+        self.index = index
+        self.max_total_bytes = max_total_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_files = max_files
+        self.min_age_seconds = min_age_seconds
+        self.session_idle_seconds = session_idle_seconds
+        self.last_report = None
+        # 세션 ID → (마지막 확인 시각, 참조 중인 경로들)
+        self._references = {}
+        # 경로 → 마지막으로 세션이 참조한 시각 (LRU 판단용)
+        self._last_used = {}
+        self._references_lock = threading.Lock()
+        self._thread = None
+
+    def _unit_for(self, path):
+        """파일 경로를 정리 단위(요청 폴더 또는 루트의 개별 파일)로 변환합니다."""
+        path = Path(path).resolve()
+        root = self.diagram_folder.resolve()
+        if path.parent != root and path.parent.parent == root:
+            return path.parent
+        return path
+
+    def touch_references(self, session_id, paths):
+        """세션이 현재 참조 중인 다이어그램을 기록합니다. (매 재실행마다 호출)"""
+        now = time.time()
+        units = {self._unit_for(path) for path in paths if path}
+        with self._references_lock:
+            self._references[session_id] = (now, units)
+            for unit in units:
+                self._last_used[unit] = now
+
+    def _active_units(self):
+        """최근에 활동한 세션이 참조 중인 정리 단위 집합을 반환합니다."""
+        now = time.time()
+        active = set()
+        with self._references_lock:
+            for session_id, (seen_at, units) in list(self._references.items()):
+                if now - seen_at > self.session_idle_seconds:
+                    # 오래 활동이 없는 세션의 참조는 해제
+                    del self._references[session_id]
+                    continue
+                active.update(units)
+        return active
+
+    def _collect(self):
+        """정리 대상 후보(요청 폴더, 루트 PNG)의 크기와 사용 시각을 수집합니다."""
+        candidates = []
+        for entry in self.diagram_folder.iterdir():
+            # .cache 등 숨김 폴더는 각자의 정책으로 관리
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                files = [f for f in entry.rglob("*") if f.is_file()]
+                stats = [f.stat() for f in files]
+                size = sum(stat.st_size for stat in stats)
+                modified = max([stat.st_mtime for stat in stats] + [entry.stat().st_mtime])
+            elif entry.suffix.lower() == ".png":
+                stat = entry.stat()
+                size, modified = stat.st_size, stat.st_mtime
+            else:
+                continue
+            unit = entry.resolve()
+            with self._references_lock:
+                last_used = max(modified, self._last_used.get(unit, 0))
+            candidates.append({
+                "path": unit,
+                "size": size,
+                "modified": modified,
+                "last_used": last_used,
+            })
+        return candidates
+
+    def _delete(self, candidate):
+        """정리 단위를 삭제하고 인덱스에서도 제거합니다."""
+        path = candidate["path"]
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+            self.index.remove(path.name)
+        else:
+            path.unlink(missing_ok=True)
+        with self._references_lock:
+            self._last_used.pop(path, None)
+
+    def run_once(self):
+        """보관 정책을 한 번 적용하고 삭제 내역 보고서를 반환합니다."""
+        now = time.time()
+        active = self._active_units()
+        candidates = self._collect()
+        total_bytes = sum(c["size"] for c in candidates)
+        total_files = len(candidates)
+        evicted = []
+
+        def _evictable(candidate):
+            # 활성 세션이 참조 중이거나 아직 생성 중일 수 있는 최근 항목은 보호
+            return (
+                candidate["path"] not in active
+                and now - candidate["modified"] >= self.min_age_seconds
+            )
+
+        def _evict(candidate, reason):
+            nonlocal total_bytes, total_files
+            try:
+                self._delete(candidate)
+            except OSError as e:
+                logger.warning("다이어그램 삭제 실패: %s (%s)", candidate["path"], e)
+                return
+            total_bytes -= candidate["size"]
+            total_files -= 1
+            evicted.append({
+                "path": str(candidate["path"]),
+                "size": candidate["size"],
+                "reason": reason,
+            })
+
+        # 1. 보관 기간이 지난 항목 삭제
+        remaining = []
+        for candidate in candidates:
+            if _evictable(candidate) and now - candidate["modified"] > self.max_age_seconds:
+                _evict(candidate, REASON_MAX_AGE)
+            else:
+                remaining.append(candidate)
+
+        # 2. 용량/개수 한도를 넘으면 가장 오래 사용되지 않은 항목부터 삭제
+        for candidate in sorted(remaining, key=lambda c: c["last_used"]):
+            if total_bytes <= self.max_total_bytes and total_files <= self.max_files:
+                break
+            if not _evictable(candidate):
+                continue
+            reason = REASON_MAX_BYTES if total_bytes > self.max_total_bytes else REASON_MAX_FILES
+            _evict(candidate, reason)
+
+        report = {
+            "ran_at": now,
+            "evicted": evicted,
+            "freed_bytes": sum(item["size"] for item in evicted),
+            "total_bytes": total_bytes,
+            "total_files": total_files,
+            "protected": len(active),
+        }
+        for item in evicted:
+            logger.info("다이어그램 삭제: %s (%d bytes, 사유: %s)", item["path"], item["size"], item["reason"])
+        self.last_report = report
+        return report
+
+    def start(self, interval_seconds):
+        """백그라운드 스레드에서 주기적으로 정리를 실행합니다."""
+        if self._thread is not None:
+            return
+
+        def _loop():
+            while True:
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.exception("다이어그램 보관 정책 실행 중 오류")
+                time.sleep(interval_seconds)
+
+        self._thread = threading.Thread(target=_loop, name="diagram-retention", daemon=True)
+        self._thread.start()
+
+
+def get_retention_engine(diagram_folder, index):
+    """프로세스 전체에서 공유하는 보관 정책 엔진을 반환합니다. (최초 호출 시 시작)"""
+    global _instance
+    with _lock:
+        if _instance is None:
+            _instance = RetentionEngine(
+                diagram_folder,
+                index,
+                max_total_bytes=DIAGRAM_RETENTION_SETTINGS['max_total_bytes'],
+                max_age_seconds=DIAGRAM_RETENTION_SETTINGS['max_age_seconds'],
+                max_files=DIAGRAM_RETENTION_SETTINGS['max_files'],
+                min_age_seconds=DIAGRAM_RETENTION_SETTINGS['min_age_seconds'],
+                session_idle_seconds=DIAGRAM_RETENTION_SETTINGS['session_idle_seconds'],
+            )
+            if DIAGRAM_RETENTION_SETTINGS.get('enabled', False):
+                _instance.start(DIAGRAM_RETENTION_SETTINGS['interval_seconds'])
+        return _instance
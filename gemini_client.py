@@ -0,0 +1,272 @@
+"""
+Gemini 클라이언트 모듈
+
+google.generativeai SDK는 불러오는 데 시간이 오래 걸리므로 모델을 처음 만들 때만 가져옵니다.
+모델 객체의 수명(공유, 상태 확인, 재초기화)은 main.py의 st.cache_resource(HTTP API는 api_server.py)가 관리합니다.
+
+모든 generate_content 호출은 프로세스 전체에서 공유하는 토큰 버킷으로 속도를 제한하고,
+429/5xx 같은 일시적 오류는 호출별 마감 시간 안에서 지수 백오프(지터 포함)로 재시도합니다.
+챗봇 대화 기록은 토큰 예산(추정치) 안에 들어가는 최근 턴만 함께 보냅니다.
+"""
+import asyncio
+import random
+import threading
+import time
+
+from config import GEMINI_RATE_LIMIT_SETTINGS
+from metrics import get_metrics
+
+# 재시도할 HTTP 상태 코드 (한도 초과, 일시적 서버 오류)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 대화 기록에서 잘라 낸 메시지 끝에 붙이는 표시
+TRUNCATED_MARKER = "\n…(이하 생략)"
+
+_lock = threading.Lock()
+_rate_limiter = None
+
+
+class GeminiDeadlineExceeded(Exception):
+    """호출 마감 시간 안에 응답을 받지 못했을 때 발생하는 예외"""
+
+
+def create_gemini_model(api_key, model_name, system_instruction=None):
+    """API 키를 설정하고 Gemini 모델 객체를 만듭니다. (고정 지시문은 system_instruction으로 설정)"""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+
+def estimate_tokens(text):
+    """문자 종류별 대략적인 토큰 수를 추정합니다. (ASCII 4자당 1토큰, 한글/선 문자 1자당 1토큰)"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars / 4 + (len(text) - ascii_chars)
+
+
+def truncate_to_tokens(text, token_budget):
+    """text를 추정 토큰 수가 token_budget 이하가 되도록 앞부분만 남기고 자릅니다. (잘리면 생략 표시 추가)"""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    used_tokens = estimate_tokens(TRUNCATED_MARKER)
+    for i, ch in enumerate(text):
+        used_tokens += 0.25 if ord(ch) < 128 else 1
+        if used_tokens > token_budget:
+            return text[:i] + TRUNCATED_MARKER
+    return text
+
+
+def trim_chat_history(history, token_budget):
+    """대화 기록(start_chat history 형식)에서 token_budget 안에 들어가는 최근 턴만 남겨 반환합니다.
+
+    (사용자, 모델) 메시지 쌍 단위로 오래된 것부터 버립니다. 예산을 넘는 턴은 버리지 않고
+    남은 예산에 맞게 잘라서 넣으므로, 예산이 0이 아니면 가장 최근 턴은 항상 남습니다.
+    (이전 턴은 남은 예산이 전체의 1/4 이상일 때만 잘라서 넣습니다.)
+    """
+    kept = []
+    remaining = token_budget
+    for start in range(len(history) - 2, -1, -2):
+        if remaining <= 0:
+            break
+        turn = history[start:start + 2]
+        texts = ["\n".join(content["parts"]) for content in turn]
+        turn_tokens = sum(map(estimate_tokens, texts))
+        if turn_tokens > remaining:
+            if kept and remaining < token_budget / 4:
+                break
+            # 사용자 요청은 남은 예산의 절반까지, 모델 응답은 나머지 예산만큼 앞부분을 남김
+            user_text = truncate_to_tokens(texts[0], remaining / 2)
+            model_text = truncate_to_tokens(texts[1], remaining - estimate_tokens(user_text))
+            turn = [
+                {"role": turn[0]["role"], "parts": [user_text]},
+                {"role": turn[1]["role"], "parts": [model_text]},
+            ]
+            turn_tokens = remaining
+        kept[:0] = turn
+        remaining -= turn_tokens
+    return kept
+
+
+def input_token_count(response):
+    """응답의 사용량 정보에서 입력(system instruction + 대화 기록 + 메시지) 토큰 수를 반환합니다.
+
+    사용량 정보가 없으면 None을 반환합니다. 스트리밍 응답은 끝까지 읽은 뒤에 호출해야 합니다.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "prompt_token_count", None) or None
+
+
+def mark_unhealthy(model):
+    """API 호출이 실패한 모델을 표시하여 다음 사용 시 다시 초기화되게 합니다."""
+    if model is not None:
+        model._resource_unhealthy = True
+
+
+def is_healthy(model):
+    """실패로 표시되지 않은 모델이면 True를 반환합니다."""
+    return not getattr(model, "_resource_unhealthy", False)
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지고 최대 capacity개까지 쌓이는 토큰 버킷"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_take(self, deadline):
+        """토큰이 있으면 하나 가져가고 0을, 없으면 다음 토큰까지 기다릴 시간(초)을 반환합니다.
+
+        그 시간만큼 기다리면 마감 시간을 넘기는 경우 GeminiDeadlineExceeded를 발생시킵니다.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            wait_seconds = (1 - self._tokens) / self.rate
+        if now + wait_seconds > deadline:
+            raise GeminiDeadlineExceeded("Gemini 요청 한도로 대기하는 중 마감 시간을 초과했습니다.")
+        return wait_seconds
+
+    def acquire(self, deadline):
+        """토큰 하나를 얻을 때까지 기다리고 대기한 시간(초)을 반환합니다.
+
+        마감 시간 전에 토큰을 얻을 수 없으면 GeminiDeadlineExceeded를 발생시킵니다.
+        """
+        started_at = time.monotonic()
+        while (wait_seconds := self._try_take(deadline)) > 0:
+            time.sleep(wait_seconds)
+        return time.monotonic() - started_at
+
+    async def acquire_async(self, deadline):
+        """acquire의 asyncio 버전 (이벤트 루프를 막지 않고 기다림)"""
+        started_at = time.monotonic()
+        while (wait_seconds := self._try_take(deadline)) > 0:
+            await asyncio.sleep(wait_seconds)
+        return time.monotonic() - started_at
+
+
+def _get_rate_limiter():
+    """프로세스 전체에서 공유하는 토큰 버킷을 반환합니다."""
+    global _rate_limiter
+    with _lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(
+                GEMINI_RATE_LIMIT_SETTINGS['requests_per_minute'] / 60,
+                GEMINI_RATE_LIMIT_SETTINGS['burst'],
+            )
+        return _rate_limiter
+
+
+def is_retryable(error):
+    """한도 초과나 일시적 서버 오류처럼 다시 시도할 만한 예외인지 확인합니다."""
+    # google.api_core 예외는 HTTP 상태 코드를 code 속성으로 가짐
+    code = getattr(error, "code", None)
+    return code in RETRYABLE_STATUS_CODES or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _backoff_delay(attempt):
+    """attempt번째 재시도 전 대기 시간 (지수 백오프 + 전체 지터)"""
+    ceiling = min(
+        GEMINI_RATE_LIMIT_SETTINGS['max_delay'],
+        GEMINI_RATE_LIMIT_SETTINGS['base_delay'] * (2 ** attempt),
+    )
+    return random.uniform(0, ceiling)
+
+
+def _next_retry_delay(error, attempt, deadline, deadline_seconds):
+    """실패한 호출을 다시 시도하기 전 대기 시간을 반환합니다. 재시도할 수 없으면 예외를 발생시킵니다."""
+    if not is_retryable(error) or attempt >= GEMINI_RATE_LIMIT_SETTINGS['max_retries']:
+        raise error
+    delay = _backoff_delay(attempt)
+    if time.monotonic() + delay >= deadline:
+        raise GeminiDeadlineExceeded(
+            f"Gemini 호출 마감 시간({deadline_seconds}초) 안에 재시도할 수 없습니다: {error}"
+        ) from error
+    get_metrics().inc("gemini_retries_total")
+    return delay
+
+
+def generate_content(model, prompt, deadline_seconds, **kwargs):
+    """속도 제한, 재시도, 마감 시간을 적용하여 model.generate_content를 호출합니다.
+
+    반환값은 (응답, 호출 정보)이며 호출 정보에는 대기 시간과 재시도 횟수가 들어 있습니다.
+    스트리밍 응답은 첫 요청까지만 재시도하고, 이후 청크를 읽다 발생한 오류는 호출한 쪽에 전달됩니다.
+    """
+    if not GEMINI_RATE_LIMIT_SETTINGS.get('enabled', False):
+        return model.generate_content(prompt, **kwargs), {"waited_seconds": 0.0, "retries": 0}
+
+    deadline = time.monotonic() + deadline_seconds
+    limiter = _get_rate_limiter()
+    metrics = get_metrics()
+    waited_seconds = 0.0
+    attempt = 0
+    try:
+        while True:
+            wait_seconds = limiter.acquire(deadline)
+            metrics.observe("gemini_limiter_wait_seconds", wait_seconds)
+            waited_seconds += wait_seconds
+            remaining = deadline - time.monotonic()
+            try:
+                response = model.generate_content(
+                    prompt, request_options={"timeout": remaining}, **kwargs
+                )
+                break
+            except Exception as e:
+                delay = _next_retry_delay(e, attempt, deadline, deadline_seconds)
+                attempt += 1
+                time.sleep(delay)
+    except GeminiDeadlineExceeded:
+        metrics.inc("gemini_calls_total", outcome="timeout")
+        raise
+    except Exception:
+        metrics.inc("gemini_calls_total", outcome="failure")
+        raise
+
+    metrics.inc("gemini_calls_total", outcome="success")
+    return response, {"waited_seconds": waited_seconds, "retries": attempt}
+
+
+async def generate_content_async(model, prompt, deadline_seconds, **kwargs):
+    """generate_content의 asyncio 버전 (model.generate_content_async 사용)
+
+    속도 제한 대기와 재시도 대기도 이벤트 루프를 막지 않습니다.
+    """
+    if not GEMINI_RATE_LIMIT_SETTINGS.get('enabled', False):
+        return await model.generate_content_async(prompt, **kwargs), {"waited_seconds": 0.0, "retries": 0}
+
+    deadline = time.monotonic() + deadline_seconds
+    limiter = _get_rate_limiter()
+    metrics = get_metrics()
+    waited_seconds = 0.0
+    attempt = 0
+    try:
+        while True:
+            wait_seconds = await limiter.acquire_async(deadline)
+            metrics.observe("gemini_limiter_wait_seconds", wait_seconds)
+            waited_seconds += wait_seconds
+            remaining = deadline - time.monotonic()
+            try:
+                response = await model.generate_content_async(
+                    prompt, request_options={"timeout": remaining}, **kwargs
+                )
+                break
+            except Exception as e:
+                delay = _next_retry_delay(e, attempt, deadline, deadline_seconds)
+                attempt += 1
+                await asyncio.sleep(delay)
+    except GeminiDeadlineExceeded:
+        metrics.inc("gemini_calls_total", outcome="timeout")
+        raise
+    except Exception:
+        metrics.inc("gemini_calls_total", outcome="failure")
+        raise
+
+    metrics.inc("gemini_calls_total", outcome="success")
+    return response, {"waited_seconds": waited_seconds, "retries": attempt}
@@ -0,0 +1,193 @@
+"""
+로컬 Graphviz 다이어그램 렌더러 모듈
+
+파싱된 아키텍처 트리를 DOT 그래프로 변환하고 설치된 graphviz(dot)로
+PNG를 직접 렌더링합니다. VPC/서브넷은 클러스터로 묶고, 체크된 보안 항목은
+'*' 표시와 강조 스타일로 구분합니다.
+"""
+import asyncio
+import shutil
+import subprocess
+
+from config import GRAPHVIZ_SETTINGS
+
+# 하위 노드를 감싸는 클러스터로 그릴 서비스
+CONTAINER_SERVICES = {"VPC", "Public Subnet", "Private Subnet", "Subnet", "Auto Scaling"}
+
+# 체크리스트 항목 → 다이어그램에서 강조할 서비스 (트리에 없으면 추가할 노드 이름)
+SECURITY_ITEM_SERVICES = {
+    "VPC 적용 여부": ({"VPC"}, "VPC"),
+    "퍼블릭,프라이빗 서브넷 분리": ({"Public Subnet", "Private Subnet", "Subnet"}, "Public / Private Subnet"),
+    "데이터 암호화": ({"KMS"}, "KMS (데이터 암호화)"),
+    "로드밸런서 설정": ({"ELB", "ALB", "NLB"}, "ELB"),
+    "WAF 설정": ({"WAF"}, "WAF"),
+    "CloudFront 설정": ({"CloudFront"}, "CloudFront"),
+    "CloudTrail 설정": ({"CloudTrail"}, "CloudTrail"),
+    "CloudWatch 설정": ({"CloudWatch"}, "CloudWatch"),
+    "CloudWatch 로그 설정": ({"CloudWatch Logs"}, "CloudWatch Logs"),
+}
+
+# 서비스 분류별 노드 색상
+_SERVICE_COLORS = {
+    "EC2": "#F58536", "Auto Scaling": "#F58536", "Lambda": "#F58536", "ECS": "#F58536",
+    "EKS": "#F58536", "Fargate": "#F58536", "ECR": "#F58536",
+    "S3": "#7AA116", "EFS": "#7AA116", "EBS": "#7AA116",
+    "RDS": "#3B48CC", "Aurora": "#3B48CC", "DynamoDB": "#3B48CC", "ElastiCache": "#3B48CC",
+    "ELB": "#8C4FFF", "ALB": "#8C4FFF", "NLB": "#8C4FFF", "CloudFront": "#8C4FFF",
+    "Route 53": "#8C4FFF", "API Gateway": "#8C4FFF", "Internet Gateway": "#8C4FFF",
+    "NAT Gateway": "#8C4FFF",
+    "WAF": "#DD344C", "Shield": "#DD344C", "IAM": "#DD344C", "KMS": "#DD344C",
+    "Cognito": "#DD344C", "Secrets Manager": "#DD344C", "GuardDuty": "#DD344C",
+    "Security Group": "#DD344C",
+    "CloudWatch": "#E7157B", "CloudWatch Logs": "#E7157B", "CloudTrail": "#E7157B",
+    "Config": "#E7157B",
+}
+_DEFAULT_COLOR = "#232F3E"
+_SECURITY_COLOR = "#DD344C"
+
+
+class RendererError(Exception):
+    """로컬 렌더링에 실패했을 때 발생하는 예외"""
+
+
+def is_available():
+    """graphviz dot 실행 파일이 설치되어 있는지 확인합니다."""
+    return shutil.which(GRAPHVIZ_SETTINGS['dot_path']) is not None
+
+
+def _quote(text):
+    """DOT 문자열 리터럴로 이스케이프합니다."""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def build_dot(graph, checked_items=None):
+    """ArchitectureGraph와 체크된 보안 항목으로 DOT 그래프 텍스트를 만듭니다."""
+    checked_items = checked_items or []
+
+    # 체크된 보안 항목에 해당하는 서비스와, 트리에 없어 추가해야 할 보안 노드
+    present_services = {node.service for node in graph.nodes if node.service}
+    security_services = set()
+    extra_security_nodes = []
+    for item in checked_items:
+        services, fallback_label = SECURITY_ITEM_SERVICES.get(item, (set(), item))
+        security_services.update(services)
+        if not services & present_services:
+            extra_security_nodes.append(fallback_label)
+
+    lines = [
+        "digraph architecture {",
+        '  graph [rankdir=TB, fontname="Helvetica", fontsize=12, compound=true, nodesep=0.4, ranksep=0.6];',
+        '  node [shape=box, style="rounded,filled", fontname="Helvetica", fontsize=11, '
+        'fontcolor="white", color="#232F3E", penwidth=1];',
+        '  edge [color="#545B64", arrowsize=0.7];',
+    ]
+
+    def is_cluster(node):
+        # 자식이 있는 VPC/서브넷과 최상위 루트(예: AWS Cloud)는 영역으로 표시
+        has_children = bool(graph.children(node.node_id))
+        return has_children and (node.service in CONTAINER_SERVICES or node.parent_id is None)
+
+    def node_label(node):
+        is_security = node.service in security_services
+        return ("* " if is_security else "") + node.label, is_security
+
+    # 클러스터 안쪽을 가리키는 간선을 위해 클러스터의 대표 노드(첫 자식) 기록
+    anchors = {}
+
+    def emit(node, indent):
+        pad = "  " * indent
+        label, is_security = node_label(node)
+        if is_cluster(node):
+            style = f'color="{_SECURITY_COLOR}"; penwidth=2' if is_security else 'color="#879196"'
+            lines.append(f"{pad}subgraph cluster_{node.node_id} {{")
+            lines.append(f'{pad}  label={_quote(label)}; style="rounded,dashed"; {style};')
+            children = graph.children(node.node_id)
+            for child in children:
+                emit(child, indent + 1)
+            anchors[node.node_id] = anchors.get(children[0].node_id, f"n{children[0].node_id}")
+            lines.append(f"{pad}}}")
+            return
+
+        color = _SECURITY_COLOR if is_security else _SERVICE_COLORS.get(node.service, _DEFAULT_COLOR)
+        extra = ', penwidth=3, color="#FFD700"' if is_security else ""
+        lines.append(f'{pad}n{node.node_id} [label={_quote(label)}, fillcolor="{color}"{extra}];')
+        for child in graph.children(node.node_id):
+            emit(child, indent)
+
+    for root in graph.roots():
+        emit(root, 1)
+
+    # 클러스터가 아닌 부모 → 자식 연결 (자식이 클러스터면 클러스터 경계로 연결)
+    for parent_id, child_id in graph.edges:
+        parent = graph.nodes[parent_id]
+        if is_cluster(parent):
+            continue
+        child = graph.nodes[child_id]
+        if is_cluster(child):
+            lines.append(f"  n{parent_id} -> {anchors[child_id]} [lhead=cluster_{child_id}];")
+        else:
+            lines.append(f"  n{parent_id} -> n{child_id};")
+
+    if extra_security_nodes:
+        lines.append("  subgraph cluster_security {")
+        lines.append(f'    label={_quote("보안 요소")}; style="rounded,dashed"; color="{_SECURITY_COLOR}";')
+        for index, label in enumerate(extra_security_nodes):
+            lines.append(
+                f'    s{index} [label={_quote("* " + label)}, fillcolor="{_SECURITY_COLOR}", '
+                'penwidth=3, color="#FFD700"];'
+            )
+        lines.append("  }")
+
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def _dot_command(output_path):
+    return [GRAPHVIZ_SETTINGS['dot_path'], "-Tpng", f"-Gdpi={GRAPHVIZ_SETTINGS['dpi']}", "-o", str(output_path)]
+
+
+def render_png(dot_text, output_path, timeout=None):
+    """DOT 텍스트를 PNG 파일로 렌더링합니다."""
+    timeout = timeout or GRAPHVIZ_SETTINGS['timeout']
+    try:
+        result = subprocess.run(
+            _dot_command(output_path),
+            input=dot_text,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            timeout=timeout,
+        )
+    except FileNotFoundError:
+        raise RendererError("graphviz(dot)가 설치되어 있지 않습니다.")
+    except subprocess.TimeoutExpired:
+        raise RendererError("graphviz 렌더링 시간이 초과되었습니다.")
+    if result.returncode != 0:
+        raise RendererError(f"graphviz 렌더링 실패: {result.stderr.strip()}")
+    return output_path
+
+
+async def render_png_async(dot_text, output_path, timeout=None):
+    """render_png의 asyncio 버전 (asyncio 하위 프로세스로 dot 실행)"""
+    timeout = timeout or GRAPHVIZ_SETTINGS['timeout']
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *_dot_command(output_path),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        raise RendererError("graphviz(dot)가 설치되어 있지 않습니다.")
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(dot_text.encode("utf-8")), timeout)
+    except asyncio.TimeoutError:
+        raise RendererError("graphviz 렌더링 시간이 초과되었습니다.")
+    finally:
+        # 시간 초과/취소 시 dot 프로세스가 남지 않도록 종료
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    if process.returncode != 0:
+        raise RendererError(f"graphviz 렌더링 실패: {stderr.decode('utf-8', errors='replace').strip()}")
+    return output_path
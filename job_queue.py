@@ -0,0 +1,208 @@
+"""
+백그라운드 작업 큐 모듈
+
+다이어그램 생성처럼 오래 걸리는 작업을 Streamlit 스크립트 스레드 밖에서 실행합니다.
+작업은 프로세스 전체에서 공유되므로 재실행(rerun)과 탭 전환 후에도 유지됩니다.
+HTTP API는 같은 작업 모델을 asyncio 이벤트 루프에서 실행하는 AsyncJobManager를 사용합니다.
+"""
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cancellation import CancelToken, OperationCancelled
+from config import JOB_SETTINGS
+
+# 작업 상태
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_lock = threading.Lock()
+_instance = None
+
+
+class Job:
+    """작업 하나의 상태, 진행 상황, 결과"""
+
+    def __init__(self, job_id, name, session_id=None):
+        self.job_id = job_id
+        self.name = name
+        self.session_id = session_id
+        self.state = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # 취소 요청 (작업 함수가 Q CLI 실행 등에 전달하여 중단)
+        self.cancel_token = CancelToken()
+        self._lock = threading.Lock()
+
+    def set_progress(self, stage, state, message):
+        """단계별 진행 상황을 기록합니다. (작업 스레드에서 호출)"""
+        with self._lock:
+            self.progress[stage] = {"state": state, "message": message}
+
+    def get_progress(self):
+        """단계별 진행 상황의 복사본을 반환합니다."""
+        with self._lock:
+            return dict(self.progress)
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancel_requested(self):
+        return self.cancel_token.cancelled
+
+    @property
+    def elapsed_seconds(self):
+        """작업 시작(또는 대기 시작)부터 지금/종료까지 걸린 시간"""
+        start = self.started_at or self.created_at
+        end = self.finished_at or time.time()
+        return end - start
+
+
+class JobManager:
+    """제한된 개수의 작업 스레드로 작업을 실행하고 결과를 보관합니다."""
+
+    def __init__(self, max_workers, max_finished_jobs):
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+    def submit(self, name, fn, *args, session_id=None, **kwargs):
+        """작업을 큐에 넣고 작업 ID를 반환합니다. fn은 fn(job, *args, **kwargs)로 호출됩니다."""
+        job = Job(uuid.uuid4().hex, name, session_id)
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.job_id
+
+    def _run(self, job, fn, args, kwargs):
+        """작업 스레드에서 작업을 실행하고 상태를 갱신합니다."""
+        job.started_at = time.time()
+        if job.cancel_requested:
+            # 대기 중에 취소된 작업은 실행하지 않음
+            job.state = CANCELLED
+            job.finished_at = job.started_at
+            return
+        job.state = RUNNING
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.state = DONE
+        except OperationCancelled as e:
+            job.error = str(e)
+            job.state = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.state = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        """작업을 반환합니다. 없거나 정리되었으면 None을 반환합니다."""
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """작업 취소를 요청합니다. 요청했으면 True를, 없거나 이미 끝난 작업이면 False를 반환합니다."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_token.cancel()
+        return True
+
+    def _prune(self):
+        """완료된 작업이 너무 많으면 오래된 것부터 제거합니다."""
+        _prune_finished_jobs(self._jobs, self.max_finished_jobs)
+
+
+class AsyncJobManager:
+    """asyncio 이벤트 루프에서 작업(코루틴)을 실행하고 결과를 보관합니다.
+
+    작업마다 스레드를 쓰지 않으며, 동시에 실행되는 작업 수만 max_running으로 제한합니다.
+    이벤트 루프 스레드에서만 호출해야 합니다.
+    """
+
+    def __init__(self, max_running, max_finished_jobs):
+        self.max_finished_jobs = max_finished_jobs
+        self._semaphore = asyncio.Semaphore(max_running)
+        self._jobs = OrderedDict()
+        # 작업 ID → 실행 중인 태스크 (가비지 컬렉션 방지와 취소용)
+        self._tasks = {}
+
+    def submit(self, name, coroutine_fn, *args, session_id=None, **kwargs):
+        """작업을 큐에 넣고 작업 ID를 반환합니다. coroutine_fn은 await coroutine_fn(job, *args, **kwargs)로 실행됩니다."""
+        job = Job(uuid.uuid4().hex, name, session_id)
+        self._jobs[job.job_id] = job
+        _prune_finished_jobs(self._jobs, self.max_finished_jobs)
+        task = asyncio.create_task(self._run(job, coroutine_fn, args, kwargs))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job.job_id
+
+    async def _run(self, job, coroutine_fn, args, kwargs):
+        """실행 자리가 나면 작업을 실행하고 상태를 갱신합니다."""
+        try:
+            async with self._semaphore:
+                job.state = RUNNING
+                job.started_at = time.time()
+                try:
+                    job.result = await coroutine_fn(job, *args, **kwargs)
+                    job.state = DONE
+                except Exception as e:
+                    job.error = str(e)
+                    job.state = FAILED
+        except asyncio.CancelledError:
+            # 취소된 작업 (실행 중이던 Q CLI 프로세스 트리는 실행 함수가 종료함)
+            job.error = "작업이 취소되었습니다."
+            job.state = CANCELLED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        """작업을 반환합니다. 없거나 정리되었으면 None을 반환합니다."""
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """작업을 취소합니다. 취소했으면 True를, 없거나 이미 끝난 작업이면 False를 반환합니다."""
+        job = self._jobs.get(job_id)
+        task = self._tasks.get(job_id)
+        if job is None or task is None or job.finished:
+            return False
+        job.cancel_token.cancel()
+        task.cancel()
+        return True
+
+    def pending_count(self):
+        """대기 중이거나 실행 중인 작업 수를 반환합니다."""
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+
+def _prune_finished_jobs(jobs, max_finished_jobs):
+    """완료된 작업이 max_finished_jobs개를 넘으면 오래된 것부터 제거합니다."""
+    finished = [job_id for job_id, job in jobs.items() if job.finished]
+    for job_id in finished[:max(0, len(finished) - max_finished_jobs)]:
+        del jobs[job_id]
+
+
+def get_job_manager():
+    """프로세스 전체에서 공유하는 작업 관리자를 반환합니다."""
+    global _instance
+    with _lock:
+        if _instance is None:
+            _instance = JobManager(
+                JOB_SETTINGS['max_workers'],
+                JOB_SETTINGS['max_finished_jobs'],
+            )
+        return _instance
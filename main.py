@@ -1,13 +1,4 @@
 import streamlit as st 
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-import html
-import re
-import subprocess
-import platform
-from pathlib import Path
-from config import GOOGLE_API_KEY, AMAZON_Q_PATH, DIAGRAM_SETTINGS
 # =========================================
 # 1. 세션 상태 초기화
 # =========================================
@@ -44,12 +35,58 @@ if st.session_state.show_landing:
 
     st.stop()  # 랜딩 화면이면 여기서 종료
 
+# =========================================
+# 모듈 불러오기 (랜딩 화면 이후에만 필요)
+# =========================================
+import os
+from dotenv import load_dotenv
+import html
+import mmap
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from config import (
+    GOOGLE_API_KEY, AMAZON_Q_PATH, GEMINI_MODEL, DIAGRAM_SETTINGS,
+    DIAGRAM_CACHE_SETTINGS, ANALYSIS_CACHE_SETTINGS, CHAT_SETTINGS, CHAT_ARCHIVE_SETTINGS, JOB_SETTINGS,
+    DOWNLOAD_SETTINGS, GEMINI_RATE_LIMIT_SETTINGS, METRICS_SETTINGS,
+)
+from diagram_cache import get_diagram_cache
+from analysis_cache import get_analysis_cache, make_analysis_key
+from chat_archive import get_chat_archive
+from q_admission import get_admission_controller
+from q_process import get_q_timeout, format_reclaim_report
+from cancellation import CancelToken, OperationCancelled, on_cancel
+from metrics import get_metrics, outcome_for_error
+from job_queue import get_job_manager, QUEUED, DONE, CANCELLED
+from diagram_generator import (
+    BASIC_SECURITY_CHECKLIST, AmazonQClient, DiagramManager, generate_diagram_file,
+)
+from architecture_tree import parse_architecture_tree, has_architecture_tree, to_summary, extract_edit_ops, apply_edit_ops
+from gemini_client import (
+    create_gemini_model, mark_unhealthy, is_healthy, generate_content as gemini_generate_content,
+    trim_chat_history, input_token_count,
+)
+from chat_prompts import (
+    CHAT_SYSTEM_INSTRUCTION, SECURITY_ANALYSIS_SYSTEM_INSTRUCTION, SECURITY_ANALYSIS_PROMPT_VERSION,
+    build_full_chat_prompt, build_incremental_chat_prompt, build_security_analysis_prompt,
+)
+from diagram_preview import get_preview_url, get_preview_data_uri
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
 # =========================================
 # 환경 변수 로드
 # =========================================
 load_dotenv()
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 
+# =========================================
+# 세션 식별 함수
+# =========================================
+def get_session_id():
+    """현재 Streamlit 세션 ID를 반환합니다."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else ""
+
 # =========================================
 # 체크리스트 관리 함수
 # =========================================
@@ -58,19 +95,7 @@ def get_checked_security_items():
     checked_items = []
     
     # 기본 보안 체크리스트
-    basic_checklist = [
-        "VPC 적용 여부",
-        "퍼블릭,프라이빗 서브넷 분리", 
-        "데이터 암호화",        
-        "로드밸런서 설정",
-        "WAF 설정",
-        "CloudFront 설정",
-        "CloudTrail 설정",
-        "CloudWatch 설정",
-        "CloudWatch 로그 설정",
-    ]
-    
-    for item in basic_checklist:
+    for item in BASIC_SECURITY_CHECKLIST:
         if st.session_state.get(f"basic_{item}", False):
             checked_items.append(item)
     
@@ -78,158 +103,45 @@ def get_checked_security_items():
     
     return checked_items
 
-def format_security_requirements(checked_items):
-    """체크된 보안 항목들을 Amazon Q 프롬프트 형식으로 변환합니다."""
-    if not checked_items:
-        return ""
-    
-    security_text = "\n\nSecurity Requirements:\n"
-    security_text += "Please include the following security elements in the diagram and clearly label them with '*' asterisks for distinction:\n"
-    
-    for i, item in enumerate(checked_items, 1):
-        # 예시 부분 제거하고 핵심 내용만 추출
-        clean_item = item.split(" (예:")[0] if " (예:" in item else item
-        security_text += f"{i}. {clean_item}\n"
-    
-    
-    return security_text
-
 # =========================================
-# Amazon Q CLI 클라이언트 클래스
+# 프로세스 전체 공유 리소스
 # =========================================
-class AmazonQClient:
-    """Amazon Q CLI 클라이언트"""
-    
-    def __init__(self):
-        self.platform = platform.system()
-    
-    def generate_diagram_prompt(self, tree_structure, security_requirements=""):
-        """트리 구조와 보안 요구사항을 기반으로 다이어그램 생성 프롬프트 생성"""
-        
-        return f"""Generate an AWS cloud architecture diagram.
-
-Architecture Structure:
-{tree_structure}{security_requirements}
-
-Requirements:
-1. Create a visual diagram using AWS service icons
-2. Clearly show connections between services
-3. Save as PNG file in the generated-diagrams folder
-
-Please generate and save the diagram."""
-    
-    def execute_command(self, prompt):
-        """플랫폼별 명령어 실행"""
-        try:
-            if self.platform == "Windows":
-                return self._execute_windows(prompt)
-            else:
-                return self._execute_unix(prompt)
-        except Exception as e:
-            st.error(f"Amazon Q CLI 실행 오류: {str(e)}")
-            return None
-    
-    def _execute_windows(self, prompt):
-        """Windows에서 명령어 실행"""
-        try:
-            # WSL이 설치되어 있는지 확인
-            wsl_check = subprocess.run(['wsl', '--version'], capture_output=True, text=True)
-            if wsl_check.returncode == 0:
-                # WSL 사용 - 상대 경로 사용
-                home_dir = os.path.expanduser("~")
-                local_bin = os.path.join(home_dir, ".local", "bin")
-                # WSL에서 현재 디렉토리로 이동 후 명령 실행
-                cmd = f'cd . && source ~/.bashrc && export PATH=$PATH:{local_bin} && printf "y\\ny\\ny\\n" | {AMAZON_Q_PATH} chat "{prompt}"'
-                
-                return subprocess.run([
-                    'wsl', '-e', 'bash', '-c', cmd
-                ], capture_output=True, text=True, timeout=DIAGRAM_SETTINGS['timeout'], encoding=DIAGRAM_SETTINGS['encoding'])
-            else:
-                # WSL이 없으면 직접 실행 시도
-                cmd = f'{AMAZON_Q_PATH} chat "{prompt}"'
-                return subprocess.run([
-                    'cmd', '/c', cmd
-                ], capture_output=True, text=True, timeout=DIAGRAM_SETTINGS['timeout'], encoding=DIAGRAM_SETTINGS['encoding'])
-                
-        except FileNotFoundError:
-            # WSL 명령어를 찾을 수 없으면 직접 실행
-            cmd = f'{AMAZON_Q_PATH} chat "{prompt}"'
-            return subprocess.run([
-                'cmd', '/c', cmd
-            ], capture_output=True, text=True, timeout=DIAGRAM_SETTINGS['timeout'], encoding=DIAGRAM_SETTINGS['encoding'])
-    
-    def _execute_unix(self, prompt):
-        """Linux/Mac에서 명령어 실행"""
-        home_dir = os.path.expanduser("~")
-        local_bin = os.path.join(home_dir, ".local", "bin")
-        cmd = f'source ~/.bashrc && export PATH=$PATH:{local_bin} && printf "y\\ny\\ny\\n" | {AMAZON_Q_PATH} chat "{prompt}"'
-        
-        return subprocess.run([
-            'bash', '-c', cmd
-        ], capture_output=True, text=True, timeout=DIAGRAM_SETTINGS['timeout'], encoding=DIAGRAM_SETTINGS['encoding'])
-    
-    def generate_diagram(self, tree_structure):
-        """Amazon Q CLI를 통해 다이어그램 생성 요청"""
-        try:
-            checked_items = get_checked_security_items()
-            security_requirements_text = format_security_requirements(checked_items)
-            
-            # 보안 요구사항이 있을 때만 프롬프트에 추가
-            if security_requirements_text:
-                prompt = self.generate_diagram_prompt(tree_structure, security_requirements_text)
-            else:
-                prompt = self.generate_diagram_prompt(tree_structure, "")
-                
-            result = self.execute_command(prompt)
-            
-            if result and result.returncode == 0:
-                return result.stdout or ""
-            else:
-                return None
-                
-        except Exception as e:
-            st.error(f"Amazon Q CLI 실행 오류: {str(e)}")
-            return None
-
-# =========================================
-# 다이어그램 관리 클래스
-# =========================================
-class DiagramManager:
-    """다이어그램 파일 관리"""
-    
-    def __init__(self):
-        # generated-diagrams 폴더 사용
-        self.diagram_folder = Path('generated-diagrams')
-        self.diagram_folder.mkdir(parents=True, exist_ok=True)
-    
-    def find_latest_diagram(self):
-        """최신 다이어그램 파일 찾기"""
-        png_files = list(self.diagram_folder.glob('*.png'))
-        if png_files:
-            latest_file = max(png_files, key=lambda x: x.stat().st_mtime)
-            return latest_file
-        return None
-    
-    def get_folder_contents(self):
-        """다이어그램 폴더 내용 반환"""
-        if self.diagram_folder.exists():
-            return [f.name for f in self.diagram_folder.glob('*')]
-        return []
+# 모든 세션과 재실행이 같은 객체를 재사용하고, 인자(API 키/설정)가 바뀌면 새로 만듦
+# 챗봇용과 보안 분석용은 system instruction이 달라 모델을 따로 둠
+@st.cache_resource(show_spinner=False, max_entries=2, validate=is_healthy)
+def load_gemini_model(api_key, model_name, system_instruction):
+    """Gemini 모델을 만듭니다. API 호출이 실패한 모델은 다음 사용 시 다시 만듭니다."""
+    return create_gemini_model(api_key, model_name, system_instruction)
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_amazon_q_client(q_path, diagram_settings):
+    """Amazon Q CLI 클라이언트를 만듭니다. (Q CLI 경로/다이어그램 설정별)
+
+    백그라운드 작업 스레드에서는 st.error가 표시되지 않으므로 실행 오류는 로그로 남기고,
+    각 작업은 호출별 on_error로 받아 생성 경고에 표시합니다.
+    """
+    return AmazonQClient()
+
+@st.cache_resource(
+    show_spinner=False, max_entries=1,
+    # 다이어그램 폴더가 외부에서 삭제되면 다시 만들어 폴더와 인덱스를 복구
+    validate=lambda manager: manager.diagram_folder.is_dir(),
+)
+def load_diagram_manager(diagram_folder):
+    """다이어그램 매니저를 만듭니다. (폴더 생성, 인덱스 연결, 보관 정책 시작)"""
+    return DiagramManager(diagram_folder)
 
 # =========================================
 # Gemini API 초기화
 # =========================================
-def initialize_gemini():
-    """Gemini API 초기화"""
+def initialize_gemini(system_instruction=CHAT_SYSTEM_INSTRUCTION):
+    """Gemini API 초기화 (SDK는 처음 호출할 때 불러옴)"""
     try:
         if not GOOGLE_API_KEY:
             return False, None
         
-        # Gemini API 설정
-        genai.configure(api_key=GOOGLE_API_KEY)
-        
-        # 모델 초기화 (최신 모델명 사용)
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        # Gemini API 설정 및 모델 초기화 (프로세스 전체에서 공유)
+        model = load_gemini_model(GOOGLE_API_KEY, GEMINI_MODEL, system_instruction)
         
         return True, model
         
@@ -237,33 +149,44 @@ def initialize_gemini():
         st.error(f"Gemini API 초기화 실패: {str(e)}")
         return False, None
 
-# API 초기화 실행
-api_ready, model = initialize_gemini()
+def get_model(system_instruction=CHAT_SYSTEM_INSTRUCTION):
+    """Gemini 모델을 반환합니다. 초기화할 수 없으면 None을 반환합니다."""
+    _, model = initialize_gemini(system_instruction)
+    return model
+
+# API 키만 확인하고, SDK 로드와 모델 초기화는 첫 요청 때 수행
+api_ready = bool(GOOGLE_API_KEY)
 
-# Amazon Q 클라이언트 초기화
-amazon_q_client = AmazonQClient()
+# Amazon Q 클라이언트 (프로세스 전체 공유)
+amazon_q_client = load_amazon_q_client(AMAZON_Q_PATH, tuple(sorted(DIAGRAM_SETTINGS.items())))
 
-# 다이어그램 매니저 초기화
-diagram_manager = DiagramManager()
+# 다이어그램 매니저 (프로세스 전체 공유)
+diagram_manager = load_diagram_manager('generated-diagrams')
+
+# 다이어그램 캐시 (프로세스 전체 공유)
+diagram_cache = get_diagram_cache()
+
+# 보안 분석 캐시 (프로세스 전체 공유)
+analysis_cache = get_analysis_cache()
+
+# 오래된 채팅 메시지 보관소 (프로세스 전체 공유)
+chat_archive = get_chat_archive()
+
+# 백그라운드 작업 관리자 (프로세스 전체 공유)
+job_manager = get_job_manager()
+
+# 단계별 소요 시간/결과 지표 (프로세스 전체 공유)
+metrics = get_metrics()
 
 # =========================================
 # 트리 구조 추출 함수
 # =========================================
 def extract_tree_structure(text):
     """텍스트에서 트리 구조를 추출합니다."""
-    # 트리 구조 패턴들
-    tree_patterns = [
-        r'```tree\s*\n(.*?)\n```',  # ```tree ... ``` 형태
-        r'```\s*\n(.*?)\n```',      # ``` ... ``` 형태
-        r'^\s*[├└│─]+.*$',          # 트리 문자로 시작하는 줄들
-        r'^\s*[┌└├│─]+.*$',          # 다른 트리 문자들
-        r'^\s*[│├└─]+.*$',           # 기본 트리 문자들
-    ]
-    
-    for pattern in tree_patterns:
-        matches = re.findall(pattern, text, re.MULTILINE | re.DOTALL)
-        if matches:
-            return matches[0].strip()
+    # 한 번의 순회로 트리를 그래프로 파싱한 뒤 정규화된 텍스트로 변환
+    graph = parse_architecture_tree(text)
+    if graph:
+        return graph.to_text()
     
     # 트리 구조가 없으면 전체 텍스트 반환
     return text
@@ -271,55 +194,147 @@ def extract_tree_structure(text):
 # =========================================
 # 챗봇 응답 생성 함수
 # =========================================
-def generate_chatbot_response(user_message):
-    """사용자 메시지에 대한 챗봇 응답을 생성합니다."""
+def generate_chatbot_response(user_message, on_partial=None):
+    """사용자 메시지에 대한 챗봇 응답을 생성합니다.
+    
+    on_partial이 주어지고 스트리밍이 켜져 있으면 응답이 도착하는 대로
+    지금까지의 전체 텍스트로 on_partial을 호출합니다.
+    
+    고정 지시문은 모델의 system instruction에 있으므로 이번 턴에는 사용자 요청과 현재 트리만 보내고,
+    세션의 이전 대화는 토큰 예산 안에서 대화 기록으로 함께 보냅니다.
+    """
+    model = get_model() if api_ready else None
     if not api_ready or not model:
         return "❌ API가 준비되지 않았습니다. GEMINI_API_KEY를 확인해주세요."
     
     try:
-        # 기존 트리 아키텍처 컨텍스트 가져오기
-        existing_tree = ss.get("current_tree", "")
-        context_info = ""
+        # 기존 트리가 파싱되면 전체 트리 대신 요약을 보내고 편집 연산으로 응답받음
+        with metrics.span("chat_prompt_build"):
+            existing_tree = ss.get("current_tree", "")
+            existing_graph = parse_architecture_tree(existing_tree) if existing_tree else None
+            if existing_graph and CHAT_SETTINGS.get('incremental', False):
+                enhanced_prompt = build_incremental_chat_prompt(user_message, to_summary(existing_graph))
+            else:
+                enhanced_prompt = build_full_chat_prompt(user_message, existing_tree)
+            contents = trim_chat_history(ss["gemini_chat_history"], CHAT_SETTINGS['history_token_budget'])
+            contents.append({"role": "user", "parts": [enhanced_prompt]})
         
-        if existing_tree:
-            context_info = f"""
-
-기존 아키텍처 구조 (참고용):
-{existing_tree}
-
-위 구조를 기반으로 사용자의 새로운 요청을 처리해주세요. 
-기존 구조와 일관성을 유지하면서 요청사항을 반영하거나 확장하세요.
-"""
+        started_at = time.monotonic()
+        if on_partial is not None and CHAT_SETTINGS.get('stream', False):
+            # 스트리밍 모드: 청크가 도착할 때마다 부분 응답 표시
+            first_token_seconds = None
+            parts = []
+            response, call_info = gemini_generate_content(
+                model, contents, GEMINI_RATE_LIMIT_SETTINGS['chat_deadline'], stream=True
+            )
+            for chunk in response:
+                try:
+                    chunk_text = chunk.text
+                except ValueError:
+                    # 텍스트가 없는 청크(안전 필터 등)는 건너뜀
+                    continue
+                if not chunk_text:
+                    continue
+                if first_token_seconds is None:
+                    first_token_seconds = time.monotonic() - started_at
+                parts.append(chunk_text)
+                on_partial("".join(parts))
+            response_text = "".join(parts)
+        else:
+            response, call_info = gemini_generate_content(
+                model, contents, GEMINI_RATE_LIMIT_SETTINGS['chat_deadline']
+            )
+            response_text = response.text
+            first_token_seconds = None
         
-        # 클라우드 아키텍처 설계를 위한 프롬프트
-        enhanced_prompt = f"""
-사용자 요청: {user_message}
-
-AWS 클라우드 아키텍처 전문가로서 답변해주세요. {context_info}
-
-요청사항:
-1. 사용자의 요청에 맞는 클라우드 아키텍처를 설계해주세요
-2. 반드시 트리 구조로 표현해주세요 (예: ├─, │, └─ 문자 사용)
-3. 트리구조는 응답에 1회만 표시해주세요
-4. 각 컴포넌트의 역할과 연결 관계를 명확히 표시해주세요
-5. 필요시 사용자에게 다시 질문하여 명확하게 하세요
-6. 사용자의 요청 이외의 구성요소는 트리에 표시하지 마세요
-
-중요 규칙:
-- 모든 AWS 서비스와 리소스는 반드시 공식 영어 명칭을 사용하세요
-- 예: EC2, S3, RDS, VPC, IAM, CloudFront, Lambda, ECS, EKS 등
-- 한국어 설명은 가능하지만, 서비스명은 영어로 표기하세요
-- 트리 구조에서 각 노드는 AWS 공식 서비스명을 사용하세요
-- 기존 아키텍처가 있다면 일관성을 유지하면서 요청사항을 반영하세요
-
-"""
+        # 첫 토큰까지 걸린 시간과 전체 응답 시간 기록
+        total_seconds = time.monotonic() - started_at
+        metrics.observe("gemini_chat_seconds", total_seconds)
+        if first_token_seconds is not None:
+            metrics.observe("gemini_chat_first_token_seconds", first_token_seconds)
+        metrics.inc("gemini_chat_total", outcome="success")
+        input_tokens = input_token_count(response)
+        if input_tokens is not None:
+            metrics.inc("gemini_chat_input_tokens_total", input_tokens)
         
-        response = model.generate_content(enhanced_prompt)
-        return response.text if response.text else "죄송합니다. 응답을 생성할 수 없습니다."
+        # 다음 턴에 보낼 대화 기록 (트리는 턴마다 현재 상태를 보내므로 사용자 요청만 남김)
+        if response_text:
+            ss["gemini_chat_history"] += [
+                {"role": "user", "parts": [user_message]},
+                {"role": "model", "parts": [response_text]},
+            ]
+        ss["last_response_timing"] = {
+            "first_token_seconds": first_token_seconds,
+            "total_seconds": total_seconds,
+            "prompt_chars": len(enhanced_prompt),
+            "input_tokens": input_tokens,
+            "limiter_wait_seconds": call_info["waited_seconds"],
+            "retries": call_info["retries"],
+        }
+        return response_text if response_text else "죄송합니다. 응답을 생성할 수 없습니다."
         
     except Exception as e:
+        metrics.inc("gemini_chat_total", outcome=outcome_for_error(e))
+        mark_unhealthy(model)
         return f"❌ 오류가 발생했습니다: {str(e)}"
 
+# =========================================
+# 채팅 말풍선 렌더링 함수
+# =========================================
+def render_chat_bubble(role, content):
+    """채팅 메시지 하나를 말풍선 HTML로 변환합니다."""
+    if role == "user":
+        return f"<div class='chat-bubble-wrapper user-bubble-wrapper'><div class='chat-bubble user-bubble'>{html.escape(content)}</div></div>"
+    return f"<div class='chat-bubble-wrapper bot-bubble-wrapper'><div class='chat-bubble bot-bubble'>{html.escape(content)}</div></div>"
+
+def render_chat_window():
+    """최근 메시지 창을 말풍선 HTML로 변환합니다.
+    
+    메시지별 HTML은 (전체 순번, 내용 해시)로 캐시하여 재실행마다 다시 이스케이프하지 않습니다.
+    보관된 메시지의 순번은 보관소에 저장된 seq를 그대로 사용합니다. (TTL로 일부가 삭제되어도 어긋나지 않음)
+    """
+    archived_count = ss["archived_message_count"]
+    total_count = archived_count + len(ss["messages"])
+    start = max(0, total_count - ss["chat_visible_count"])
+    
+    # 창이 보관소까지 넓어진 경우 필요한 구간만 읽어옴
+    visible = []
+    if start < archived_count:
+        archived = chat_archive.load(get_session_id(), start, archived_count)
+        visible.extend((chat["seq"], chat) for chat in archived)
+    visible.extend(enumerate(ss["messages"][max(0, start - archived_count):], max(start, archived_count)))
+    
+    render_cache = ss["chat_render_cache"]
+    fragments = []
+    for seq, chat in visible:
+        content_hash = hash((chat["role"], chat["content"]))
+        cached = render_cache.get(seq)
+        if cached is None or cached[0] != content_hash:
+            cached = (content_hash, render_chat_bubble(chat["role"], chat["content"]))
+            render_cache[seq] = cached
+        fragments.append(cached[1])
+    
+    # 창 밖으로 밀려난 메시지의 캐시는 정리
+    for seq in [seq for seq in render_cache if seq < start]:
+        del render_cache[seq]
+    
+    return '<div class="chat-container">' + "".join(fragments) + '</div>'
+
+def show_older_messages():
+    """메시지 표시 창을 window_size만큼 넓힙니다. (버튼 콜백)"""
+    ss["chat_visible_count"] += CHAT_SETTINGS['window_size']
+
+def archive_old_messages():
+    """세션 상태의 메시지 수가 한도를 넘으면 오래된 메시지를 보관소로 옮깁니다."""
+    if not CHAT_ARCHIVE_SETTINGS.get('enabled', False):
+        return
+    overflow = len(ss["messages"]) - CHAT_ARCHIVE_SETTINGS['max_session_messages']
+    if overflow <= 0:
+        return
+    chat_archive.append(get_session_id(), ss["archived_message_count"], ss["messages"][:overflow])
+    del ss["messages"][:overflow]
+    ss["archived_message_count"] += overflow
+
 # =========================================
 # 트리 구조 추출 및 저장 함수
 # =========================================
@@ -331,6 +346,27 @@ def update_tree_structure(bot_response):
         return True
     return False
 
+def apply_tree_response(bot_response):
+    """봇 응답의 편집 연산 또는 트리 구조를 현재 트리에 반영하고, 채팅에 표시할 텍스트를 반환합니다."""
+    ops, display_text = extract_edit_ops(bot_response)
+    current_graph = parse_architecture_tree(ss.get("current_tree", ""))
+    
+    if ops is not None and current_graph:
+        new_graph, applied, failed = apply_edit_ops(current_graph, ops)
+        ss["current_tree"] = new_graph.to_text()
+        # 연산 블록 대신 적용된 변경 내역을 표시
+        summary_lines = ["", "🛠️ 아키텍처 변경 사항:"] + [f"  {line}" for line in applied or ["(변경 없음)"]]
+        if failed:
+            summary_lines += ["⚠️ 적용하지 못한 변경:"] + [f"  {line}" for line in failed]
+        return display_text + "\n".join(summary_lines)
+    
+    if current_graph and not has_architecture_tree(bot_response):
+        # 질문/설명만 있는 응답이면 기존 트리를 유지
+        return bot_response
+    
+    update_tree_structure(bot_response)
+    return bot_response
+
 # =========================================
 # 트리 구조 초기화 함수
 # =========================================
@@ -342,52 +378,270 @@ def clear_tree_structure():
 # =========================================
 # 보안 분석 함수
 # =========================================
-def analyze_security_architecture(tree_structure, checked_items):
+def analyze_security_architecture(tree_structure, checked_items, use_cache=True):
     """현재 아키텍처의 보안 구성요소를 분석하고 추가 권장사항을 제공합니다."""
+    model = get_model(SECURITY_ANALYSIS_SYSTEM_INSTRUCTION) if api_ready else None
     if not api_ready or not model:
         return "❌ Gemini API가 준비되지 않았습니다."
     
+    # 같은 트리와 보안 항목에 대한 분석 결과가 있으면 재사용
+    cache_enabled = ANALYSIS_CACHE_SETTINGS.get('enabled', False)
+    cache_key = make_analysis_key(tree_structure, checked_items, GEMINI_MODEL, SECURITY_ANALYSIS_PROMPT_VERSION)
+    if cache_enabled and use_cache:
+        cached_analysis = analysis_cache.get(cache_key)
+        metrics.record_cache_lookup("analysis", bool(cached_analysis))
+        if cached_analysis:
+            return cached_analysis
+    
     try:
-        # 체크된 보안 항목들을 텍스트로 변환
-        security_items_text = ""
-        if checked_items:
-            security_items_text = "\n\n현재 적용된 보안 요소들:\n"
-            for i, item in enumerate(checked_items, 1):
-                security_items_text += f"{i}. {item}\n"
-        else:
-            security_items_text = "\n\n현재 적용된 보안 요소: 없음"
-        
         # Gemini에게 보안 분석 요청
-        prompt = f"""
-다음 AWS 클라우드 아키텍처의 보안 구성요소를 분석해주세요:
-
-아키텍처 구조:
-{tree_structure}{security_items_text}
-
-분석 요청사항:
-1. 현재 아키텍처에서 각 보안 구성요소가 어떤 역할을 하는지 설명
-2. 현재 구성에서 보안 취약점이나 개선점이 있는지 분석
-3. 추가로 구성하면 좋을 보안 요소들을 제안
-4. 각 보안 요소의 중요도와 우선순위를 평가
-
-응답 형식:
-- 현재 보안 구성요소 분석
-- 보안 취약점 및 개선점
-- 추가 권장 보안 요소
-- 보안 강화 우선순위
-
-AWS 보안 모범사례를 기준으로 전문적이고 실용적인 조언을 제공해주세요.
-"""
+        prompt = build_security_analysis_prompt(tree_structure, checked_items)
+        
+        with metrics.span("gemini_analysis"):
+            response, _ = gemini_generate_content(model, prompt, DIAGRAM_SETTINGS['analysis_timeout'])
+        if not response.text:
+            return "보안 분석을 완료할 수 없습니다."
         
-        response = model.generate_content(prompt)
-        return response.text if response.text else "보안 분석을 완료할 수 없습니다."
+        # 새로 분석한 결과는 강제 재분석 여부와 관계없이 캐시에 저장
+        if cache_enabled:
+            analysis_cache.put(cache_key, GEMINI_MODEL, response.text)
+        return response.text
         
     except Exception as e:
+        mark_unhealthy(model)
         return f"❌ 보안 분석 중 오류가 발생했습니다: {str(e)}"
 
 # =========================================
 # 다이어그램 생성 함수
 # =========================================
+def _run_diagram_stage(tree_structure, checked_items, backend="local", session_id=None, on_output=None,
+                       cancel_token=None, on_admitted=None):
+    """다이어그램 생성 단계를 실행하고 생성된 파일 경로를 반환합니다.
+    
+    Q CLI 실행 오류로 다이어그램이 없으면 오류 메시지로 예외를 발생시켜 단계 오류로 기록되게 합니다.
+    """
+    q_errors = []
+    # 로컬 graphviz 렌더링(불가능하면 Amazon Q로 대체) 또는 Amazon Q 생성
+    diagram_path = generate_diagram_file(
+        diagram_manager, amazon_q_client, tree_structure, checked_items,
+        backend, diagram_cache, session_id, on_output, cancel_token, q_errors.append, on_admitted,
+    )
+    if not diagram_path and q_errors:
+        raise RuntimeError(q_errors[-1])
+    return diagram_path
+
+# 파이프라인 단계별 표시 이름
+STAGE_LABELS = {
+    "diagram": "🎨 다이어그램 생성",
+    "analysis": "🔍 보안 아키텍처 분석",
+}
+
+def _run_stages_concurrently(tree_structure, checked_items, on_progress, backend, session_id=None, on_output=None,
+                             cancel_token=None):
+    """다이어그램 생성과 보안 분석을 병렬로 실행하고 단계별 결과를 반환합니다.
+    
+    on_progress(stage, state, message)는 호출한 스레드에서 실행됩니다.
+    취소되면 보안 분석은 기다리지 않고, 다이어그램 단계는 Q CLI 종료까지 기다립니다.
+    다이어그램 단계의 마감 시간은 Q 실행 허용 대기열에서 차례를 받은 때부터 다시 셉니다.
+    """
+    # 다이어그램 단계는 CLI 시간 제한(최근 실행 시간 기반)에 약간의 여유를 둠
+    q_stage_timeout = get_q_timeout().current() + 5
+    admission = get_admission_controller()
+    started_at = time.monotonic()
+    # 단계별 마감 시각 (다이어그램 단계는 대기열 대기 시간까지 허용하고, 차례를 받으면 다시 정함)
+    stage_deadlines = {
+        "diagram": started_at + q_stage_timeout + (admission.wait_timeout if admission else 0),
+        "analysis": started_at + DIAGRAM_SETTINGS['analysis_timeout'],
+    }
+    for stage, label in STAGE_LABELS.items():
+        on_progress(stage, "running", f"{label} 중...")
+    results = {"diagram": None, "analysis": None}
+    errors = {}
+    
+    # 차례를 받으면 완료되는 Future (바뀐 마감 시각으로 다시 기다리도록)
+    admitted = Future()
+    
+    def _on_admitted():
+        stage_deadlines["diagram"] = time.monotonic() + q_stage_timeout
+        if not admitted.done():
+            admitted.set_result(None)
+    
+    # 다이어그램 단계 전용 취소 토큰: 작업이 취소되거나 단계가 시간 초과되면 Q CLI 프로세스 트리를 종료
+    # (시간 초과만으로 작업 전체를 취소하면 보안 분석 결과까지 버려지므로 작업 토큰과 분리)
+    diagram_cancel_token = CancelToken()
+    
+    executor = ThreadPoolExecutor(max_workers=2)
+    futures = {
+        executor.submit(
+            _run_diagram_stage, tree_structure, checked_items, backend, session_id, on_output,
+            diagram_cancel_token, _on_admitted,
+        ): "diagram",
+        executor.submit(analyze_security_architecture, tree_structure, checked_items): "analysis",
+    }
+    pending = set(futures)
+    # 취소 요청이 오면 완료되는 Future (단계 완료와 함께 기다림)
+    cancelled = Future()
+    
+    def _on_job_cancel():
+        diagram_cancel_token.cancel()
+        cancelled.set_result(None)
+    
+    def _time_out(future):
+        stage = futures[future]
+        errors[stage] = "시간 초과"
+        on_progress(stage, "error", f"{STAGE_LABELS[stage]} 시간 초과")
+        pending.discard(future)
+        if stage == "diagram":
+            # 실행 중인 Future는 executor.shutdown으로 멈추지 않으므로 Q CLI를 직접 종료
+            diagram_cancel_token.cancel()
+    
+    try:
+        with on_cancel(cancel_token, _on_job_cancel):
+            while pending:
+                # 아직 끝나지 않은 단계 중 가장 빠른 마감 시각까지만 대기
+                remaining = min(stage_deadlines[futures[f]] for f in pending) - time.monotonic()
+                if remaining <= 0:
+                    break
+                waiting = pending | {event for event in (cancelled, admitted) if not event.done()}
+                done, _ = wait(waiting, timeout=remaining, return_when=FIRST_COMPLETED)
+                pending -= done
+                
+                if cancelled in done:
+                    # 보안 분석(Gemini 호출)은 중단할 수 없으므로 결과를 기다리지 않음
+                    for future in [f for f in pending if futures[f] != "diagram"]:
+                        stage = futures[future]
+                        errors[stage] = "취소됨"
+                        on_progress(stage, "error", f"{STAGE_LABELS[stage]} 취소됨")
+                        pending.discard(future)
+                
+                for future in done - {cancelled, admitted}:
+                    stage = futures[future]
+                    label = STAGE_LABELS[stage]
+                    elapsed_text = f"{time.monotonic() - started_at:.1f}초"
+                    try:
+                        results[stage] = future.result()
+                    except OperationCancelled:
+                        errors[stage] = "취소됨"
+                        on_progress(stage, "error", f"{label} 취소됨 ({elapsed_text})")
+                        continue
+                    except Exception as e:
+                        errors[stage] = str(e)
+                    
+                    if results[stage] and not str(results[stage]).startswith("❌"):
+                        on_progress(stage, "complete", f"{label} 완료 ({elapsed_text})")
+                    else:
+                        on_progress(stage, "error", f"{label} 실패 ({elapsed_text})")
+                
+                # 마감 시각이 지난 단계는 시간 초과로 처리
+                now = time.monotonic()
+                for future in [f for f in pending if stage_deadlines[futures[f]] <= now]:
+                    _time_out(future)
+        
+        for future in list(pending):
+            _time_out(future)
+    finally:
+        # 시간 초과된 작업은 기다리지 않고 백그라운드에서 정리되도록 둠
+        executor.shutdown(wait=False, cancel_futures=True)
+        # 종료한 Q CLI의 회수 자원 보고는 작업 토큰에 모아 화면에 표시
+        if cancel_token is not None:
+            for report in diagram_cancel_token.reports:
+                cancel_token.add_report(report)
+    
+    return results, errors
+
+def _run_stages_sequentially(tree_structure, checked_items, on_progress, backend, session_id=None, on_output=None,
+                             cancel_token=None):
+    """다이어그램 생성과 보안 분석을 순차적으로 실행하고 단계별 결과를 반환합니다."""
+    results = {"diagram": None, "analysis": None}
+    errors = {}
+    stage_functions = {
+        # 1. 로컬 graphviz 또는 Amazon Q를 통한 다이어그램 생성
+        "diagram": lambda tree, items: _run_diagram_stage(tree, items, backend, session_id, on_output, cancel_token),
+        # 2. Gemini를 통한 보안 분석
+        "analysis": analyze_security_architecture,
+    }
+    
+    for stage, stage_function in stage_functions.items():
+        label = STAGE_LABELS[stage]
+        if cancel_token is not None and cancel_token.cancelled:
+            # 취소되면 남은 단계는 실행하지 않음
+            errors[stage] = "취소됨"
+            on_progress(stage, "error", f"{label} 취소됨")
+            continue
+        on_progress(stage, "running", f"{label} 중...")
+        started_at = time.monotonic()
+        try:
+            results[stage] = stage_function(tree_structure, checked_items)
+        except OperationCancelled:
+            errors[stage] = "취소됨"
+            on_progress(stage, "error", f"{label} 취소됨")
+            continue
+        except Exception as e:
+            errors[stage] = str(e)
+        elapsed_text = f"{time.monotonic() - started_at:.1f}초"
+        if results[stage] and not str(results[stage]).startswith("❌"):
+            on_progress(stage, "complete", f"{label} 완료 ({elapsed_text})")
+        else:
+            on_progress(stage, "error", f"{label} 실패 ({elapsed_text})")
+    
+    return results, errors
+
+def run_generation_pipeline(tree_structure, checked_items, on_progress, backend="local", session_id=None,
+                            on_output=None, cancel_token=None):
+    """설정에 따라 다이어그램 생성과 보안 분석을 실행하고 (결과, 오류)를 반환합니다.
+    
+    on_output(줄)은 Amazon Q CLI 출력을 한 줄씩 받습니다. (Q 실행 스레드에서 호출)
+    cancel_token이 취소되면 실행 중인 Q CLI를 종료하고 남은 단계는 "취소됨" 오류로 끝냅니다.
+    """
+    if DIAGRAM_SETTINGS.get('concurrent', False):
+        return _run_stages_concurrently(
+            tree_structure, checked_items, on_progress, backend, session_id, on_output, cancel_token
+        )
+    return _run_stages_sequentially(
+        tree_structure, checked_items, on_progress, backend, session_id, on_output, cancel_token
+    )
+
+def _generation_job(job, tree_structure, checked_items, backend):
+    """백그라운드 작업으로 생성 파이프라인을 실행합니다."""
+    label = STAGE_LABELS["diagram"]
+    
+    def _show_q_output(line):
+        # Q CLI의 마지막 출력 줄을 다이어그램 단계 진행 상황에 표시 (완료/실패 후 늦게 온 줄은 무시)
+        if job.get_progress().get("diagram", {}).get("state") == "running":
+            job.set_progress("diagram", "running", f"{label} 중... · {line[:80]}")
+    
+    results, errors = run_generation_pipeline(
+        tree_structure, checked_items, job.set_progress, backend, job.session_id, _show_q_output,
+        job.cancel_token,
+    )
+    # 취소된 작업은 일부 단계의 결과가 있어도 반영하지 않음
+    job.cancel_token.raise_if_cancelled()
+    return {"results": results, "errors": errors}
+
+def apply_generation_results(results, errors):
+    """파이프라인 결과를 세션 상태에 기록합니다."""
+    # 두 단계가 모두 끝나거나 시간 초과된 뒤에만 세션 상태에 기록
+    warnings = []
+    if results["diagram"]:
+        ss["current_diagram"] = results["diagram"]
+        ss["diagram_created"] = True
+    else:
+        reason = errors.get("diagram", "생성된 다이어그램 파일이 없습니다")
+        warnings.append(f"❌ 다이어그램 생성에 실패했습니다. ({reason})")
+    
+    analysis = results["analysis"]
+    if analysis and not analysis.startswith("❌"):
+        ss["security_analysis"] = analysis
+        ss["analysis_timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        # 이전 아키텍처의 분석 결과가 남지 않도록 초기화
+        ss["security_analysis"] = ""
+        reason = errors.get("analysis", "분석 결과가 없습니다")
+        warnings.append(analysis or f"❌ 보안 분석에 실패했습니다. ({reason})")
+    
+    # 일부 단계만 실패한 경우 새로고침 후에도 알 수 있도록 저장
+    ss["generation_warnings"] = warnings
+
 def create_diagram_from_tree():
     """현재 트리 구조를 기반으로 Amazon Q를 통해 다이어그램 생성"""
     current_tree = ss.get("current_tree", "")
@@ -396,34 +650,33 @@ def create_diagram_from_tree():
         st.warning("⚠️ 다이어그램을 생성할 트리 구조가 없습니다. 먼저 아키텍처를 설계해주세요.")
         return
     
-    # 체크된 보안 항목들 수집
+    # 체크된 보안 항목들 수집 (작업 스레드에서는 세션 상태에 접근하지 않음)
     checked_items = get_checked_security_items()
+    # 고급 렌더링을 선택하면 로컬 렌더러 대신 Amazon Q 사용
+    backend = "amazon_q" if ss.get("use_amazon_q") else DIAGRAM_SETTINGS.get('backend', 'local')
+    
+    if JOB_SETTINGS.get('enabled', False):
+        # 작업 큐에 넣고 바로 반환 (다이어그램 패널이 진행 상황을 확인)
+        ss["diagram_job_id"] = job_manager.submit(
+            "diagram", _generation_job, current_tree, checked_items, backend,
+            session_id=get_session_id(),
+        )
+        ss["generation_warnings"] = []
+        return
     
     try:
-        # 1. Amazon Q를 통한 다이어그램 생성
-        with st.spinner("🎨 Amazon Q를 통해 다이어그램을 생성하고 있습니다..."):
-            result = amazon_q_client.generate_diagram(current_tree)
-            
-            if result:
-                # 생성된 다이어그램 파일 확인
-                latest_diagram = diagram_manager.find_latest_diagram()
-                if latest_diagram:
-                    # 다이어그램을 세션 상태에 저장
-                    ss["current_diagram"] = str(latest_diagram)
-                    # 다이어그램 생성 완료 플래그 설정
-                    ss["diagram_created"] = True
-                    
+        statuses = {}
+        
+        def _show_progress(stage, state, message):
+            if stage not in statuses:
+                statuses[stage] = st.status(message, state=state)
             else:
-                st.error("❌ 다이어그램 생성에 실패했습니다.")
+                statuses[stage].update(label=message, state=state)
         
-        # 2. Gemini를 통한 보안 분석
-        with st.spinner("🔍 보안 아키텍처를 분석하고 있습니다..."):
-            security_analysis = analyze_security_architecture(current_tree, checked_items)
-            # 보안 분석 결과를 세션 상태에 저장
-            ss["security_analysis"] = security_analysis
-            # 분석 완료 시간 저장
-            from datetime import datetime
-            ss["analysis_timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        results, errors = run_generation_pipeline(
+            current_tree, checked_items, _show_progress, backend, get_session_id()
+        )
+        apply_generation_results(results, errors)
         
         # 페이지 새로고침하여 결과 표시
         st.rerun()
@@ -431,32 +684,120 @@ def create_diagram_from_tree():
     except Exception as e:
         st.error(f"❌ 처리 중 오류가 발생했습니다: {str(e)}")
 
+# =========================================
+# 다이어그램 작업 상태 표시 함수
+# =========================================
+@st.fragment(run_every=JOB_SETTINGS['poll_interval'])
+def display_diagram_job():
+    """진행 중인 다이어그램 작업을 주기적으로 확인하고 완료되면 결과를 반영합니다."""
+    job = job_manager.get(ss.get("diagram_job_id", ""))
+    if job is None:
+        # 작업 정보가 정리된 경우 (서버 재시작 등)
+        ss["diagram_job_id"] = ""
+        st.rerun()
+    
+    if job.finished:
+        if job.state == DONE:
+            apply_generation_results(job.result["results"], job.result["errors"])
+        elif job.state == CANCELLED:
+            # 종료한 Q CLI 프로세스 트리가 쓰던 자원을 함께 알림
+            reclaimed = " · ".join(format_reclaim_report(report) for report in job.cancel_token.reports)
+            ss["generation_warnings"] = [
+                "⏹️ 다이어그램 생성을 취소했습니다." + (f" ({reclaimed})" if reclaimed else "")
+            ]
+        else:
+            ss["generation_warnings"] = [f"❌ 처리 중 오류가 발생했습니다: {job.error}"]
+        ss["diagram_job_id"] = ""
+        # 다이어그램, 다운로드 버튼, 보안 분석을 함께 갱신
+        st.rerun()
+    
+    state_icons = {"running": "⏳", "complete": "✅", "error": "❌"}
+    if job.state == QUEUED:
+        lines = ["⏳ 작업 대기열에서 순서를 기다리고 있습니다..."]
+    else:
+        lines = [
+            f"{state_icons.get(progress['state'], '⏳')} {html.escape(progress['message'])}"
+            for progress in job.get_progress().values()
+        ]
+        # Amazon Q 실행 차례를 기다리는 중이면 대기 순번 표시
+        admission = get_admission_controller()
+        queue_position = admission.position(job.session_id) if admission else None
+        if queue_position:
+            admission_stats = admission.stats()
+            lines.append(
+                f"🚦 Amazon Q 대기열 {queue_position}번째 "
+                f"(실행 중 {admission_stats['in_flight']}/{admission_stats['max_in_flight']})"
+            )
+    if job.cancel_requested:
+        lines.append("⏹️ 취소하는 중... (Amazon Q 프로세스 종료)")
+    lines.append(f"<span style='color:#888;'>경과 시간 {job.elapsed_seconds:.0f}초</span>")
+    st.markdown(
+        '<div class="card" style="height:460px; display:flex; flex-direction:column; align-items:center; justify-content:center; gap:8px;">'
+        + "".join(f"<div>{line}</div>" for line in lines)
+        + '</div>',
+        unsafe_allow_html=True
+    )
+    # 작업 스레드가 취소 요청을 받아 Q CLI 프로세스 트리를 종료하고, 다음 확인 때 결과를 반영
+    st.button(
+        "⏹️ 생성 취소", key="cancel_diagram_job_button", on_click=job_manager.cancel, args=(job.job_id,),
+        disabled=job.cancel_requested, use_container_width=True
+    )
+
+# =========================================
+# 다운로드 데이터 함수
+# =========================================
+def lazy_file_payload(file_path):
+    """다운로드를 누를 때 파일 내용을 읽어 반환하는 함수를 만듭니다.
+    
+    큰 파일은 메모리 매핑으로 읽어 버퍼 복사를 줄입니다.
+    """
+    def _read():
+        with open(file_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < DOWNLOAD_SETTINGS['mmap_threshold']:
+                return file.read()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+    return _read
+
+def lazy_security_report(tree_structure, security_analysis, analysis_timestamp):
+    """다운로드를 누를 때 보안 분석 마크다운 보고서를 만드는 함수를 반환합니다."""
+    def _build():
+        return f"""# AWS 보안 아키텍처 분석 보고서
+
+## 현재 아키텍처 구조
+```
+{tree_structure}
+```
+
+## 보안 분석 결과
+{security_analysis}
+
+## 생성일시
+{analysis_timestamp}
+"""
+    return _build
+
 # =========================================
 # 다이어그램 표시 함수
 # =========================================
 def display_diagram():
     """현재 다이어그램을 표시합니다."""
     
-    def _encode_image_to_base64(image_path):
-        """이미지를 base64로 인코딩합니다."""
-        import base64
-        try:
-            with open(image_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode()
-        except:
-            return ""
-    
     current_diagram = ss.get("current_diagram", "")
     
     if current_diagram and os.path.exists(current_diagram):
         try:
-            # 다이어그램 이미지를 460px 높이의 카드로 감싸서 표시
-            # 파일 경로를 상대 경로로 변환
-            relative_path = os.path.relpath(current_diagram)
+            # 다이어그램 축소 미리보기를 460px 높이의 카드로 감싸서 표시
+            # 정적 파일 제공이 켜져 있으면 URL로 참조하고, 아니면 캐시된 data URI를 사용
+            if st.get_option("server.enableStaticServing"):
+                image_src = get_preview_url(current_diagram)
+            else:
+                image_src = get_preview_data_uri(current_diagram)
             st.markdown(
                 f'''
                 <div class="card" style="height:460px; display:flex; align-items:center; justify-content:center; overflow:hidden;">
-                    <img src="data:image/png;base64,{_encode_image_to_base64(current_diagram)}" 
+                    <img src="{image_src}" 
                          style="max-width: 100%; max-height: 100%; object-fit: contain;" 
                          alt="생성된 아키텍처 다이어그램">
                 </div>
@@ -745,6 +1086,18 @@ if "messages" not in st.session_state:
         {"role": "assistant", "content": "안녕하세요! 클라우드 아키텍처 설계를 도와드릴 수 있어요. 예를 들어 '서울 리전에 EC2 두 대 설치' 같은 요청을 주시면, 아키텍처 구조를 트리 형태로 만들어드릴 수 있습니다. 무엇을 도와드릴까요? 😊"}
     ]
 
+if "archived_message_count" not in st.session_state:
+    st.session_state["archived_message_count"] = 0
+
+if "chat_visible_count" not in st.session_state:
+    st.session_state["chat_visible_count"] = CHAT_SETTINGS['window_size']
+
+if "chat_render_cache" not in st.session_state:
+    st.session_state["chat_render_cache"] = {}
+
+if "gemini_chat_history" not in st.session_state:
+    st.session_state["gemini_chat_history"] = []
+
 if "current_tree" not in st.session_state:
     st.session_state["current_tree"] = ""
 
@@ -760,8 +1113,17 @@ if "security_analysis" not in st.session_state:
 if "board_suggestions" not in st.session_state:
     st.session_state["board_suggestions"] = ""
 
+if "generation_warnings" not in st.session_state:
+    st.session_state["generation_warnings"] = []
+
+if "diagram_job_id" not in st.session_state:
+    st.session_state["diagram_job_id"] = ""
+
 ss = st.session_state
 
+# 현재 세션이 보고 있는 다이어그램은 보관 정책에서 삭제하지 않도록 등록
+diagram_manager.touch_references(get_session_id(), [ss.get("current_diagram", "")])
+
 # =========================================
 # 클라우드 아키텍처 다이어그램
 # =========================================
@@ -774,9 +1136,15 @@ with colA:
     with _title_col:
         st.markdown('<div class="title">🌳 아키텍처 트리 구조</div>', unsafe_allow_html=True)
     with _btn_col:
-        if st.button("제작하기", key="create_diagram_button", use_container_width=True):
+        # 진행 중인 작업이 있으면 중복 요청을 막음
+        if st.button("제작하기", key="create_diagram_button", use_container_width=True,
+                     disabled=bool(ss.get("diagram_job_id"))):
             create_diagram_from_tree()
     
+    # 직전 생성에서 실패한 단계가 있으면 표시
+    for warning in ss.get("generation_warnings", []):
+        st.warning(warning)
+    
     # 트리 구조 표시 영역
     tree_placeholder = st.empty()
     with tree_placeholder.container():
@@ -801,14 +1169,14 @@ with colB:
     with _btn_col:
         if ss.get("current_diagram") and os.path.exists(ss.get("current_diagram", "")):
             # 다이어그램 파일이 있을 때만 다운로드 버튼 표시
-            with open(ss["current_diagram"], "rb") as file:
-                st.download_button(
-                    label="다운로드",
-                    data=file.read(),
-                    file_name=os.path.basename(ss["current_diagram"]),
-                    mime="image/png",
-                    use_container_width=True
-                )
+            # 파일은 다운로드를 누를 때만 읽음
+            st.download_button(
+                label="다운로드",
+                data=lazy_file_payload(ss["current_diagram"]),
+                file_name=os.path.basename(ss["current_diagram"]),
+                mime="image/png",
+                use_container_width=True
+            )
         else:
             # 다이어그램이 없을 때는 비활성화된 버튼 표시
             st.button("다운로드", disabled=True, use_container_width=True)
@@ -816,7 +1184,33 @@ with colB:
     # 보안 적용 다이어그램 표시 영역
     secure_placeholder = st.empty()
     with secure_placeholder.container():
-        display_diagram()
+        if ss.get("diagram_job_id"):
+            display_diagram_job()
+        else:
+            display_diagram()
+    
+    # 다이어그램 캐시 사용 현황
+    if DIAGRAM_CACHE_SETTINGS.get('enabled', False):
+        cache_stats = diagram_cache.stats()
+        st.caption(
+            f"🗂️ 다이어그램 캐시: 적중 {cache_stats['hits']}회 / 미스 {cache_stats['misses']}회 "
+            f"(적중률 {cache_stats['hit_rate']:.0%}) · 절약된 Q CLI 시간 {cache_stats['saved_seconds']:.0f}초"
+        )
+    
+    # 보관 정책으로 정리된 다이어그램 현황
+    retention_report = diagram_manager.get_retention_report()
+    if retention_report and retention_report["evicted"]:
+        reason_labels = {"max_age": "보관 기간 초과", "max_bytes": "용량 초과", "max_files": "개수 초과"}
+        reason_counts = {}
+        for item in retention_report["evicted"]:
+            label = reason_labels.get(item["reason"], item["reason"])
+            reason_counts[label] = reason_counts.get(label, 0) + 1
+        st.caption(
+            f"🧹 마지막 정리: {len(retention_report['evicted'])}개 삭제 "
+            f"({retention_report['freed_bytes'] / (1024 * 1024):.1f}MB 확보 · "
+            + ", ".join(f"{label} {count}개" for label, count in reason_counts.items())
+            + ")"
+        )
 
 # 체크 리스트와 보안 요소 설명서를 한 줄에 배치
 col1, col2 = st.columns(2, gap="large")
@@ -825,20 +1219,17 @@ with col1:
     with st.expander("✅ 체크리스트", expanded=False):
         # 기존 기본 체크리스트
         st.markdown("**🔒 기본 보안 체크리스트**")
-        basic_checklist = [
-            "VPC 적용 여부",
-            "퍼블릭,프라이빗 서브넷 분리", 
-            "데이터 암호화",
-            "로드밸런서 설정",
-            "WAF 설정",
-            "CloudFront 설정",
-            "CloudTrail 설정",
-            "CloudWatch 설정",
-            "CloudWatch 로그 설정",
-        ]
-        for item in basic_checklist:
+        for item in BASIC_SECURITY_CHECKLIST:
             st.checkbox(item, key=f"basic_{item}")
         
+        # 다이어그램 렌더링 방식 선택
+        st.markdown("**🎨 렌더링 옵션**")
+        st.checkbox(
+            "✨ Amazon Q 고급 렌더링 (AWS 아이콘 사용, 수 분 소요)",
+            key="use_amazon_q",
+            help="선택하지 않으면 로컬 graphviz로 즉시 렌더링하고, 렌더링할 수 없는 경우에만 Amazon Q를 사용합니다."
+        )
+        
 
 
 with col2:
@@ -849,28 +1240,28 @@ with col2:
             st.markdown(ss["security_analysis"])
             st.markdown("---")
             
-            # 마크다운 다운로드 버튼
-            markdown_content = f"""# AWS 보안 아키텍처 분석 보고서
-
-## 현재 아키텍처 구조
-```
-{ss.get("current_tree", "아키텍처 구조가 없습니다.")}
-```
-
-## 보안 분석 결과
-{ss["security_analysis"]}
-
-## 생성일시
-{st.session_state.get("analysis_timestamp", "알 수 없음")}
-"""
-            
+            # 마크다운 다운로드 버튼 (보고서는 다운로드를 누를 때만 생성)
             st.download_button(
                 label="📄 마크다운 다운로드",
-                data=markdown_content,
+                data=lazy_security_report(
+                    ss.get("current_tree", "아키텍처 구조가 없습니다."),
+                    ss["security_analysis"],
+                    st.session_state.get("analysis_timestamp", "알 수 없음"),
+                ),
                 file_name="aws_security_analysis.md",
                 mime="text/markdown",
                 use_container_width=True
             )
+            
+            # 캐시를 거치지 않고 보안 분석을 다시 요청
+            if st.button("🔄 보안 분석 새로 실행", key="refresh_analysis_button", use_container_width=True):
+                with st.spinner("🔍 보안 아키텍처를 다시 분석하고 있습니다..."):
+                    security_analysis = analyze_security_architecture(
+                        ss.get("current_tree", ""), get_checked_security_items(), use_cache=False
+                    )
+                ss["security_analysis"] = security_analysis
+                ss["analysis_timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                st.rerun()
         
         else:
             st.info("🔍 보안 분석 결과가 없습니다. '제작하기' 버튼을 클릭하여 분석을 시작하세요.")
@@ -883,17 +1274,34 @@ with st.expander("아키텍처 자동 응답기", expanded=True):
         st.error("❌ Gemini API가 준비되지 않았습니다.")
         st.info("📝 .env 파일에 GEMINI_API_KEY=your_api_key_here 를 추가하세요.")
     
-    # 챗봇 내용 렌더링
-    chat_html = '<div class="chat-container">'
-    for chat in ss["messages"]:
-        role = chat["role"]
-        content = chat["content"]
-        if role == "user":
-            chat_html += f"<div class='chat-bubble-wrapper user-bubble-wrapper'><div class='chat-bubble user-bubble'>{html.escape(content)}</div></div>"
-        else:
-            chat_html += f"<div class='chat-bubble-wrapper bot-bubble-wrapper'><div class='chat-bubble bot-bubble'>{html.escape(content)}</div></div>"
-    chat_html += '</div>'
+    # 이전 메시지 더 보기: 표시 창을 한 단계 넓힘
+    total_messages = ss["archived_message_count"] + len(ss["messages"])
+    hidden_messages = max(0, total_messages - ss["chat_visible_count"])
+    if hidden_messages:
+        st.button(
+            f"⬆️ 이전 메시지 더 보기 ({hidden_messages}개)", key="load_older_messages_button",
+            on_click=show_older_messages, use_container_width=True
+        )
+    
+    # 챗봇 내용 렌더링 (최근 메시지 창만)
+    chat_html = render_chat_window()
     st.markdown(chat_html, unsafe_allow_html=True)
+    
+    # 직전 응답의 지연 시간 표시
+    timing = ss.get("last_response_timing")
+    if timing:
+        first_token_text = (
+            f"첫 토큰 {timing['first_token_seconds']:.1f}초 · "
+            if timing.get("first_token_seconds") is not None else ""
+        )
+        # 요청 한도로 대기했거나 재시도한 경우에만 표시
+        wait_text = (
+            f" · 한도 대기 {timing['limiter_wait_seconds']:.1f}초"
+            if timing.get("limiter_wait_seconds", 0) >= 0.1 else ""
+        )
+        retry_text = f" · 재시도 {timing['retries']}회" if timing.get("retries") else ""
+        tokens_text = f" · 입력 {timing['input_tokens']:,}토큰" if timing.get("input_tokens") else ""
+        st.caption(f"⏱️ {first_token_text}전체 응답 {timing['total_seconds']:.1f}초{wait_text}{retry_text}{tokens_text}")
     st.markdown('<div class="chat-input-spacer"></div>', unsafe_allow_html=True)
 
     # 입력창
@@ -903,15 +1311,74 @@ with st.expander("아키텍처 자동 응답기", expanded=True):
         ss["messages"].append({"role": "user", "content": prompt})
         
         # 챗봇 응답 생성
-        with st.spinner("🤔 아키텍처 설계 중..."):
-            bot_response = generate_chatbot_response(prompt)
-            ss["messages"].append({"role": "assistant", "content": bot_response})
+        if CHAT_SETTINGS.get('stream', False):
+            # 도착한 부분 응답을 말풍선에 바로 표시
+            stream_placeholder = st.empty()
+            user_bubble = render_chat_bubble("user", prompt)
+            stream_placeholder.markdown(
+                f'<div class="chat-container">{user_bubble}{render_chat_bubble("assistant", "🤔 아키텍처 설계 중...")}</div>',
+                unsafe_allow_html=True
+            )
             
-            # 트리 구조 추출 및 저장
-            update_tree_structure(bot_response)
+            def _render_partial(partial_text):
+                stream_placeholder.markdown(
+                    f'<div class="chat-container">{user_bubble}{render_chat_bubble("assistant", partial_text + " ▌")}</div>',
+                    unsafe_allow_html=True
+                )
+            
+            bot_response = generate_chatbot_response(prompt, on_partial=_render_partial)
+        else:
+            with st.spinner("🤔 아키텍처 설계 중..."):
+                bot_response = generate_chatbot_response(prompt)
+        
+        # 스트림이 끝난 뒤 전체 응답에서 편집 연산 또는 트리 구조를 추출하여 반영
+        display_response = apply_tree_response(bot_response)
+        ss["messages"].append({"role": "assistant", "content": display_response})
+        archive_old_messages()
         
         # 페이지 새로고침
         st.rerun()
     elif prompt and not api_ready:
         st.error("API가 준비되지 않았습니다. 환경변수를 확인해주세요.")
 
+# =========================================
+# 성능 지표 패널 (관리자용)
+# =========================================
+if METRICS_SETTINGS.get('admin_panel', False) or st.query_params.get("admin") == "1":
+    with st.expander("📊 성능 지표 (관리자)", expanded=False):
+        def _format_ms(seconds):
+            return f"{seconds * 1000:.1f}" if seconds is not None else "-"
+        
+        # 단계별 소요 시간 백분위수 (최근 표본 기준, ms)
+        st.markdown("**⏱️ 단계별 소요 시간 (ms)**")
+        st.table([
+            {
+                "지표": summary["name"] + "".join(f" {k}={v}" for k, v in summary["labels"].items()),
+                "횟수": summary["count"],
+                "평균": _format_ms(summary["mean"]),
+                "p50": _format_ms(summary["p50"]),
+                "p95": _format_ms(summary["p95"]),
+                "p99": _format_ms(summary["p99"]),
+            }
+            for summary in metrics.histogram_summaries()
+        ])
+        
+        # 캐시 적중률과 결과별 카운터
+        for cache_name, (hits, lookups, hit_rate) in metrics.cache_hit_rates().items():
+            st.caption(f"🗂️ {cache_name} 캐시 적중률 {hit_rate:.0%} ({hits}/{lookups})")
+        st.markdown("**🔢 카운터**")
+        st.table([
+            {
+                "지표": name + "".join(f" {k}={v}" for k, v in labels.items()),
+                "값": value,
+            }
+            for name, labels, value in metrics.counters()
+        ])
+        
+        st.download_button(
+            label="📥 Prometheus 형식으로 내보내기",
+            data=metrics.to_prometheus,
+            file_name="metrics.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
@@ -0,0 +1,279 @@
+"""
+성능 지표(메트릭) 수집 모듈
+
+단계별 소요 시간을 span으로 감싸 히스토그램과 결과별 카운터(success/timeout/failure)로
+기록하고, 캐시 적중률 같은 카운터를 함께 집계합니다. 수집한 지표는 Prometheus 텍스트
+형식 또는 JSON Lines로 로컬 파일에 주기적으로 내보낼 수 있습니다.
+"""
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import METRICS_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# 결과 구분
+SUCCESS = "success"
+TIMEOUT = "timeout"
+FAILURE = "failure"
+
+# 히스토그램 구간 경계(초): 수 ms의 파일 작업부터 수 분의 Q CLI 실행까지
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# 시간 초과로 분류할 예외 이름 (모듈을 불러오지 않고 이름으로 비교)
+_TIMEOUT_ERRORS = {"TimeoutError", "TimeoutExpired", "GeminiDeadlineExceeded", "DeadlineExceeded"}
+
+_lock = threading.Lock()
+_instance = None
+# 이 프로세스의 이름 (내보내기 파일 경로와 process 레이블에 사용)
+_process_name = "app"
+_export_enabled = True
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """구간별 누적 개수와 최근 표본(백분위수 계산용)을 보관하는 히스토그램"""
+
+    def __init__(self, buckets, sample_size):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=sample_size)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+
+    def percentile(self, q):
+        """최근 표본 기준 q 백분위수(0~100)를 반환합니다. 표본이 없으면 None을 반환합니다."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class MetricsRegistry:
+    """프로세스 전체의 카운터와 히스토그램 저장소"""
+
+    def __init__(self, sample_size=1000, buckets=DEFAULT_BUCKETS, process=None):
+        self.sample_size = sample_size
+        self.buckets = buckets
+        # 여러 프로세스의 내보내기 파일을 함께 수집해도 시계열이 겹치지 않도록 붙이는 레이블
+        self.process = process
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+
+    def inc(self, name, value=1, **labels):
+        """카운터를 증가시킵니다."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """히스토그램에 값을 기록합니다."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets, self.sample_size)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """블록의 소요 시간을 <name>_seconds에, 결과를 <name>_total{outcome}에 기록합니다.
+
+        예외가 없어도 블록 안에서 span.outcome을 바꾸어 실패/시간 초과로 기록할 수 있습니다.
+        """
+        span = _Span()
+        started_at = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.outcome = outcome_for_error(e)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started_at, **labels)
+            self.inc(f"{name}_total", outcome=span.outcome, **labels)
+
+    def record_cache_lookup(self, cache, hit):
+        """캐시 조회 결과를 cache_lookups_total{cache, result}에 기록합니다."""
+        self.inc("cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+
+    def counters(self):
+        """카운터 목록을 [(이름, 레이블 dict, 값)]으로 반환합니다."""
+        with self._lock:
+            return [(name, dict(labels), value) for (name, labels), value in sorted(self._counters.items())]
+
+    def histogram_summaries(self):
+        """히스토그램별 개수, 평균, p50/p95/p99를 반환합니다."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count if histogram.count else None,
+                    "p50": histogram.percentile(50),
+                    "p95": histogram.percentile(95),
+                    "p99": histogram.percentile(99),
+                }
+                for (name, labels), histogram in items
+            ]
+
+    def cache_hit_rates(self):
+        """캐시별 적중률을 {캐시 이름: (적중, 조회 수, 적중률)}로 반환합니다."""
+        lookups = {}
+        for name, labels, value in self.counters():
+            if name != "cache_lookups_total":
+                continue
+            hits, total = lookups.get(labels["cache"], (0, 0))
+            lookups[labels["cache"]] = (hits + (value if labels["result"] == "hit" else 0), total + value)
+        return {cache: (hits, total, hits / total if total else 0.0) for cache, (hits, total) in lookups.items()}
+
+    def to_prometheus(self):
+        """Prometheus 텍스트 노출 형식으로 변환합니다."""
+        prefix = METRICS_SETTINGS['prefix']
+        process = [("process", self.process)] if self.process else []
+        lines = []
+        typed = set()
+
+        def _type_line(metric, metric_type):
+            # 같은 이름의 지표는 TYPE 줄을 한 번만 출력
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} {metric_type}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                _type_line(f"{prefix}{name}", "counter")
+                lines.append(f"{prefix}{name}{_format_labels(labels, process)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metric = f"{prefix}{name}"
+                _type_line(metric, "histogram")
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    lines.append(f"{metric}_bucket{_format_labels(labels, process + [('le', bound)])} {count}")
+                lines.append(f"{metric}_bucket{_format_labels(labels, process + [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{metric}_sum{_format_labels(labels, process)} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels, process)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_line(self):
+        """현재 지표 스냅숏을 JSON 한 줄로 변환합니다."""
+        return json.dumps(
+            {
+                "timestamp": time.time(),
+                "process": self.process,
+                "counters": [
+                    {"name": name, "labels": labels, "value": value}
+                    for name, labels, value in self.counters()
+                ],
+                "histograms": self.histogram_summaries(),
+            },
+            ensure_ascii=False,
+        )
+
+    def export(self, path, export_format):
+        """지표를 파일로 내보냅니다. (prometheus: 덮어쓰기, jsonl: 한 줄 추가)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if export_format == "prometheus":
+            # node_exporter textfile collector가 쓰다 만 파일을 읽지 않도록 교체 방식으로 저장
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            tmp_path.write_text(self.to_prometheus(), encoding="utf-8")
+            os.replace(tmp_path, path)
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(self.to_json_line() + "\n")
+
+    def start_exporter(self, path, export_format, interval_seconds):
+        """백그라운드 스레드에서 주기적으로 지표를 파일로 내보냅니다."""
+        if self._exporter is not None:
+            return
+
+        def _loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.export(path, export_format)
+                except OSError:
+                    logger.exception("지표 내보내기 실패")
+
+        self._exporter = threading.Thread(target=_loop, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+
+
+class _Span:
+    """span 블록 안에서 결과를 바꿀 수 있는 핸들"""
+
+    __slots__ = ("outcome",)
+
+    def __init__(self):
+        self.outcome = SUCCESS
+
+
+def outcome_for_error(error):
+    """예외 종류로 span 결과(시간 초과/실패)를 정합니다."""
+    return TIMEOUT if type(error).__name__ in _TIMEOUT_ERRORS else FAILURE
+
+
+def outcome_for_result(result):
+    """subprocess 결과로 span 결과를 정합니다. (None/0이 아닌 종료 코드는 실패)"""
+    if isinstance(result, subprocess.CompletedProcess):
+        return SUCCESS if result.returncode == 0 else FAILURE
+    return SUCCESS if result else FAILURE
+
+
+def set_process_name(name, export=True):
+    """이 프로세스의 이름과 내보내기 여부를 정합니다. (get_metrics 최초 호출 전에 호출)
+
+    웹 앱, API 서버, 배치 CLI가 같은 폴더에서 실행되어도 서로의 내보내기 파일을
+    덮어쓰지 않도록 프로세스마다 다른 이름을 지정합니다.
+    """
+    global _process_name, _export_enabled
+    with _lock:
+        if _instance is not None:
+            logger.debug("지표 저장소가 이미 만들어져 프로세스 이름을 바꾸지 않습니다: %s", name)
+            return
+        _process_name = name
+        _export_enabled = export
+
+
+def get_metrics():
+    """프로세스 전체에서 공유하는 지표 저장소를 반환합니다. (최초 호출 시 내보내기 시작)"""
+    global _instance
+    with _lock:
+        if _instance is None:
+            _instance = MetricsRegistry(sample_size=METRICS_SETTINGS['sample_size'], process=_process_name)
+            if _export_enabled and METRICS_SETTINGS.get('export_enabled', False):
+                _instance.start_exporter(
+                    METRICS_SETTINGS['export_path'].format(process=_process_name),
+                    METRICS_SETTINGS['export_format'],
+                    METRICS_SETTINGS['export_interval'],
+                )
+        return _instance
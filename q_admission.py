@@ -0,0 +1,172 @@
+"""
+Amazon Q CLI 실행 허용(admission) 제어 모듈
+
+프로세스 전체에서 동시에 실행되는 Q CLI 수를 제한합니다. 대기 중인 요청은
+세션별 대기열에 넣고 세션 간에 돌아가며(라운드 로빈) 실행 순서를 배정하므로,
+한 세션이 여러 번 요청해도 다른 세션이 밀리지 않습니다. 대기열이 가득 차면
+요청을 즉시 거절(load shedding)합니다.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from cancellation import OperationCancelled, on_cancel
+from config import Q_ADMISSION_SETTINGS
+
+_lock = threading.Lock()
+_instance = None
+
+
+class AdmissionRejected(Exception):
+    """대기열이 가득 찼거나 대기 시간이 초과되어 실행하지 못할 때 발생하는 예외"""
+
+
+class _Ticket:
+    """실행을 기다리는 요청 하나"""
+
+    __slots__ = ("session_id", "granted", "enqueued_at")
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """최대 동시 실행 수와 세션별 공정 대기열을 갖는 실행 허용 제어기"""
+
+    def __init__(self, max_in_flight, max_queue, max_queue_per_session, wait_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_per_session = max_queue_per_session
+        self.wait_timeout = wait_timeout
+        self._in_flight = 0
+        # 세션 ID → 대기 중인 요청들 (앞에 있는 세션이 다음 차례)
+        self._waiting = OrderedDict()
+        self._queued = 0
+        self._counters = {"admitted": 0, "rejected": 0, "timed_out": 0}
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def admit(self, session_id, cancel_token=None):
+        """차례가 올 때까지 기다린 뒤 실행을 허용합니다. 블록을 벗어나면 자리를 반납합니다.
+
+        기다리는 동안 cancel_token이 취소되면 대기열에서 빠지고 OperationCancelled를 발생시킵니다.
+        """
+        ticket = self._enqueue(session_id or "")
+        try:
+            with on_cancel(cancel_token, self._wake_waiters):
+                self._wait(ticket, cancel_token)
+            yield
+        finally:
+            if ticket.granted:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._dispatch()
+
+    def _enqueue(self, session_id):
+        """요청을 세션 대기열에 넣습니다. 대기열이 가득 차면 거절합니다."""
+        with self._condition:
+            session_queue = self._waiting.get(session_id, ())
+            if self._queued >= self.max_queue:
+                self._counters["rejected"] += 1
+                raise AdmissionRejected(
+                    f"Amazon Q 대기열이 가득 찼습니다 (대기 {self._queued}건). 잠시 후 다시 시도해주세요."
+                )
+            if len(session_queue) >= self.max_queue_per_session:
+                self._counters["rejected"] += 1
+                raise AdmissionRejected("이전 Amazon Q 요청이 아직 대기 중입니다. 완료된 뒤 다시 시도해주세요.")
+
+            ticket = _Ticket(session_id)
+            self._waiting.setdefault(session_id, deque()).append(ticket)
+            self._queued += 1
+            self._dispatch()
+            return ticket
+
+    def _wait(self, ticket, cancel_token=None):
+        """요청이 실행 허용될 때까지 기다립니다. 대기 시간이 초과되면 대기열에서 빼고 거절합니다."""
+        deadline = ticket.enqueued_at + self.wait_timeout
+        with self._condition:
+            while not ticket.granted:
+                if cancel_token is not None and cancel_token.cancelled:
+                    self._remove(ticket)
+                    raise OperationCancelled("사용자가 작업을 취소했습니다.")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self._counters["timed_out"] += 1
+                    raise AdmissionRejected(f"Amazon Q 대기 시간({self.wait_timeout}초)이 초과되었습니다.")
+                self._condition.wait(remaining)
+
+    def _wake_waiters(self):
+        """대기 중인 요청들이 취소 여부를 다시 확인하도록 깨웁니다."""
+        with self._condition:
+            self._condition.notify_all()
+
+    def _remove(self, ticket):
+        """대기 중인 요청을 대기열에서 제거합니다. (잠금을 잡은 상태에서 호출)"""
+        session_queue = self._waiting.get(ticket.session_id)
+        if session_queue and ticket in session_queue:
+            session_queue.remove(ticket)
+            self._queued -= 1
+            if not session_queue:
+                del self._waiting[ticket.session_id]
+
+    def _dispatch(self):
+        """빈 자리만큼 세션을 돌아가며 대기 중인 요청을 실행 허용합니다. (잠금을 잡은 상태에서 호출)"""
+        granted_any = False
+        while self._waiting and self._in_flight < self.max_in_flight:
+            session_id, session_queue = self._waiting.popitem(last=False)
+            ticket = session_queue.popleft()
+            if session_queue:
+                # 남은 요청이 있는 세션은 맨 뒤로 보내 다른 세션에 차례를 넘김
+                self._waiting[session_id] = session_queue
+            ticket.granted = True
+            self._queued -= 1
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+            granted_any = True
+        if granted_any:
+            self._condition.notify_all()
+
+    def position(self, session_id):
+        """세션의 가장 앞선 대기 요청이 몇 번째 차례인지(1부터) 반환합니다. 대기 중이 아니면 None을 반환합니다."""
+        with self._condition:
+            session_queue = self._waiting.get(session_id or "")
+            if not session_queue:
+                return None
+            # 라운드 로빈 순서상 이 세션 앞에 있는 세션들의 첫 요청이 먼저 실행됨
+            ahead = 0
+            for other_id in self._waiting:
+                if other_id == (session_id or ""):
+                    break
+                ahead += 1
+            return ahead + 1
+
+    def stats(self):
+        """실행 중/대기 중 요청 수와 허용·거절 횟수를 반환합니다."""
+        with self._condition:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queued": self._queued,
+                "max_queue": self.max_queue,
+                **self._counters,
+            }
+
+
+def get_admission_controller():
+    """프로세스 전체에서 공유하는 실행 허용 제어기를 반환합니다. 비활성화되어 있으면 None을 반환합니다."""
+    global _instance
+    if not Q_ADMISSION_SETTINGS.get('enabled', False):
+        return None
+    with _lock:
+        if _instance is None:
+            _instance = AdmissionController(
+                Q_ADMISSION_SETTINGS['max_in_flight'],
+                Q_ADMISSION_SETTINGS['max_queue'],
+                Q_ADMISSION_SETTINGS['max_queue_per_session'],
+                Q_ADMISSION_SETTINGS['wait_timeout'],
+            )
+        return _instance
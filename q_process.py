@@ -0,0 +1,273 @@
+"""
+Amazon Q CLI 프로세스 제어 모듈
+
+Q CLI는 bash, q, MCP 서버(uvx 등)로 이어지는 프로세스 트리로 실행되므로 실행마다 새
+세션(프로세스 그룹)으로 시작하고, 취소되거나 시간이 초과되면 트리 전체를 종료합니다.
+종료할 때는 트리가 사용한 CPU 시간과 메모리(RSS)를 집계해 회수한 자원으로 보고합니다.
+
+시간 제한은 고정값 대신 최근 성공한 실행 시간의 백분위수 × 배수로 조정합니다.
+"""
+import atexit
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+
+from cancellation import OperationCancelled
+from config import DIAGRAM_SETTINGS, Q_PROCESS_SETTINGS
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_instance = None
+
+# 실행 중인 프로세스 트리의 세션 리더 PID (프로세스 종료 시 남은 트리 정리용)
+_active_pids = set()
+_active_lock = threading.Lock()
+
+# =========================================
+# 프로세스 트리 자원 집계
+# =========================================
+def _session_members(session_id):
+    """/proc에서 세션에 속한 살아있는 프로세스의 {PID: (CPU 초, RSS 바이트)}를 반환합니다.
+
+    /proc이 없는 플랫폼에서는 None을 반환합니다.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    members = {}
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb") as f:
+                stat = f.read().decode(errors="replace")
+        except OSError:
+            # 읽는 사이에 종료된 프로세스
+            continue
+        # 두 번째 필드(실행 파일 이름)에 공백이 있을 수 있으므로 마지막 ')' 뒤부터 나눔
+        fields = stat.rsplit(")", 1)[1].split()
+        state, session = fields[0], int(fields[3])
+        if session != session_id or state == "Z":
+            continue
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+        members[int(entry.name)] = (cpu_seconds, int(fields[21]) * page_size)
+    return members
+
+
+def format_reclaim_report(report):
+    """회수 자원 보고를 사람이 읽을 수 있는 문자열로 만듭니다."""
+    if report.get("processes") is None:
+        return "프로세스 트리 종료 (자원 사용량 집계 불가)"
+    return (
+        f"프로세스 {report['processes']}개 종료 · CPU {report['cpu_seconds']:.1f}초 · "
+        f"메모리 {report['memory_bytes'] / (1024 * 1024):.1f}MB 회수"
+    )
+
+# =========================================
+# 프로세스 트리 시작/종료
+# =========================================
+def popen_group_kwargs():
+    """자식 프로세스(bash, q, MCP 서버)를 한꺼번에 종료할 수 있도록 새 세션/프로세스 그룹으로 실행합니다."""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _interrupt(pid):
+    """프로세스 그룹에 SIGINT(Windows는 CTRL_BREAK)를 보냅니다."""
+    try:
+        if os.name == "nt":
+            os.kill(pid, signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(pid, signal.SIGINT)
+    except OSError:
+        # 이미 종료된 프로세스 그룹
+        pass
+
+
+def _force_kill(pid, members):
+    """프로세스 그룹과 그룹을 벗어난 같은 세션의 프로세스를 모두 강제 종료합니다."""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    # 자체 프로세스 그룹을 만든 MCP 서버 등
+    for member_pid in members or ():
+        try:
+            os.kill(member_pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def terminate_process_tree(pid, grace_seconds, reason, is_running=None):
+    """pid를 세션 리더로 하는 프로세스 트리를 종료하고 회수한 자원을 보고(dict)합니다.
+
+    SIGINT를 보내 grace_seconds 동안 정상 종료를 기다린 뒤 남은 프로세스를 강제 종료합니다.
+    is_running()은 /proc이 없을 때 리더 프로세스가 살아있는지 확인하는 데 사용합니다.
+    """
+    # 종료 직전의 트리 자원 사용량 (종료하면 더 이상 집계할 수 없음)
+    snapshot = _session_members(pid)
+
+    def _alive():
+        if snapshot is not None:
+            return bool(_session_members(pid))
+        return is_running() if is_running else False
+
+    if grace_seconds > 0:
+        _interrupt(pid)
+        deadline = time.monotonic() + grace_seconds
+        while _alive() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    if _alive() or os.name == "nt":
+        _force_kill(pid, _session_members(pid))
+
+    report = {"reason": reason, "processes": None, "cpu_seconds": None, "memory_bytes": None}
+    if snapshot is not None:
+        report.update(
+            processes=len(snapshot),
+            cpu_seconds=sum(cpu for cpu, _ in snapshot.values()),
+            memory_bytes=sum(rss for _, rss in snapshot.values()),
+        )
+        metrics = get_metrics()
+        metrics.inc("q_processes_killed_total", report["processes"], reason=reason)
+        metrics.inc("q_reclaimed_cpu_seconds_total", report["cpu_seconds"], reason=reason)
+        metrics.inc("q_reclaimed_memory_bytes_total", report["memory_bytes"], reason=reason)
+    logger.info("Q CLI 프로세스 트리 종료 (%s): %s", reason, format_reclaim_report(report))
+    return report
+
+
+def kill_process_tree(process, grace_seconds, reason):
+    """subprocess.Popen으로 시작한 프로세스 트리를 종료하고 회수한 자원을 보고합니다."""
+    report = terminate_process_tree(process.pid, grace_seconds, reason, lambda: process.poll() is None)
+    process.wait()
+    return report
+
+
+def track(pid):
+    """종료 시 정리할 프로세스 트리로 등록합니다."""
+    with _active_lock:
+        _active_pids.add(pid)
+
+
+def untrack(pid):
+    with _active_lock:
+        _active_pids.discard(pid)
+
+
+@atexit.register
+def _kill_remaining_trees():
+    """새 세션으로 실행한 트리는 터미널의 Ctrl+C를 받지 않으므로 앱이 끝날 때 직접 정리합니다."""
+    with _active_lock:
+        pids = list(_active_pids)
+        _active_pids.clear()
+    for pid in pids:
+        terminate_process_tree(pid, 0, "exit")
+
+
+def run_process(args, timeout, encoding, cancel_token=None, env=None):
+    """명령을 새 프로세스 트리로 실행하고 subprocess.CompletedProcess를 반환합니다.
+
+    시간이 초과되면 트리를 종료하고 subprocess.TimeoutExpired를, 취소되면 OperationCancelled를
+    발생시킵니다. 회수한 자원 보고는 cancel_token.reports에도 추가합니다.
+    """
+    process = subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding=encoding,
+        env=env,
+        **popen_group_kwargs(),
+    )
+    track(process.pid)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                # 취소 요청을 확인할 수 있도록 짧게 나누어 기다림 (중간에 읽은 출력은 유지됨)
+                stdout, stderr = process.communicate(timeout=max(0.01, min(0.25, deadline - time.monotonic())))
+                return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+            except subprocess.TimeoutExpired:
+                cancelled = cancel_token is not None and cancel_token.cancelled
+                if not cancelled and time.monotonic() < deadline:
+                    continue
+                report = kill_process_tree(process, Q_PROCESS_SETTINGS['kill_grace'], "cancel" if cancelled else "timeout")
+                if cancel_token is not None:
+                    cancel_token.add_report(report)
+                process.communicate()
+                if cancelled:
+                    raise OperationCancelled("사용자가 작업을 취소했습니다.")
+                raise subprocess.TimeoutExpired(args, timeout)
+    finally:
+        untrack(process.pid)
+
+# =========================================
+# 적응형 시간 제한
+# =========================================
+class AdaptiveTimeout:
+    """최근 성공한 실행 시간 분포(백분위수 × 배수)로 시간 제한을 정합니다.
+
+    표본이 min_samples개 미만이면 기본 시간 제한을 사용합니다.
+    """
+
+    def __init__(self, default, percentile, factor, minimum, maximum, min_samples, window):
+        self.default = default
+        self.percentile = percentile
+        self.factor = factor
+        self.minimum = minimum
+        self.maximum = maximum
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """성공한 실행의 소요 시간을 기록합니다."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def current(self):
+        """현재 적용할 시간 제한(초)을 반환합니다."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.default
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, round(self.percentile / 100 * (len(ordered) - 1)))
+        return min(self.maximum, max(self.minimum, ordered[index] * self.factor))
+
+    def stats(self):
+        """표본 수와 현재 시간 제한을 반환합니다."""
+        with self._lock:
+            samples = len(self._samples)
+        return {"samples": samples, "timeout": self.current(), "default": self.default}
+
+
+def get_q_timeout():
+    """프로세스 전체에서 공유하는 Q CLI 적응형 시간 제한을 반환합니다.
+
+    적응형 시간 제한을 끄면 항상 DIAGRAM_SETTINGS['timeout']을 사용합니다.
+    """
+    global _instance
+    with _lock:
+        if _instance is None:
+            adaptive = Q_PROCESS_SETTINGS.get('adaptive_timeout', False)
+            _instance = AdaptiveTimeout(
+                default=DIAGRAM_SETTINGS['timeout'],
+                percentile=Q_PROCESS_SETTINGS['timeout_percentile'],
+                factor=Q_PROCESS_SETTINGS['timeout_factor'],
+                minimum=Q_PROCESS_SETTINGS['min_timeout'],
+                maximum=Q_PROCESS_SETTINGS['max_timeout'],
+                min_samples=Q_PROCESS_SETTINGS['min_samples'] if adaptive else float("inf"),
+                window=Q_PROCESS_SETTINGS['window'],
+            )
+        return _instance
@@ -0,0 +1,192 @@
+"""
+Amazon Q CLI 스트리밍 실행 모듈
+
+q chat은 다이어그램 PNG를 저장한 뒤에도 한동안 응답을 출력하다가 종료됩니다.
+스트리밍 모드는 출력을 한 줄씩 읽어 진행 상황으로 전달하고, 출력 폴더를 파일 시스템
+알림(watchdog: Linux는 inotify, 사용할 수 없으면 주기적 확인)으로 감시하다가 완전한 PNG가
+저장되는 즉시 Q CLI 프로세스 트리를 정상 종료(SIGINT → 유예 시간 후 강제 종료)시키고 반환합니다.
+"""
+import os
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from cancellation import OperationCancelled, on_cancel
+from config import DIAGRAM_SETTINGS, Q_PROCESS_SETTINGS, Q_STREAMING_SETTINGS
+from metrics import get_metrics
+from q_process import kill_process_tree, popen_group_kwargs, track, untrack
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# 길이 0의 IEND 청크 (길이 + 종류 + CRC), PNG 파일의 마지막 12바이트
+PNG_TRAILER = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+# 터미널 색상/커서 제어 문자
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]")
+
+_lock = threading.Lock()
+_shell_environment = None
+
+
+def is_complete_png(path):
+    """PNG 서명으로 시작하고 IEND 청크로 끝나는(끝까지 저장된) 파일이면 True를 반환합니다."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+                return False
+            f.seek(-len(PNG_TRAILER), os.SEEK_END)
+            return f.read() == PNG_TRAILER
+    except OSError:
+        # 아직 IEND 길이보다 작거나 쓰는 중에 사라진 파일
+        return False
+
+
+def find_complete_png(folder):
+    """폴더에서 완전히 저장된 PNG 파일을 찾습니다. 없으면 None을 반환합니다."""
+    return next((path for path in Path(folder).glob("*.png") if is_complete_png(path)), None)
+
+
+class _FolderWatcher:
+    """폴더에 변경이 생기면 깨어나는 대기 객체 (알림을 쓸 수 없으면 주기적으로 깨어남)"""
+
+    def __init__(self, folder):
+        self._changed = threading.Event()
+        self._observer = None
+        self.poll_interval = Q_STREAMING_SETTINGS['fallback_poll_interval']
+        if not Q_STREAMING_SETTINGS.get('use_fs_events', False):
+            return
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        changed = self._changed
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                changed.set()
+
+        try:
+            self._observer = Observer()
+            self._observer.schedule(_Handler(), str(folder), recursive=False)
+            self._observer.start()
+        except OSError:
+            # inotify 감시 한도 초과 등으로 알림을 쓸 수 없으면 주기적 확인으로 대체
+            self._observer = None
+            return
+        # 알림이 오면 바로 깨어나므로 주기적 확인은 놓친 알림에 대비한 보조 수단
+        self.poll_interval = Q_STREAMING_SETTINGS['poll_interval']
+
+    def wait(self):
+        """변경 알림이나 확인 주기 중 먼저 오는 것을 기다립니다."""
+        self._changed.wait(self.poll_interval)
+        self._changed.clear()
+
+    def wake(self):
+        """기다리는 쪽을 바로 깨웁니다. (취소 요청 시)"""
+        self._changed.set()
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=1)
+
+
+def get_shell_environment():
+    """~/.bashrc를 로드한 셸의 환경 변수를 한 번만 구해 재사용합니다.
+
+    요청마다 ~/.bashrc를 다시 로드하지 않도록 이 환경으로 q chat을 바로 실행합니다.
+    환경을 구할 수 없으면 현재 프로세스 환경에 ~/.local/bin을 추가해 사용합니다.
+    """
+    global _shell_environment
+    with _lock:
+        if _shell_environment is None:
+            local_bin = os.path.join(os.path.expanduser("~"), ".local", "bin")
+            env = dict(os.environ)
+            env["PATH"] = os.pathsep.join([env.get("PATH", ""), local_bin])
+            try:
+                result = subprocess.run(
+                    ["bash", "-c", "source ~/.bashrc >/dev/null 2>&1; env -0"],
+                    stdin=subprocess.DEVNULL, capture_output=True, timeout=DIAGRAM_SETTINGS['timeout'],
+                )
+                if result.returncode == 0:
+                    env = dict(
+                        entry.split("=", 1) for entry in result.stdout.decode(errors="replace").split("\0")
+                        if "=" in entry
+                    )
+                    env["PATH"] = os.pathsep.join([env.get("PATH", ""), local_bin])
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            _shell_environment = env
+        return _shell_environment
+
+
+def run_until_png(args, output_dir, timeout, encoding, on_output=None, env=None, cancel_token=None):
+    """명령을 실행하고 output_dir에 완전한 PNG가 저장되면 명령을 정상 종료시키고 반환합니다.
+
+    출력은 한 줄씩 on_output(줄)으로 전달합니다. 반환값은 subprocess.CompletedProcess이며,
+    PNG를 얻은 뒤 종료시킨 경우 returncode는 0입니다. PNG 없이 timeout초가 지나면 명령을
+    종료하고 subprocess.TimeoutExpired를, 취소되면 OperationCancelled를 발생시킵니다.
+    """
+    process = subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding=encoding,
+        errors="replace",
+        env=env,
+        **popen_group_kwargs(),
+    )
+    track(process.pid)
+    output = []
+
+    def _read_output():
+        for line in process.stdout:
+            output.append(line)
+            text = _ANSI_ESCAPE.sub("", line).strip()
+            if text and on_output:
+                on_output(text)
+
+    reader = threading.Thread(target=_read_output, name="q-stream-reader", daemon=True)
+    reader.start()
+
+    watcher = _FolderWatcher(output_dir)
+    deadline = time.monotonic() + timeout
+    diagram_path = None
+    try:
+        with on_cancel(cancel_token, watcher.wake):
+            while True:
+                diagram_path = find_complete_png(output_dir)
+                if diagram_path is not None or process.poll() is not None:
+                    break
+                cancelled = cancel_token is not None and cancel_token.cancelled
+                if cancelled or time.monotonic() >= deadline:
+                    report = kill_process_tree(
+                        process, Q_PROCESS_SETTINGS['kill_grace'], "cancel" if cancelled else "timeout"
+                    )
+                    if cancel_token is not None:
+                        cancel_token.add_report(report)
+                    reader.join(timeout=1)
+                    if cancelled:
+                        raise OperationCancelled("사용자가 작업을 취소했습니다.")
+                    raise subprocess.TimeoutExpired(args, timeout, output="".join(output))
+                watcher.wait()
+
+        if diagram_path is not None and process.poll() is None:
+            # 다이어그램은 이미 저장되었으므로 나머지 응답 출력을 기다리지 않음
+            get_metrics().inc("q_stream_early_exits_total")
+            kill_process_tree(process, Q_STREAMING_SETTINGS['shutdown_grace'], "early_exit")
+        process.wait()
+        reader.join(timeout=1)
+    finally:
+        watcher.close()
+        untrack(process.pid)
+
+    # 종료 직전에 저장된 PNG도 확인
+    diagram_path = diagram_path or find_complete_png(output_dir)
+    returncode = 0 if diagram_path is not None else process.returncode
+    return subprocess.CompletedProcess(args, returncode, "".join(output), "")
@@ -0,0 +1,10 @@
+from analysis_cache import AnalysisCache, make_analysis_key
+
+
+def test_prompt_version_change_misses_cached_analysis(tmp_path):
+    cache = AnalysisCache(tmp_path / "analysis.sqlite3", ttl=3600, max_entries=10)
+    tree = "AWS Cloud\n└── S3 Bucket"
+    cache.put(make_analysis_key(tree, ["IAM"], "gemini", "v1"), "gemini", "이전 분석")
+
+    assert cache.get(make_analysis_key(tree, ["IAM"], "gemini", "v1")) == "이전 분석"
+    assert cache.get(make_analysis_key(tree, ["IAM"], "gemini", "v2")) is None
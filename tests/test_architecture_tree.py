@@ -0,0 +1,105 @@
+from architecture_tree import apply_edit_ops, extract_edit_ops, parse_architecture_tree
+
+TREE = """AWS Cloud
+├─ VPC
+│  ├─ Public Subnet
+│  │  └─ EC2
+│  └─ Private Subnet
+│     └─ RDS
+└─ S3"""
+
+
+def _apply(ops):
+    return apply_edit_ops(parse_architecture_tree(TREE), ops)
+
+
+def test_add_under_parent():
+    graph, applied, failed = _apply([{"op": "add", "parent": "Private Subnet", "node": "ElastiCache Redis"}])
+    assert failed == []
+    assert applied == ["+ ElastiCache Redis (Private Subnet 아래)"]
+    assert "│     ├─ RDS\n│     └─ ElastiCache Redis" in graph.to_text()
+
+
+def test_add_with_path_reference():
+    graph, _, failed = _apply([{"op": "add", "parent": "VPC > Public Subnet", "node": "ALB"}])
+    assert failed == []
+    assert "│  │  ├─ EC2\n│  │  └─ ALB" in graph.to_text()
+
+
+def test_add_with_missing_parent_fails_without_changes():
+    graph, applied, failed = _apply([{"op": "add", "parent": "Isolated Subnet", "node": "Lambda"}])
+    assert applied == []
+    assert failed == ["추가 실패 (부모 없음): Lambda → Isolated Subnet"]
+    assert graph.to_text() == TREE
+
+
+def test_remove_drops_subtree():
+    graph, applied, failed = _apply([{"op": "remove", "node": "VPC > Private Subnet"}])
+    assert failed == []
+    assert applied == ["- Private Subnet"]
+    assert "RDS" not in graph.to_text()
+    assert len(graph.nodes) == 5
+
+
+def test_rename_keeps_children():
+    graph, applied, failed = _apply([{"op": "rename", "node": "RDS", "label": "Aurora  MySQL"}])
+    assert failed == []
+    assert applied == ["✎ RDS → Aurora MySQL"]
+    assert "│     └─ Aurora MySQL" in graph.to_text()
+
+
+def test_missing_node_and_unknown_op_are_reported():
+    _, applied, failed = _apply([
+        {"op": "remove", "node": "DynamoDB"},
+        {"op": "resize", "node": "EC2"},
+        "add EC2",
+    ])
+    assert applied == []
+    assert failed == [
+        "remove 실패 (노드 없음): DynamoDB",
+        "지원하지 않는 연산: {'op': 'resize', 'node': 'EC2'}",
+        "잘못된 연산: add EC2",
+    ]
+
+
+def test_move_into_own_descendant_is_rejected():
+    graph, applied, failed = _apply([{"op": "move", "node": "VPC", "parent": "EC2"}])
+    assert applied == []
+    assert failed == ["이동 실패: VPC → EC2"]
+    assert graph.to_text() == TREE
+
+
+def test_ambiguous_reference_fails():
+    tree = "AWS Cloud\n├─ AZ a\n│  └─ EC2\n└─ AZ b\n   └─ EC2"
+    _, applied, failed = apply_edit_ops(parse_architecture_tree(tree), [{"op": "remove", "node": "EC2"}])
+    assert applied == []
+    assert failed == ["remove 실패 (노드 없음): EC2"]
+
+
+def test_ops_apply_in_order_and_source_graph_is_unchanged():
+    source = parse_architecture_tree(TREE)
+    graph, applied, failed = apply_edit_ops(source, [
+        {"op": "add", "parent": "VPC", "node": "Isolated Subnet"},
+        {"op": "move", "node": "RDS", "parent": "Isolated Subnet"},
+    ])
+    assert failed == []
+    assert len(applied) == 2
+    assert "│  └─ Isolated Subnet\n│     └─ RDS" in graph.to_text()
+    assert source.to_text() == TREE
+
+
+def test_extract_edit_ops_removes_block():
+    text = 'Redis를 추가합니다.\n```json\n{"ops": [{"op": "add", "parent": "VPC", "node": "Redis"}]}\n```\n끝'
+    ops, remaining = extract_edit_ops(text)
+    assert ops == [{"op": "add", "parent": "VPC", "node": "Redis"}]
+    assert remaining == "Redis를 추가합니다.\n\n끝"
+
+
+def test_extract_edit_ops_accepts_bare_list():
+    ops, _ = extract_edit_ops('```json\n[{"op": "remove", "node": "S3"}]\n```')
+    assert ops == [{"op": "remove", "node": "S3"}]
+
+
+def test_extract_edit_ops_ignores_invalid_blocks():
+    for text in ["트리만 있는 응답", '```json\n{"ops": \n```', '```json\n{"ops": "add"}\n```']:
+        assert extract_edit_ops(text) == (None, text)
@@ -0,0 +1,22 @@
+import time
+from types import SimpleNamespace
+
+import chat_archive
+from chat_archive import ChatArchive
+
+
+def _messages(*contents):
+    return [{"role": "user", "content": content} for content in contents]
+
+
+def test_load_keeps_stored_seq_after_expired_rows_are_deleted(tmp_path, monkeypatch):
+    archive = ChatArchive(tmp_path / "archive.sqlite3", ttl=60)
+    archive.append("session", 0, _messages("m0", "m1"))
+    # 첫 구간이 TTL을 넘긴 뒤 다음 구간을 보관하면 만료된 앞쪽 기록이 삭제됨
+    now = time.time()
+    monkeypatch.setattr(chat_archive, "time", SimpleNamespace(time=lambda: now + 120))
+    archive.append("session", 2, _messages("m2", "m3"))
+
+    loaded = archive.load("session", 0, 4)
+
+    assert [(message["seq"], message["content"]) for message in loaded] == [(2, "m2"), (3, "m3")]
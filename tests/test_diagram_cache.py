@@ -0,0 +1,132 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import diagram_cache
+from diagram_cache import DiagramCache
+from diagram_generator import DiagramManager, _claim_cached_diagram
+
+
+class _Clock:
+    """time.time/time.monotonic 대역 (advance로 시각을 앞으로 보냄)"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    # 모듈 속성만 교체하여 다른 스레드의 time 사용에는 영향을 주지 않음
+    monkeypatch.setattr(diagram_cache, "time", SimpleNamespace(time=clock.time, monotonic=clock.monotonic))
+    return clock
+
+
+def _png(tmp_path, name, size=10):
+    path = tmp_path / f"{name}.png"
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def _index_on_disk(cache):
+    return json.loads(cache.index_path.read_text(encoding="utf-8"))
+
+
+def test_evicts_least_recently_used_entry(tmp_path, clock):
+    cache = DiagramCache(tmp_path / "cache", max_bytes=10_000, max_entries=2)
+    cache.put("a", _png(tmp_path, "a"))
+    clock.advance(1)
+    cache.put("b", _png(tmp_path, "b"))
+    clock.advance(1)
+    # a를 조회하면 b가 가장 오래 사용되지 않은 항목이 됨
+    assert cache.get("a") is not None
+    clock.advance(1)
+    cache.put("c", _png(tmp_path, "c"))
+
+    assert cache.get("b") is None
+    assert not (cache.cache_dir / "b.png").exists()
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_evicts_oldest_entries_until_under_byte_limit(tmp_path, clock):
+    cache = DiagramCache(tmp_path / "cache", max_bytes=25, max_entries=100)
+    for name in ("a", "b", "c"):
+        cache.put(name, _png(tmp_path, name, size=10))
+        clock.advance(1)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.stats()["total_bytes"] == 20
+
+
+def test_get_does_not_rewrite_index_until_flush_interval(tmp_path, clock):
+    cache = DiagramCache(tmp_path / "cache", max_bytes=10_000, max_entries=10, flush_interval=30)
+    cache.put("a", _png(tmp_path, "a"))
+    mtime = cache.index_path.stat().st_mtime_ns
+
+    for _ in range(5):
+        assert cache.get("a") is not None
+    assert cache.index_path.stat().st_mtime_ns == mtime
+    assert _index_on_disk(cache)["stats"]["hits"] == 0
+
+    clock.advance(31)
+    cache.get("a")
+    assert _index_on_disk(cache)["stats"]["hits"] == 6
+
+
+def test_flush_merges_with_index_written_by_another_process(tmp_path, clock):
+    cache_dir = tmp_path / "cache"
+    app_cache = DiagramCache(cache_dir, max_bytes=10_000, max_entries=10, flush_interval=30)
+    batch_cache = DiagramCache(cache_dir, max_bytes=10_000, max_entries=10, flush_interval=30)
+    app_cache.put("a", _png(tmp_path, "a"))
+    clock.advance(1)
+    assert app_cache.get("a") is not None
+    clock.advance(1)
+    batch_cache.put("b", _png(tmp_path, "b"))
+
+    # 다른 프로세스가 추가한 항목도 조회되고, 저장하지 않은 조회 결과는 유지됨
+    assert app_cache.get("b") is not None
+    app_cache.flush()
+
+    index = _index_on_disk(app_cache)
+    assert set(index["entries"]) == {"a", "b"}
+    assert index["entries"]["a"]["last_access"] == 1001.0
+    assert index["stats"]["hits"] == 2
+
+
+def test_missing_file_is_removed_from_index(tmp_path, clock):
+    cache = DiagramCache(tmp_path / "cache", max_bytes=10_000, max_entries=10)
+    cached_path = cache.put("a", _png(tmp_path, "a"))
+    cached_path.unlink()
+
+    assert cache.get("a") is None
+    cache.flush()
+    assert _index_on_disk(cache)["entries"] == {}
+    assert cache.stats()["misses"] == 1
+
+
+def test_claimed_cache_hit_survives_cache_eviction(tmp_path, clock):
+    diagram_manager = DiagramManager(tmp_path / "diagrams", retention=False)
+    cache = DiagramCache(tmp_path / "diagrams" / ".cache", max_bytes=10_000, max_entries=1)
+    cache.put("a", _png(tmp_path, "a"))
+
+    claimed = Path(_claim_cached_diagram(diagram_manager, cache.get("a")))
+    clock.advance(1)
+    cache.put("b", _png(tmp_path, "b"))
+
+    assert not (cache.cache_dir / "a.png").exists()
+    assert claimed.exists()
+    assert claimed.parent.parent == diagram_manager.diagram_folder
+    assert diagram_manager.get_diagram(claimed.parent.name) == claimed
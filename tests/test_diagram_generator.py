@@ -0,0 +1,85 @@
+import subprocess
+import sys
+from pathlib import Path, PureWindowsPath
+
+import pytest
+
+import diagram_generator
+from diagram_cache import DiagramCache
+from diagram_generator import AmazonQClient, DiagramManager, generate_with_amazon_q, to_wsl_path
+
+
+@pytest.fixture
+def echo_q(tmp_path, monkeypatch):
+    """받은 프롬프트를 그대로 출력하는 Q CLI 대역"""
+    script = tmp_path / "q"
+    script.write_text(f"#!{sys.executable}\nimport sys\nprint(sys.argv[2], end='')\n", encoding="utf-8")
+    script.chmod(0o755)
+    monkeypatch.setattr(diagram_generator, "AMAZON_Q_PATH", str(script))
+    monkeypatch.setenv("HOME", str(tmp_path))
+    (tmp_path / ".bashrc").write_text("", encoding="utf-8")
+    return script
+
+
+@pytest.mark.parametrize("prompt", [
+    'say "hi"',
+    "cost $HOME and $(touch injected)",
+    "`touch injected` it's",
+])
+def test_shell_fallback_passes_prompt_verbatim(echo_q, tmp_path, prompt):
+    result = AmazonQClient()._execute_unix(prompt, timeout=30)
+
+    assert result.returncode == 0
+    assert result.stdout == prompt
+    assert not (tmp_path / "injected").exists()
+
+
+class _SilentQClient:
+    """출력 없이("") 요청 폴더에 PNG를 저장하는 Q 클라이언트 대역"""
+
+    def generate_diagram(self, tree_structure, checked_items, output_dir, **kwargs):
+        (output_dir / "diagram.png").write_bytes(b"png")
+        return ""
+
+
+def test_successful_run_without_output_is_recorded_and_cached(tmp_path, monkeypatch):
+    monkeypatch.setitem(diagram_generator.DIAGRAM_CACHE_SETTINGS, "enabled", True)
+    diagram_manager = DiagramManager(tmp_path / "diagrams", retention=False)
+    diagram_cache = DiagramCache(tmp_path / "diagrams" / ".cache", max_bytes=10_000, max_entries=10)
+    tree = "AWS Cloud\n└── S3 Bucket"
+
+    diagram_path = generate_with_amazon_q(diagram_manager, _SilentQClient(), tree, [], diagram_cache)
+
+    assert diagram_path is not None
+    assert diagram_manager.get_diagram(Path(diagram_path).parent.name) == Path(diagram_path)
+    assert diagram_cache.stats()["entries"] == 1
+
+
+def _fake_wslpath(returncode, stdout=""):
+    def _run(args, **kwargs):
+        assert args[:3] == ["wsl", "wslpath", "-u"]
+        return subprocess.CompletedProcess(args, returncode, stdout, "")
+    return _run
+
+
+def test_wsl_path_uses_wslpath(monkeypatch):
+    monkeypatch.setattr(diagram_generator.subprocess, "run", _fake_wslpath(0, "/mnt/d/work/out\n"))
+    assert to_wsl_path(r"D:\work\out") == "/mnt/d/work/out"
+
+
+def test_wsl_path_falls_back_to_mount_rule(monkeypatch):
+    monkeypatch.setattr(diagram_generator.subprocess, "run", _fake_wslpath(1))
+    assert to_wsl_path(r"C:\Users\me\generated-diagrams\abc") == "/mnt/c/Users/me/generated-diagrams/abc"
+
+
+def test_windows_prompt_uses_wsl_output_dir(monkeypatch):
+    monkeypatch.setattr(diagram_generator.subprocess, "run", _fake_wslpath(1))
+    client = AmazonQClient()
+    client.platform = "Windows"
+    prompts = []
+    monkeypatch.setattr(client, "execute_command", lambda prompt, *args: prompts.append(prompt))
+
+    client.generate_diagram("AWS Cloud", [], PureWindowsPath(r"C:\app\generated-diagrams\abc"))
+
+    assert "/mnt/c/app/generated-diagrams/abc folder" in prompts[0]
+    assert "C:\\" not in prompts[0]
@@ -0,0 +1,112 @@
+import os
+import time
+
+import pytest
+
+from diagram_index import DiagramIndex
+from diagram_retention import REASON_MAX_AGE, REASON_MAX_BYTES, REASON_MAX_FILES, RetentionEngine
+
+
+def _make_request(folder, name, age_seconds, size=10):
+    """age_seconds 전에 생성된 요청 폴더(다이어그램 1개)를 만듭니다."""
+    request_folder = folder / name
+    request_folder.mkdir()
+    diagram = request_folder / "diagram.png"
+    diagram.write_bytes(b"x" * size)
+    modified = time.time() - age_seconds
+    os.utime(diagram, (modified, modified))
+    os.utime(request_folder, (modified, modified))
+    return diagram
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "diagrams"
+    folder.mkdir()
+    return folder
+
+
+def _engine(folder, **limits):
+    settings = {
+        "max_total_bytes": 10_000,
+        "max_age_seconds": 3600,
+        "max_files": 100,
+        "min_age_seconds": 60,
+        "session_idle_seconds": 600,
+    }
+    settings.update(limits)
+    return RetentionEngine(folder, DiagramIndex(folder / "index.sqlite3"), **settings)
+
+
+def _evicted(report):
+    return [(os.path.basename(item["path"]), item["reason"]) for item in report["evicted"]]
+
+
+def test_evicts_expired_requests(folder):
+    _make_request(folder, "old", age_seconds=7200)
+    _make_request(folder, "new", age_seconds=120)
+
+    report = _engine(folder).run_once()
+
+    assert _evicted(report) == [("old", REASON_MAX_AGE)]
+    assert not (folder / "old").exists()
+    assert (folder / "new").exists()
+
+
+def test_evicts_least_recently_used_over_file_limit(folder):
+    _make_request(folder, "a", age_seconds=500)
+    _make_request(folder, "b", age_seconds=400)
+    c = _make_request(folder, "c", age_seconds=300)
+    engine = _engine(folder, max_files=1)
+    # 가장 오래 전에 만들어졌어도 세션이 최근에 본 항목은 나중에 삭제
+    engine.touch_references("session", [c])
+    engine.touch_references("session", [])
+
+    report = engine.run_once()
+
+    assert _evicted(report) == [("a", REASON_MAX_FILES), ("b", REASON_MAX_FILES)]
+    assert (folder / "c").exists()
+
+
+def test_evicts_until_under_byte_limit(folder):
+    _make_request(folder, "a", age_seconds=500, size=100)
+    _make_request(folder, "b", age_seconds=400, size=100)
+    _make_request(folder, "c", age_seconds=300, size=100)
+
+    report = _engine(folder, max_total_bytes=250).run_once()
+
+    assert _evicted(report) == [("a", REASON_MAX_BYTES)]
+    assert report["total_bytes"] == 200
+
+
+def test_keeps_requests_referenced_by_active_sessions(folder):
+    old = _make_request(folder, "old", age_seconds=7200)
+    _make_request(folder, "other", age_seconds=500)
+    engine = _engine(folder, max_files=0)
+    engine.touch_references("session", [old])
+
+    report = engine.run_once()
+
+    assert _evicted(report) == [("other", REASON_MAX_FILES)]
+    assert report["protected"] == 1
+    assert old.exists()
+
+
+def test_releases_references_of_idle_sessions(folder):
+    old = _make_request(folder, "old", age_seconds=7200)
+    engine = _engine(folder, session_idle_seconds=0)
+    engine.touch_references("session", [old])
+    time.sleep(0.01)
+
+    report = engine.run_once()
+
+    assert _evicted(report) == [("old", REASON_MAX_AGE)]
+
+
+def test_keeps_requests_younger_than_min_age(folder):
+    _make_request(folder, "in_progress", age_seconds=1)
+
+    report = _engine(folder, max_files=0).run_once()
+
+    assert report["evicted"] == []
+    assert (folder / "in_progress").exists()
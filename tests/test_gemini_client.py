@@ -0,0 +1,157 @@
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_client
+from config import GEMINI_RATE_LIMIT_SETTINGS
+from gemini_client import TRUNCATED_MARKER, GeminiDeadlineExceeded, TokenBucket, estimate_tokens, trim_chat_history
+
+
+class _Clock:
+    """time.monotonic/time.sleep 대역 (sleep하면 시각이 앞으로 감)"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    # time 모듈 자체를 바꾸면 다른 스레드(지표 내보내기)의 sleep까지 바뀌므로 모듈 속성만 교체
+    monkeypatch.setattr(gemini_client, "time", SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+class _ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def test_bucket_allows_burst_then_waits_for_refill(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.acquire(deadline=clock.now + 10) for _ in range(3)] == [0, 0, 0]
+    # 초당 2개씩 채워지므로 다음 토큰까지 0.5초
+    assert bucket.acquire(deadline=clock.now + 10) == pytest.approx(0.5)
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.acquire(deadline=clock.now + 10)
+    bucket.acquire(deadline=clock.now + 10)
+    clock.now += 60
+    assert [bucket.acquire(deadline=clock.now + 10) for _ in range(2)] == [0, 0]
+    assert bucket.acquire(deadline=clock.now + 10) == pytest.approx(1.0)
+
+
+def test_bucket_raises_when_wait_exceeds_deadline(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.acquire(deadline=clock.now + 10)
+    with pytest.raises(GeminiDeadlineExceeded):
+        bucket.acquire(deadline=clock.now + 0.5)
+    assert clock.sleeps == []
+
+
+def test_backoff_delay_is_bounded(monkeypatch):
+    monkeypatch.setattr(gemini_client.random, "uniform", lambda low, high: high)
+    base_delay = GEMINI_RATE_LIMIT_SETTINGS['base_delay']
+    max_delay = GEMINI_RATE_LIMIT_SETTINGS['max_delay']
+    ceilings = [gemini_client._backoff_delay(attempt) for attempt in range(12)]
+    assert ceilings[:3] == [base_delay, base_delay * 2, base_delay * 4]
+    assert max(ceilings) == max_delay
+    assert ceilings == sorted(ceilings)
+
+    monkeypatch.setattr(gemini_client.random, "uniform", lambda low, high: low)
+    assert gemini_client._backoff_delay(5) == 0
+
+
+def test_non_retryable_errors_are_raised_immediately(clock):
+    error = _ApiError(400)
+    with pytest.raises(_ApiError):
+        gemini_client._next_retry_delay(error, 0, clock.now + 60, 60)
+
+
+def test_retries_stop_after_max_retries(clock):
+    error = _ApiError(429)
+    with pytest.raises(_ApiError):
+        gemini_client._next_retry_delay(error, GEMINI_RATE_LIMIT_SETTINGS['max_retries'], clock.now + 60, 60)
+
+
+def test_retry_that_would_pass_deadline_raises_deadline_exceeded(clock, monkeypatch):
+    monkeypatch.setattr(gemini_client.random, "uniform", lambda low, high: high)
+    with pytest.raises(GeminiDeadlineExceeded):
+        gemini_client._next_retry_delay(_ApiError(503), 0, clock.now + 0.1, 0.1)
+
+
+def test_generate_content_retries_transient_errors(clock, monkeypatch):
+    monkeypatch.setattr(gemini_client, "_rate_limiter", TokenBucket(rate=100, capacity=100))
+    monkeypatch.setattr(gemini_client.random, "uniform", lambda low, high: high)
+    monkeypatch.setitem(GEMINI_RATE_LIMIT_SETTINGS, 'enabled', True)
+
+    class _Model:
+        calls = 0
+
+        def generate_content(self, prompt, request_options=None):
+            self.calls += 1
+            if self.calls < 3:
+                raise _ApiError(429)
+            return f"응답: {prompt}"
+
+    model = _Model()
+    response, call_info = gemini_client.generate_content(model, "질문", deadline_seconds=60)
+    assert response == "응답: 질문"
+    assert call_info["retries"] == 2
+    base_delay = GEMINI_RATE_LIMIT_SETTINGS['base_delay']
+    assert clock.sleeps == [base_delay, base_delay * 2]
+
+
+def _turn(user_text, model_text):
+    return [{"role": "user", "parts": [user_text]}, {"role": "model", "parts": [model_text]}]
+
+
+def _history_tokens(history):
+    return sum(estimate_tokens(part) for content in history for part in content["parts"])
+
+
+def test_trim_keeps_recent_turns_within_budget():
+    history = _turn("a" * 40, "가" * 90) + _turn("b" * 40, "나" * 90) + _turn("c" * 40, "다" * 90)
+    # 턴마다 100토큰이므로 최근 두 턴만 남음
+    assert trim_chat_history(history, 200) == history[2:]
+
+
+def test_trim_truncates_oversized_latest_turn_instead_of_dropping_it():
+    tree_reply = "```\n" + "\n".join(f"├── 서브넷 {i}" for i in range(300)) + "\n```"
+    history = _turn("요청", "이전 응답") + _turn("VPC를 추가해줘", tree_reply)
+
+    kept = trim_chat_history(history, 500)
+
+    assert [content["role"] for content in kept] == ["user", "model"]
+    assert kept[0]["parts"] == ["VPC를 추가해줘"]
+    assert kept[1]["parts"][0].startswith(tree_reply[:100])
+    assert kept[1]["parts"][0].endswith(TRUNCATED_MARKER)
+    assert _history_tokens(kept) <= 500
+    # 저장된 대화 기록은 바뀌지 않음
+    assert history[3]["parts"] == [tree_reply]
+
+
+def test_trim_truncates_older_turn_into_remaining_budget():
+    history = _turn("a" * 40, "가" * 590) + _turn("b" * 40, "나" * 90)
+
+    kept = trim_chat_history(history, 400)
+
+    assert kept[2:] == history[2:]
+    assert kept[1]["parts"][0].endswith(TRUNCATED_MARKER)
+    assert _history_tokens(kept) <= 400
+
+
+def test_trim_with_zero_budget_sends_no_history():
+    assert trim_chat_history(_turn("질문", "답변"), 0) == []
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from cancellation import CancelToken, OperationCancelled
+from q_admission import AdmissionController, AdmissionRejected
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "조건을 기다리는 중 시간 초과"
+        time.sleep(0.005)
+
+
+def _start_waiter(controller, session_id, granted, errors):
+    """대기열에 들어갈 때까지 기다린 뒤 반환하는 요청 스레드를 시작합니다."""
+    queued = controller.stats()["queued"]
+
+    def _run():
+        try:
+            with controller.admit(session_id):
+                granted.append(session_id)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    _wait_until(lambda: controller.stats()["queued"] == queued + 1)
+    return thread
+
+
+def test_round_robin_between_sessions():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_per_session=3, wait_timeout=5)
+    granted, errors = [], []
+    with controller.admit("holder"):
+        threads = [_start_waiter(controller, session_id, granted, errors) for session_id in ("a", "a", "b", "c")]
+        assert controller.position("a") == 1
+        assert controller.position("c") == 3
+        assert controller.position("holder") is None
+    for thread in threads:
+        thread.join(2)
+    assert errors == []
+    # 먼저 두 번 요청한 세션 a의 두 번째 요청은 b, c 다음 차례
+    assert granted == ["a", "b", "c", "a"]
+    stats = controller.stats()
+    assert (stats["in_flight"], stats["queued"], stats["admitted"]) == (0, 0, 5)
+
+
+def test_rejects_when_queue_is_full():
+    controller = AdmissionController(max_in_flight=1, max_queue=2, max_queue_per_session=5, wait_timeout=5)
+    granted, errors = [], []
+    with controller.admit("holder"):
+        threads = [_start_waiter(controller, session_id, granted, errors) for session_id in ("a", "b")]
+        with pytest.raises(AdmissionRejected, match="대기열이 가득"):
+            with controller.admit("c"):
+                pass
+    for thread in threads:
+        thread.join(2)
+    assert granted == ["a", "b"]
+    assert controller.stats()["rejected"] == 1
+
+
+def test_rejects_second_waiting_request_of_same_session():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_per_session=1, wait_timeout=5)
+    granted, errors = [], []
+    with controller.admit("holder"):
+        thread = _start_waiter(controller, "a", granted, errors)
+        with pytest.raises(AdmissionRejected, match="아직 대기 중"):
+            with controller.admit("a"):
+                pass
+    thread.join(2)
+    assert granted == ["a"]
+
+
+def test_wait_timeout_removes_request_from_queue():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_per_session=1, wait_timeout=0.1)
+    with controller.admit("holder"):
+        started_at = time.monotonic()
+        with pytest.raises(AdmissionRejected, match="대기 시간"):
+            with controller.admit("a"):
+                pass
+        assert time.monotonic() - started_at < 1
+        stats = controller.stats()
+        assert (stats["queued"], stats["timed_out"]) == (0, 1)
+    # 시간 초과로 빠진 요청이 자리를 차지하지 않음
+    with controller.admit("a"):
+        assert controller.stats()["in_flight"] == 1
+
+
+def test_cancel_wakes_waiting_request():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_per_session=1, wait_timeout=5)
+    token = CancelToken()
+    errors = []
+
+    def _run():
+        try:
+            with controller.admit("a", token):
+                pass
+        except Exception as e:
+            errors.append(e)
+
+    with controller.admit("holder"):
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        _wait_until(lambda: controller.stats()["queued"] == 1)
+        token.cancel()
+        thread.join(2)
+        assert not thread.is_alive()
+        assert [type(e) for e in errors] == [OperationCancelled]
+        assert controller.stats()["queued"] == 0